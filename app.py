@@ -1,17 +1,45 @@
 import os
 import sys
 import logging
-from flask import Flask, request, jsonify
+import json
+import asyncio
+import uuid
+import threading
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# Imported first so the startup report covers everything below
+from agent.startup import startup, warm_up_in_background
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-from threading import Thread
-import uuid
 
 load_dotenv()
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
-from agent.graph import create_agent_graph, AgentState
+from agent.registry import get_graph, DEFAULT_GRAPH, PRELOADED_GRAPH, ASYNC_GRAPH, RESUMABLE_GRAPH, ASYNC_RESUMABLE_GRAPH
+from agent.cache import get_result_cache
+from agent.scheduler import JobScheduler, QueueFull
+from agent.jobstore import get_job_store
+from agent.serialize import (
+    compact_analysis, dumps, dumps_msgpack, compress, supported_encodings,
+    ormsgpack, JSON_MIMETYPE, MSGPACK_MIMETYPE
+)
+from agent.singleflight import SingleFlight
+from agent.approxconfig import approximation_settings
+from agent.batch import run_batch
+from agent.aio import AsyncRunner
+from agent.events import JobEvents, EventSink
+from agent.llmpool import get_llm_pool
+from agent.ratelimit import BACKGROUND, INTERACTIVE, get_rate_limiter
+from agent.checkpoint import (
+    get_checkpointer, thread_config, resume_config, pending_node, delete_checkpoints, prune_checkpoints
+)
+from agent.metrics import (
+    registry as metrics_registry, JobProfiler, JobMemory, JOBS, CONTENT_TYPE as METRICS_CONTENT_TYPE, process_rss
+)
+from agent.rowbuffer import release_rows, buffer_stats
 
 # Configure logging
 logging.basicConfig(
@@ -24,62 +52,400 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Store job results (in production, use Redis or a database)
-job_results = {}
+startup.mark("imports_done")
 
+# Range a request's "priority" is clamped to; the default (0, 0) ignores it, so
+# callers cannot jump ahead of other tenants unless the operator allows it
+JOB_PRIORITY_MIN = int(os.getenv('JOB_PRIORITY_MIN', 0))
+JOB_PRIORITY_MAX = int(os.getenv('JOB_PRIORITY_MAX', 0))
 
-def run_analysis_job(job_id, config):
-    """Run the analysis in a background thread"""
-    try:
-        logger.info(f"Starting analysis job {job_id}")
-        job_results[job_id] = {"status": "running", "progress": "Initializing..."}
-        
-        # Create the agent graph
-        agent_graph = create_agent_graph()
+# Created by start_services(), not at import: agent.parallel's pool workers
+# re-run this script as __mp_main__ and must not open stores or start threads
+job_store = None
+scheduler = None
+async_runner = None
+_services_lock = threading.Lock()
+
+
+def start_services():
+    """
+    Open the job store, start the worker pool (or event loop) and the background warm-up
+    
+    Runs once, from the entry point below or, when a WSGI server imported the
+    module instead, before the first request.
+    """
+    global job_store, scheduler, async_runner
+    if job_store is not None:
+        return
+    with _services_lock:
+        if job_store is not None:
+            return
+        # Job records live in a bounded store (JOB_STORE=memory|sqlite)
+        with startup.phase("job store"):
+            store = get_job_store()
+            interrupted = store.fail_active("Interrupted by server restart")
+        if interrupted:
+            logger.warning(f"Marked {interrupted} unfinished jobs from a previous run as failed")
         
-        # Update progress
-        job_results[job_id]["progress"] = "Running analysis..."
+        # Bounded worker pool; /analyze answers 429 once JOB_QUEUE_SIZE jobs are waiting
+        scheduler = JobScheduler(
+            workers=int(os.getenv('WORKER_POOL_SIZE', 4)),
+            max_queue=int(os.getenv('JOB_QUEUE_SIZE', 100))
+        )
         
-        # Run the analysis
-        final_state = agent_graph.invoke(config)
+        # ANALYSIS_EXECUTION=async runs graphs on one shared event loop instead of the
+        # worker threads, so hundreds of analyses can wait on I/O without a thread each
+        if os.getenv('ANALYSIS_EXECUTION', 'threads').lower() == 'async':
+            async_runner = AsyncRunner(max_in_flight=int(os.getenv('ASYNC_MAX_IN_FLIGHT', 200)))
         
-        # Store results
-        if final_state.get("error"):
-            job_results[job_id] = {
-                "status": "error",
-                "error": final_state["error"]
-            }
-        else:
-            job_results[job_id] = {
-                "status": "completed",
-                "data": {
-                    "rows_read": len(final_state.get('raw_data', [])),
-                    "analysis": final_state.get('analysis', {}),
-                    "insights": final_state.get('insights', ''),
-                    "spreadsheet_id": final_state.get('spreadsheet_id'),
-                    "write_range": final_state.get('write_range')
-                }
-            }
-        
-        logger.info(f"Analysis job {job_id} completed")
-        
-    except Exception as e:
-        logger.error(f"Error in job {job_id}: {str(e)}", exc_info=True)
-        job_results[job_id] = {
+        # The process answers /health as soon as it is up; heavy imports, compiling
+        # the graphs the routes serve and (with GRAPH_WARMUP=true) one stub run of
+        # each happen in the background, and /ready turns 200 once they are done
+        warm_up_in_background(
+            [ASYNC_RESUMABLE_GRAPH, ASYNC_GRAPH, PRELOADED_GRAPH] if async_runner is not None
+            else [RESUMABLE_GRAPH, DEFAULT_GRAPH, PRELOADED_GRAPH],
+            invoke=os.getenv('GRAPH_WARMUP', 'False').lower() == 'true'
+        )
+        # Published last: the unlocked check above treats a store as "started"
+        job_store = store
+
+
+@app.before_request
+def ensure_services():
+    start_services()
+
+
+# Identical requests made while a job is in flight attach to it instead of
+# re-reading the sheet and calling the LLM again
+single_flight = SingleFlight()
+
+# Result responses larger than this are compressed when the client accepts gzip/zstd
+COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+
+# Per-job tracing ("profile" in the /analyze body) can be switched off in production
+ENABLE_JOB_PROFILING = os.getenv('ENABLE_JOB_PROFILING', 'True').lower() == 'true'
+
+# Node transitions and LLM tokens per job, pushed to /stream/<job_id> clients
+job_events = JobEvents()
+
+# Queue and pool gauges are read from the live components at scrape time
+metrics_registry.gauge("agent_jobs_queued", "Jobs waiting for a worker or the event loop.",
+                       callback=lambda: async_runner.stats()["waiting"] if async_runner is not None else scheduler.stats()["queued"])
+metrics_registry.gauge("agent_jobs_active", "Jobs currently running.",
+                       callback=lambda: async_runner.stats()["running"] if async_runner is not None else scheduler.stats()["running"])
+metrics_registry.gauge("agent_llm_in_flight", "Ollama requests in flight per endpoint.", ["endpoint"],
+                       callback=lambda: {url: e["in_flight"] for url, e in get_llm_pool().stats()["endpoints"].items()})
+metrics_registry.gauge("agent_llm_queue_depth", "Ollama requests waiting for an endpoint slot.", ["endpoint"],
+                       callback=lambda: {url: e["queue_depth"] for url, e in get_llm_pool().stats()["endpoints"].items()})
+metrics_registry.gauge("agent_sheets_waiting", "Sheets calls waiting on the rate limiter.",
+                       callback=lambda: get_rate_limiter().stats()["waiting"])
+metrics_registry.gauge("agent_process_resident_bytes", "Resident memory of the API process.",
+                       callback=process_rss)
+metrics_registry.gauge("agent_row_buffer_bytes", "Sheet rows held in row buffers awaiting analysis.",
+                       callback=lambda: buffer_stats()["bytes"])
+metrics_registry.gauge("agent_result_cache_hit_ratio", "Hit ratio of the analysis result cache since start.",
+                       callback=lambda: get_result_cache().stats()["hit_rate"] if get_result_cache() is not None else None)
+
+NODE_PROGRESS = {
+    "read_data": "Data read, analyzing...",
+    "analyze_data": "Analysis done, generating insights...",
+    "generate_insights": "Insights generated, validating...",
+    "validate_output": "Finishing up...",
+}
+
+
+def api_response(payload, status=200):
+    """Encode a payload per the Accept header (JSON or MessagePack) and compress it per Accept-Encoding"""
+    mimetypes = [JSON_MIMETYPE] + ([MSGPACK_MIMETYPE, "application/x-msgpack"] if ormsgpack is not None else [])
+    mimetype = request.accept_mimetypes.best_match(mimetypes, default=JSON_MIMETYPE)
+    if mimetype == JSON_MIMETYPE:
+        body = dumps(payload)
+    else:
+        body = dumps_msgpack(payload)
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    encoding = request.accept_encodings.best_match(supported_encodings())
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def request_flag(data, name, default):
+    """A boolean request field; accepts JSON booleans and "true"/"false", ValueError on anything else"""
+    value = data.get(name, default)
+    if isinstance(value, bool):
+        return value
+    if value in ("true", "false"):
+        return value == "true"
+    raise ValueError(f"{name} must be true or false")
+
+
+def build_config(data):
+    """Build the graph input state from a request body, falling back to env defaults; ValueError on invalid settings"""
+    accuracy, confidence = approximation_settings(data)
+    return {
+        "spreadsheet_id": data.get("spreadsheet_id", os.getenv("SPREADSHEET_ID", "")),
+        "read_range": data.get("read_range", os.getenv("READ_RANGE", "Sheet1!A1:Z1000")),
+        "write_range": data.get("write_range", os.getenv("WRITE_RANGE", "Sheet1!AB1")),
+        "service_account_json": data.get("service_account_json", os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", "credentials/service_account.json")),
+        "model": data.get("model", os.getenv("LLM_MODEL", "llama2")),
+        "base_url": data.get("base_url", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")),
+        "context": data.get("context", os.getenv("ANALYSIS_CONTEXT", "")),
+        "streaming": request_flag(data, "streaming", os.getenv("ANALYSIS_STREAMING", "False").lower() == "true"),
+        "incremental": request_flag(data, "incremental", os.getenv("ANALYSIS_INCREMENTAL", "False").lower() == "true"),
+        "approximate": request_flag(data, "approximate", os.getenv("ANALYSIS_APPROXIMATE", "False").lower() == "true"),
+        "accuracy": accuracy,
+        "confidence": confidence,
+        "use_cache": request_flag(data, "use_cache", True),
+        "sheets_priority": BACKGROUND,
+        "analysis": {},
+        "insights": "",
+        "error": ""
+    }
+
+
+def job_priority(data):
+    """Scheduler priority for a request body, clamped to JOB_PRIORITY_MIN..JOB_PRIORITY_MAX"""
+    priority = int(data.get("priority", 0))
+    return min(max(priority, JOB_PRIORITY_MIN), JOB_PRIORITY_MAX)
+
+
+def job_options(config, priority, profile, tenant):
+    """Request settings stored with a job record, for re-running it through /resume"""
+    return {"config": config, "priority": priority, "profile": profile, "tenant": tenant}
+
+
+def coalescing_key(config):
+    """Requests with the same key produce the same result and can share one run"""
+    return tuple(config.get(field) for field in (
+        "spreadsheet_id", "read_range", "write_range", "service_account_json",
+        "model", "base_url", "context", "streaming", "incremental",
+        "approximate", "accuracy", "confidence", "use_cache"
+    ))
+
+
+def publish_result(job_id, record, coalesce_key=None):
+    """Store a finished job's record, and copy it to any coalesced followers"""
+    startup.mark("first_job_done")
+    job_store.put(job_id, record)
+    JOBS.inc(status=record["status"])
+    job_events.publish(job_id, "done", done_event(record))
+    # Failed jobs keep their checkpoints for /resume until CHECKPOINT_TTL_SECONDS passes
+    prune_checkpoints()
+    if coalesce_key is None:
+        return
+    for follower_id in single_flight.complete(coalesce_key):
+        job_store.put(follower_id, {**record, "coalesced_into": job_id})
+        job_events.publish(follower_id, "done", done_event(record))
+
+
+def done_event(record):
+    """Payload of the final SSE event for a finished job record"""
+    return {
+        "status": record["status"],
+        "error": record.get("error"),
+        "insights": (record.get("data") or {}).get("insights")
+    }
+
+
+def job_event_sink(job_id):
+    """Event sink for one job; also keeps partial_insights in the job store current"""
+    return EventSink(
+        job_events, job_id,
+        on_partial=lambda text: job_store.update(job_id, partial_insights=text)
+    )
+
+
+def track_update(job_id, sink, update):
+    """Record a finished node from a graph "updates" stream chunk; returns the node if it failed"""
+    failed_node = None
+    for node, values in update.items():
+        sink("node", {"node": node})
+        if (values or {}).get("error"):
+            failed_node = node
+        if node in NODE_PROGRESS:
+            job_store.update(job_id, progress=NODE_PROGRESS[node])
+    return failed_node
+
+
+def job_record(final_state, failed_node=None):
+    """Turn a finished graph state into the record kept in the job store"""
+    if final_state.get("error"):
+        return {
             "status": "error",
-            "error": str(e)
+            "error": final_state["error"],
+            "failed_node": failed_node,
+            "spreadsheet_id": final_state.get('spreadsheet_id')
+        }
+    return {
+        "status": "completed",
+        "data": {
+            "rows_read": final_state.get('rows_read', 0),
+            "analysis": compact_analysis(final_state.get('analysis', {})),
+            "insights": final_state.get('insights', ''),
+            "llm_stats": final_state.get('llm_stats', {}),
+            "incremental": final_state.get('incremental_info'),
+            "spreadsheet_id": final_state.get('spreadsheet_id'),
+            "write_range": final_state.get('write_range')
         }
+    }
+
+
+def graph_run(agent_graph, job_id, config, resume_from, **configurable):
+    """(input, run config, starting state) for a job run, resuming from a checkpoint if asked"""
+    run_config = thread_config(job_id, **configurable)
+    if not resume_from:
+        return config, run_config, config
+    checkpoint = resume_config(agent_graph, job_id, resume_from)
+    if checkpoint is None:
+        raise RuntimeError(f"No checkpoint to resume job {job_id} at {resume_from}")
+    run_config["configurable"].update(checkpoint["configurable"])
+    return None, run_config, agent_graph.get_state(checkpoint).values
+
+
+def submit_async(job_id, make_job):
+    """Queue a job on the event loop, with the same JOB_QUEUE_SIZE limit the worker pool applies"""
+    if async_runner.stats()["waiting"] >= scheduler.max_queue:
+        raise QueueFull(scheduler.retry_after())
+    return async_runner.submit(make_job, job_id=job_id)
+
+
+def queue_position(job_id):
+    """1-based place of a queued job in whichever queue runs it, None once it has started"""
+    if async_runner is not None:
+        return async_runner.position(job_id)
+    return scheduler.position(job_id)
+
+
+def job_profiler(profile):
+    """Profiler for a job that asked for one: true records node spans, "cprofile" adds cProfile stats"""
+    if not profile:
+        return None
+    return JobProfiler(cprofile=str(profile).lower() == "cprofile")
+
+
+def begin_job(job_id, resume_from=None):
+    """Mark a job running and announce it on its event stream; returns the job's event sink"""
+    logger.info(f"Starting analysis job {job_id}")
+    job_store.update(job_id, status="running",
+                     progress="Running analysis..." if not resume_from else f"Resuming at {resume_from}...")
+    sink = job_event_sink(job_id)
+    sink("status", {"status": "running"})
+    return sink
+
+
+def finished_record(job_id, final_state, failed_node):
+    """Record for a run that reached the end; checkpoints are only kept for jobs that may be resumed"""
+    record = job_record(final_state, failed_node)
+    if record["status"] == "completed":
+        delete_checkpoints(job_id)
+    logger.info(f"Analysis job {job_id} completed")
+    return record
+
+
+def failed_record(job_id, error):
+    logger.error(f"Error in job {job_id}: {str(error)}", exc_info=True)
+    return {
+        "status": "error",
+        "error": str(error)
+    }
+
+
+def end_job(job_id, record, final_state, profiler, memory, coalesce_key):
+    """Add the profile and memory reports to a job's record, free its rows and publish it"""
+    record = record or {"status": "error", "error": "Job aborted"}
+    # Kept so /resume can rerun the job with the settings it was submitted with
+    previous = job_store.get(job_id) or {}
+    if previous.get("options"):
+        record["options"] = previous["options"]
+    if profiler is not None:
+        record["profile"] = profiler.report()
+    # Normally released by analyze_data already; this covers runs that stopped before it
+    release_rows((final_state or {}).get("rows_handle"))
+    memory.stop()
+    record["memory"] = memory.report()
+    publish_result(job_id, record, coalesce_key)
+
+
+async def run_analysis_job_async(job_id, config, coalesce_key=None, profile=None, resume_from=None):
+    """Run the analysis on the shared event loop (ANALYSIS_EXECUTION=async)"""
+    record = None
+    profiler = job_profiler(profile)
+    memory = JobMemory().start()
+    final_state = None
+    try:
+        sink = await asyncio.to_thread(begin_job, job_id, resume_from)
+        agent_graph = get_graph(ASYNC_RESUMABLE_GRAPH)
+        graph_input, run_config, final_state = await asyncio.to_thread(
+            graph_run, agent_graph, job_id, config, resume_from, event_sink=sink, profiler=profiler, memory=memory
+        )
+        failed_node = None
+        async for mode, chunk in agent_graph.astream(graph_input, run_config, stream_mode=["updates", "values"]):
+            if mode == "updates":
+                failed_node = await asyncio.to_thread(track_update, job_id, sink, chunk) or failed_node
+            else:
+                final_state = chunk
+        record = await asyncio.to_thread(finished_record, job_id, final_state, failed_node)
+    except Exception as e:
+        record = failed_record(job_id, e)
+    finally:
+        await asyncio.to_thread(end_job, job_id, record, final_state, profiler, memory, coalesce_key)
+
+
+def run_analysis_job(job_id, config, coalesce_key=None, profile=None, resume_from=None):
+    """Run the analysis on a scheduler worker thread; ``resume_from`` restarts a failed job at that node"""
+    record = None
+    profiler = job_profiler(profile)
+    memory = JobMemory().start()
+    final_state = None
+    try:
+        sink = begin_job(job_id, resume_from)
+        # Reuse the process-wide compiled graph; it checkpoints after every node
+        agent_graph = get_graph(RESUMABLE_GRAPH)
+        graph_input, run_config, final_state = graph_run(
+            agent_graph, job_id, config, resume_from, event_sink=sink, profiler=profiler, memory=memory
+        )
+        failed_node = None
+        for mode, chunk in agent_graph.stream(graph_input, run_config, stream_mode=["updates", "values"]):
+            if mode == "updates":
+                failed_node = track_update(job_id, sink, chunk) or failed_node
+            else:
+                final_state = chunk
+        record = finished_record(job_id, final_state, failed_node)
+    except Exception as e:
+        record = failed_record(job_id, e)
+    finally:
+        end_job(job_id, record, final_state, profiler, memory, coalesce_key)
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up and serving requests"""
     return jsonify({
         "status": "healthy",
-        "service": "Spreadsheet Analysis Agent API"
+        "service": "Spreadsheet Analysis Agent API",
+        "ready": startup.ready
     }), 200
 
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness check: 200 once dependencies are imported and graphs compiled, 503 before
+    
+    A failed warm-up answers 503 with "status": "warmup_failed" and its error
+    until a retry (every WARMUP_RETRY_SECONDS) succeeds. The body carries the
+    startup report (per-step timings and milestones such as "ready" and
+    "first_request", in ms since the process started).
+    """
+    report = startup.as_dict()
+    if report["ready"]:
+        return jsonify({"status": "ready", "startup": report}), 200
+    status = "warmup_failed" if report["error"] else "warming_up"
+    return jsonify({"status": status, "error": report["error"], "startup": report}), 503
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze_spreadsheet():
     """
@@ -93,9 +459,30 @@ def analyze_spreadsheet():
         "service_account_json": "credentials/service_account.json",
         "model": "llama2",
         "base_url": "http://localhost:11434",
-        "context": "Optional analysis context"
+        "context": "Optional analysis context",
+        "streaming": false,
+        "incremental": false,
+        "approximate": false,
+        "accuracy": 0.05,
+        "confidence": 0.95,
+        "use_cache": true,
+        "tenant": "Optional fairness key (defaults to X-Tenant-ID header, then spreadsheet_id)",
+        "priority": 0,
+        "profile": false
     }
+    
+    "profile": true records per-node timings in the job record; "cprofile"
+    also runs the synchronous nodes under cProfile.
+    
+    "priority" (lower runs first) is clamped to JOB_PRIORITY_MIN..JOB_PRIORITY_MAX,
+    which defaults to 0..0, i.e. clients cannot reorder the queue.
+    
+    "approximate": true summarizes a random sample of row windows instead of
+    the whole range, reading until every mean is within "accuracy" (relative)
+    at the "confidence" level; the result's analysis.approximate holds the
+    confidence intervals and how much of the sheet was read.
     """
+    startup.mark("first_request")
     try:
         data = request.get_json()
         
@@ -104,38 +491,75 @@ def analyze_spreadsheet():
             return jsonify({"error": "Request body is required"}), 400
         
         # Build config with defaults
-        config = {
-            "spreadsheet_id": data.get("spreadsheet_id", os.getenv("SPREADSHEET_ID", "")),
-            "read_range": data.get("read_range", os.getenv("READ_RANGE", "Sheet1!A1:Z1000")),
-            "write_range": data.get("write_range", os.getenv("WRITE_RANGE", "Sheet1!AB1")),
-            "service_account_json": data.get("service_account_json", os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", "credentials/service_account.json")),
-            "model": data.get("model", os.getenv("LLM_MODEL", "llama2")),
-            "base_url": data.get("base_url", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")),
-            "context": data.get("context", os.getenv("ANALYSIS_CONTEXT", "")),
-            "raw_data": [],
-            "analysis": {},
-            "insights": "",
-            "error": ""
-        }
+        try:
+            config = build_config(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Validate spreadsheet_id
         if not config["spreadsheet_id"]:
             return jsonify({"error": "spreadsheet_id is required"}), 400
         
+        try:
+            priority = job_priority(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": "priority must be an integer"}), 400
+        
         # Generate job ID
         job_id = str(uuid.uuid4())
+        profile = data.get("profile") if ENABLE_JOB_PROFILING else None
+        tenant = data.get("tenant") or request.headers.get("X-Tenant-ID") or config["spreadsheet_id"]
+        
+        job_store.put(job_id, {
+            "status": "queued",
+            "progress": "Waiting for a worker...",
+            "spreadsheet_id": config["spreadsheet_id"],
+            "options": job_options(config, priority, profile, tenant)
+        })
         
-        # Start analysis in background thread
-        thread = Thread(target=run_analysis_job, args=(job_id, config))
-        thread.daemon = True
-        thread.start()
+        # Attach to an identical in-flight job if there is one; profiled jobs
+        # always run on their own so the trace describes this request
+        key = coalescing_key(config) if not profile else None
+        leader_id = single_flight.join(key, job_id) if key is not None else None
+        if leader_id is not None:
+            job_store.update(job_id, coalesced_into=leader_id)
+            logger.info(f"Coalesced job {job_id} into in-flight job {leader_id}")
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "coalesced_into": leader_id,
+                "message": "Attached to an identical analysis already in progress",
+                "config": {
+                    "spreadsheet_id": config["spreadsheet_id"],
+                    "read_range": config["read_range"],
+                    "model": config["model"]
+                }
+            }), 202
         
-        logger.info(f"Created analysis job {job_id} for spreadsheet {config['spreadsheet_id']}")
+        # Queue the analysis on the event loop or the worker pool
+        try:
+            if async_runner is not None:
+                submit_async(job_id, lambda: run_analysis_job_async(job_id, config, key, profile))
+            else:
+                scheduler.submit(job_id, run_analysis_job, job_id, config, key, profile,
+                                 tenant=tenant, priority=priority)
+        except QueueFull as e:
+            job_store.delete(job_id)
+            if key is not None:
+                for follower_id in single_flight.complete(key):
+                    job_store.put(follower_id, {"status": "error", "error": "Job queue is full, retry later"})
+            logger.warning(f"Rejected analysis for spreadsheet {config['spreadsheet_id']}: queue full")
+            response = jsonify({"error": "Too many queued analysis jobs", "retry_after": e.retry_after})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 429
+        
+        logger.info(f"Queued analysis job {job_id} for spreadsheet {config['spreadsheet_id']}")
         
         return jsonify({
             "job_id": job_id,
-            "status": "started",
-            "message": "Analysis job started successfully",
+            "status": "queued",
+            "queue_position": queue_position(job_id),
+            "message": "Analysis job queued successfully",
             "config": {
                 "spreadsheet_id": config["spreadsheet_id"],
                 "read_range": config["read_range"],
@@ -151,47 +575,250 @@ def analyze_spreadsheet():
 @app.route('/status/<job_id>', methods=['GET'])
 def get_job_status(job_id):
     """Get the status of an analysis job"""
-    if job_id not in job_results:
-        return jsonify({"error": "Job not found"}), 404
+    result = job_store.get(job_id)
+    if result is None:
+        return api_response({"error": "Job not found"}, 404)
     
-    result = job_results[job_id]
+    # Coalesced jobs report the progress of the job they are attached to
+    leader_id = result.get("coalesced_into")
+    if leader_id and result["status"] in ("queued", "running"):
+        leader = job_store.get(leader_id)
+        if leader is not None:
+            result = {**leader, "coalesced_into": leader_id}
+        job_id_for_queue = leader_id
+    else:
+        job_id_for_queue = job_id
     
-    if result["status"] == "running":
-        return jsonify({
+    if result["status"] == "queued":
+        return api_response({
+            "job_id": job_id,
+            "status": "queued",
+            "queue_position": queue_position(job_id_for_queue),
+            "progress": result.get("progress", "Waiting for a worker...")
+        })
+    
+    elif result["status"] == "running":
+        return api_response({
             "job_id": job_id,
             "status": "running",
-            "progress": result.get("progress", "Processing...")
-        }), 200
+            "progress": result.get("progress", "Processing..."),
+            "partial_insights": result.get("partial_insights", "")
+        })
     
     elif result["status"] == "completed":
-        return jsonify({
+        return api_response({
             "job_id": job_id,
             "status": "completed",
-            "data": result["data"]
-        }), 200
+            "data": result["data"],
+            **({"profile": result["profile"]} if "profile" in result else {}),
+            **({"memory": result["memory"]} if "memory" in result else {})
+        })
     
     elif result["status"] == "error":
-        return jsonify({
+        return api_response({
             "job_id": job_id,
             "status": "error",
-            "error": result["error"]
-        }), 200
+            "error": result["error"],
+            "failed_node": result.get("failed_node"),
+            **({"profile": result["profile"]} if "profile" in result else {}),
+            **({"memory": result["memory"]} if "memory" in result else {})
+        })
+
+
+@app.route('/resume/<job_id>', methods=['POST'])
+def resume_job(job_id):
+    """
+    Re-run a failed job from the node that failed
+    
+    Nodes that finished before the failure are not repeated: the run starts
+    from the checkpoint taken just before the failed node, so e.g. an Ollama
+    timeout does not cost another Sheets read and analysis. Jobs interrupted
+    by a server restart resume at the node that was running.
+    """
+    result = job_store.get(job_id)
+    if result is None:
+        return jsonify({"error": "Job not found"}), 404
+    if result.get("coalesced_into"):
+        return jsonify({"error": "Job was coalesced, resume the job it was attached to",
+                        "coalesced_into": result["coalesced_into"]}), 409
+    if result["status"] != "error":
+        return jsonify({"error": f"Only failed jobs can be resumed (status is {result['status']})"}), 409
+    if get_checkpointer() is None:
+        return jsonify({"error": "Checkpointing is disabled (CHECKPOINT_PATH is not set or "
+                                 "langgraph-checkpoint-sqlite is not installed)"}), 409
+    
+    agent_graph = get_graph(RESUMABLE_GRAPH)
+    node = result.get("failed_node") or pending_node(agent_graph, job_id)
+    if not node or resume_config(agent_graph, job_id, node) is None:
+        return jsonify({"error": "No checkpoint to resume this job from"}), 409
+    
+    # The original request's settings; the graph state itself comes from the checkpoint
+    options = result.get("options") or {}
+    job_store.put(job_id, {
+        "status": "queued",
+        "progress": f"Waiting to resume at {node}...",
+        "spreadsheet_id": result.get("spreadsheet_id"),
+        "options": options
+    })
+    job_events.reopen(job_id)
+    config, profile = options.get("config"), options.get("profile")
+    tenant = request.headers.get("X-Tenant-ID") or options.get("tenant") or result.get("spreadsheet_id") or job_id
+    try:
+        if async_runner is not None:
+            submit_async(job_id, lambda: run_analysis_job_async(job_id, config, profile=profile, resume_from=node))
+        else:
+            scheduler.submit(job_id, partial(run_analysis_job, profile=profile, resume_from=node), job_id, config,
+                             tenant=tenant, priority=options.get("priority", 0))
+    except QueueFull as e:
+        job_store.put(job_id, result)
+        response = jsonify({"error": "Too many queued analysis jobs", "retry_after": e.retry_after})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+    
+    logger.info(f"Resuming job {job_id} at {node}")
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "resume_from": node,
+        "queue_position": queue_position(job_id)
+    }), 202
+
+
+@app.route('/stream/<job_id>', methods=['GET'])
+def stream_job(job_id):
+    """
+    Server-Sent Events for a job: "status", "node" (a graph step finished),
+    "token" (a fragment of the insights text) and a final "done" event.
+    Reconnecting clients resume after the Last-Event-ID header.
+    """
+    result = job_store.get(job_id)
+    if result is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    # Coalesced jobs stream the events of the job they are attached to
+    leader_id = result.get("coalesced_into")
+    if leader_id and result["status"] in ("queued", "running"):
+        job_id = leader_id
+    
+    try:
+        last_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id", 0))
+    except ValueError:
+        last_id = 0
+    
+    def generate():
+        if result["status"] in ("completed", "error") and not job_events.has_log(job_id):
+            yield f"event: done\ndata: {json.dumps(done_event(result))}\n\n"
+            return
+        for item in job_events.subscribe(job_id, last_id=last_id):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event, data = item
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route('/jobs', methods=['GET'])
 def list_jobs():
-    """List all jobs and their status"""
-    jobs = []
-    for job_id, result in job_results.items():
-        jobs.append({
-            "job_id": job_id,
-            "status": result["status"]
-        })
+    """
+    List jobs newest first
     
-    return jsonify({
-        "total_jobs": len(jobs),
-        "jobs": jobs
-    }), 200
+    Query parameters: status, spreadsheet_id, limit (default 50, max 500), offset
+    """
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    total, jobs = job_store.list(
+        status=request.args.get('status'),
+        spreadsheet_id=request.args.get('spreadsheet_id'),
+        limit=limit,
+        offset=offset
+    )
+    
+    return api_response({
+        "total_jobs": total,
+        "limit": limit,
+        "offset": offset,
+        "jobs": jobs,
+        "scheduler": scheduler.stats(),
+        "async_runner": async_runner.stats() if async_runner is not None else None,
+        "coalescing": single_flight.stats(),
+        "llm": get_llm_pool().stats(),
+        "sheets_quota": get_rate_limiter().stats()
+    })
+
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_spreadsheet_batch():
+    """
+    Analyze many spreadsheet ranges in one call, streaming results as they finish
+    
+    Request body:
+    {
+        "sheets": [
+            {"spreadsheet_id": "id_1", "read_range": "Sheet1!A1:Z1000"},
+            {"spreadsheet_id": "id_1", "read_range": "Sheet2!A1:F500"},
+            {"spreadsheet_id": "id_2"}
+        ],
+        "model": "llama2",
+        "context": "Shared defaults for every sheet; items may override them"
+    }
+    
+    The response is newline-delimited JSON: one object per sheet in completion
+    order (with "index" pointing back into "sheets"), then a final summary line.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get("sheets"), list) or not data["sheets"]:
+        return jsonify({"error": "Request body with a non-empty 'sheets' list is required"}), 400
+    
+    max_sheets = int(os.getenv('BATCH_MAX_SHEETS', 500))
+    if len(data["sheets"]) > max_sheets:
+        return jsonify({"error": f"At most {max_sheets} sheets per batch"}), 400
+    
+    defaults = {k: v for k, v in data.items() if k != "sheets"}
+    try:
+        items = [build_config({**defaults, **(item or {})}) for item in data["sheets"]]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    missing = [i for i, item in enumerate(items) if not item["spreadsheet_id"]]
+    if missing:
+        return jsonify({"error": "spreadsheet_id is required", "items": missing}), 400
+    
+    logger.info(f"Starting batch analysis of {len(items)} sheets")
+    
+    def generate():
+        failed = 0
+        for result in run_batch(items):
+            failed += result["status"] == "error"
+            yield dumps(result) + b"\n"
+        yield dumps({"done": True, "total": len(items), "failed": failed}) + b"\n"
+        logger.info(f"Batch analysis finished: {len(items)} sheets, {failed} failed")
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and sizes of the analysis result cache"""
+    cache = get_result_cache()
+    if cache is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **cache.stats()}), 200
+
+
+@app.route('/llm/stats', methods=['GET'])
+def llm_stats():
+    """Queue depth and in-flight requests per Ollama endpoint, for sizing replicas"""
+    return jsonify(get_llm_pool().stats()), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: node latencies, rows/bytes ingested, LLM tokens, cache, queues and jobs"""
+    return Response(metrics_registry.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
 
 
 @app.route('/analyze/sync', methods=['POST'])
@@ -206,28 +833,34 @@ def analyze_spreadsheet_sync():
         if not data:
             return jsonify({"error": "Request body is required"}), 400
         
-        config = {
-            "spreadsheet_id": data.get("spreadsheet_id", os.getenv("SPREADSHEET_ID", "")),
-            "read_range": data.get("read_range", os.getenv("READ_RANGE", "Sheet1!A1:Z1000")),
-            "write_range": data.get("write_range", os.getenv("WRITE_RANGE", "Sheet1!AB1")),
-            "service_account_json": data.get("service_account_json", os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON", "credentials/service_account.json")),
-            "model": data.get("model", os.getenv("LLM_MODEL", "llama2")),
-            "base_url": data.get("base_url", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")),
-            "context": data.get("context", os.getenv("ANALYSIS_CONTEXT", "")),
-            "raw_data": [],
-            "analysis": {},
-            "insights": "",
-            "error": ""
-        }
+        try:
+            config = build_config(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         if not config["spreadsheet_id"]:
             return jsonify({"error": "spreadsheet_id is required"}), 400
         
+        # A caller is waiting on this response, so its Sheets reads go ahead of queued jobs
+        config["sheets_priority"] = INTERACTIVE
+        
         logger.info(f"Starting synchronous analysis for spreadsheet {config['spreadsheet_id']}")
         
-        # Create and run the agent graph
-        agent_graph = create_agent_graph()
-        final_state = agent_graph.invoke(config)
+        # Run the shared compiled agent graph, keeping the latest state so the
+        # row buffer can be freed even when the run stops before analyze_data
+        final_state = {}
+        try:
+            if async_runner is not None:
+                async def run_graph():
+                    nonlocal final_state
+                    async for state in get_graph(ASYNC_GRAPH).astream(config, stream_mode="values"):
+                        final_state = state
+                async_runner.submit(run_graph).result()
+            else:
+                for state in get_graph().stream(config, stream_mode="values"):
+                    final_state = state
+        finally:
+            release_rows(final_state.get("rows_handle"))
         
         if final_state.get("error"):
             return jsonify({
@@ -235,22 +868,25 @@ def analyze_spreadsheet_sync():
                 "error": final_state["error"]
             }), 500
         
-        return jsonify({
+        return api_response({
             "status": "completed",
             "data": {
-                "rows_read": len(final_state.get('raw_data', [])),
-                "analysis": final_state.get('analysis', {}),
+                "rows_read": final_state.get('rows_read', 0),
+                "analysis": compact_analysis(final_state.get('analysis', {})),
                 "insights": final_state.get('insights', ''),
                 "spreadsheet_id": final_state.get('spreadsheet_id'),
                 "write_range": final_state.get('write_range')
             }
-        }), 200
+        })
         
     except Exception as e:
         logger.error(f"Error in synchronous analysis: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
+startup.mark("up")
+
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
@@ -262,4 +898,5 @@ if __name__ == '__main__':
     logger.info(f"Debug mode: {debug}")
     logger.info("=" * 80)
     
+    start_services()
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""Local stand-ins for Google Sheets and Ollama with tunable latency.
+
+``fake_sheets`` and ``fake_ollama`` swap the network edges of ``agent.sheets``
+and ``agent.llmpool`` for in-process fakes, so everything between them (the
+rate limiter, the client pool, the LLM endpoint limiter, the graph, the
+Flask app) runs unchanged. Sheet contents come from ``synthetic_rows``.
+"""
+import asyncio
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import httpx
+from langchain_core.messages import AIMessageChunk
+
+from agent import llmpool, ratelimit, sheets
+from agent.sheets import parse_a1_range, _column_number
+
+COLUMN_KINDS = ("numeric", "currency", "percent", "date", "category", "boolean", "text")
+
+CATEGORIES = ["north", "south", "east", "west", "central"]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def _cell(kind, rng):
+    if kind == "numeric":
+        return str(round(rng.gauss(100, 25), 2))
+    if kind == "currency":
+        value = rng.lognormvariate(6, 1)
+        return f"${value:,.2f}" if rng.random() > 0.05 else f"$({value:,.2f})"
+    if kind == "percent":
+        return f"{rng.uniform(0, 100):.1f}%"
+    if kind == "date":
+        return (datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(2000))).isoformat()
+    if kind == "category":
+        return rng.choice(CATEGORIES)
+    if kind == "boolean":
+        return rng.choice(["TRUE", "FALSE"])
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def synthetic_rows(rows=1000, columns=8, kinds=None, ragged=0.0, missing=0.0, seed=0):
+    """Header plus ``rows`` data rows shaped like a Sheets ``values`` payload.
+
+    Column kinds cycle through ``kinds`` (default: every kind). ``missing`` is
+    the share of blank cells; ``ragged`` is the share of rows whose trailing
+    cells are dropped, as the API does for rows that end in empty cells.
+    """
+    rng = random.Random(seed)
+    kinds = list(kinds or COLUMN_KINDS)
+    column_kinds = [kinds[i % len(kinds)] for i in range(columns)]
+    data = [[f"{kind}_{i + 1}" for i, kind in enumerate(column_kinds)]]
+    for _ in range(rows):
+        row = ["" if rng.random() < missing else _cell(kind, rng) for kind in column_kinds]
+        if rng.random() < ragged:
+            row = row[:rng.randint(1, columns)]
+        while row and row[-1] == "":
+            row.pop()
+        data.append(row)
+    return data
+
+
+class FakeSpreadsheet:
+    """One sheet's grid served with a fixed per-request latency plus a per-row cost."""
+
+    def __init__(self, rows, latency=0.05, per_row_latency=0.0, title="Sheet1"):
+        self.rows = rows
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.title = title
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def column_count(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def values(self, a1_range):
+        _, first_col, first_row, last_col, last_row = parse_a1_range(a1_range)
+        first = (first_row or 1) - 1
+        last = last_row if last_row is not None else len(self.rows)
+        left = _column_number(first_col) - 1 if first_col else 0
+        right = _column_number(last_col) if last_col else None
+        values = [row[left:right] for row in self.rows[first:last]]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def delay(self, rows):
+        with self._lock:
+            self.requests += 1
+        return self.latency + self.per_row_latency * rows
+
+
+class _Request:
+    def __init__(self, spreadsheet, build):
+        self.spreadsheet = spreadsheet
+        self.build = build
+
+    def execute(self):
+        result, rows = self.build()
+        time.sleep(self.spreadsheet.delay(rows))
+        return result
+
+
+class _Values:
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def get(self, spreadsheetId, range):
+        def build():
+            values = self.spreadsheet.values(range)
+            return {"range": range, "values": values}, len(values)
+        return _Request(self.spreadsheet, build)
+
+    def batchGet(self, spreadsheetId, ranges):
+        def build():
+            value_ranges = [{"range": a1, "values": self.spreadsheet.values(a1)} for a1 in ranges]
+            return {"valueRanges": value_ranges}, sum(len(v["values"]) for v in value_ranges)
+        return _Request(self.spreadsheet, build)
+
+
+class _Spreadsheets:
+    """Just enough of ``service.spreadsheets()`` for the calls in ``agent.sheets``."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def values(self):
+        return _Values(self.spreadsheet)
+
+    def get(self, spreadsheetId, ranges=None, fields=None):
+        def build():
+            grid = {"rowCount": len(self.spreadsheet.rows), "columnCount": self.spreadsheet.column_count}
+            return {"sheets": [{"properties": {"title": self.spreadsheet.title, "gridProperties": grid}}]}, 0
+        return _Request(self.spreadsheet, build)
+
+
+class _Credentials:
+    valid = True
+    token = "fake-token"
+
+
+class _FakeClientPool:
+    def __init__(self, spreadsheet, json_path):
+        self.spreadsheet = spreadsheet
+        self.json_path = json_path
+        self.credentials = _Credentials()
+
+    @contextmanager
+    def checkout(self):
+        yield _Spreadsheets(self.spreadsheet)
+
+    def refresh(self):
+        pass
+
+
+def _async_client(spreadsheet):
+    async def handler(request):
+        a1 = request.url.path.rsplit("/values/", 1)[1]
+        values = spreadsheet.values(a1)
+        await asyncio.sleep(spreadsheet.delay(len(values)))
+        return httpx.Response(200, json={"range": a1, "values": values})
+
+    clients = {}
+
+    def get():
+        loop = asyncio.get_running_loop()
+        if loop not in clients:
+            clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return clients[loop]
+    return get
+
+
+@contextmanager
+def fake_sheets(spreadsheet, reads_per_minute=1e9):
+    """Serve every Sheets call (sync, async, batch, metadata) from ``spreadsheet``.
+
+    The real rate limiter stays in the path with ``reads_per_minute`` as both
+    the account and spreadsheet quota; the default effectively disables it.
+    """
+    limiter = ratelimit.SheetsRateLimiter(reads_per_minute, reads_per_minute, 0.0)
+    with mock.patch.object(sheets, "_resolve_json_path", lambda path: path or "fake.json"), \
+            mock.patch.object(sheets, "get_client_pool", lambda path, scopes=None: _FakeClientPool(spreadsheet, path)), \
+            mock.patch.object(sheets, "_async_http", _async_client(spreadsheet)), \
+            mock.patch.object(ratelimit, "_limiter", limiter):
+        yield spreadsheet
+
+
+class FakeChatOllama:
+    """Streams a canned completion after ``ttft`` seconds at ``tokens_per_second``."""
+
+    def __init__(self, ttft=0.2, tokens_per_second=50.0, completion_tokens=120):
+        self.ttft = ttft
+        self.token_delay = 1.0 / tokens_per_second if tokens_per_second else 0.0
+        self.completion_tokens = completion_tokens
+
+    def _tokens(self):
+        return [f"{WORDS[i % len(WORDS)]} " for i in range(self.completion_tokens)]
+
+    def _usage(self, msgs):
+        prompt = sum(len(str(m.content)) for m in msgs) // 4
+        return {"input_tokens": prompt, "output_tokens": self.completion_tokens,
+                "total_tokens": prompt + self.completion_tokens}
+
+    def stream(self, msgs):
+        time.sleep(self.ttft)
+        for token in self._tokens():
+            yield AIMessageChunk(content=token)
+            time.sleep(self.token_delay)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(msgs))
+
+    async def astream(self, msgs):
+        await asyncio.sleep(self.ttft)
+        for token in self._tokens():
+            yield AIMessageChunk(content=token)
+            await asyncio.sleep(self.token_delay)
+        yield AIMessageChunk(content="", usage_metadata=self._usage(msgs))
+
+
+@contextmanager
+def fake_ollama(ttft=0.2, tokens_per_second=50.0, completion_tokens=120, endpoint_limit=None):
+    """Route every ``ChatOllama`` the pool would create to a ``FakeChatOllama``.
+
+    A fresh ``OllamaPool`` is installed so the endpoint limiter starts empty;
+    ``endpoint_limit`` overrides OLLAMA_NUM_PARALLEL for the run.
+    """
+    pool = llmpool.OllamaPool(default_limit=endpoint_limit or llmpool.DEFAULT_ENDPOINT_LIMIT)
+    fake = FakeChatOllama(ttft, tokens_per_second, completion_tokens)
+    with mock.patch.object(llmpool.OllamaPool, "_new_client", lambda self, *args: fake), \
+            mock.patch.object(llmpool, "_pool", pool):
+        yield pool
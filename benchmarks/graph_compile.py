@@ -0,0 +1,80 @@
+"""Per-request graph overhead: compile-per-request vs. the shared registry.
+
+Both modes run the full four-node workflow with the same stand-in Sheets
+read and LLM call used for registry warmup, so the difference between them
+is the cost of building and compiling the StateGraph on every request.
+
+    python benchmarks/graph_compile.py --iterations 200
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from agent.graph import create_agent_graph
+from agent.registry import GraphRegistry, _warmup_config, _warmup_state
+
+
+def _percentile(samples, q):
+    """Nearest-rank percentile of sorted samples."""
+    return samples[max(math.ceil(q / 100 * len(samples)) - 1, 0)]
+
+
+def _summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": _percentile(samples, 50) * 1000,
+        "p95_ms": _percentile(samples, 95) * 1000,
+    }
+
+
+def bench_compile_per_request(iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        graph = create_agent_graph()
+        graph.invoke(_warmup_state(), _warmup_config())
+        samples.append(time.perf_counter() - started)
+    return _summarize(samples)
+
+
+def bench_registry(iterations):
+    registry = GraphRegistry()
+    registry.register("standin", create_agent_graph)
+    registry.get("standin")
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        graph = registry.get("standin")
+        graph.invoke(_warmup_state(), _warmup_config())
+        samples.append(time.perf_counter() - started)
+    return _summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    bench_registry(5)
+
+    before = bench_compile_per_request(args.iterations)
+    after = bench_registry(args.iterations)
+    print(json.dumps({
+        "iterations": args.iterations,
+        "compile_per_request": before,
+        "shared_registry": after,
+        "saved_per_request_ms": before["mean_ms"] - after["mean_ms"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
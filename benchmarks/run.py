@@ -0,0 +1,282 @@
+"""Offline benchmark suite: analysis throughput, graph latency and API load.
+
+Sheets and Ollama are replaced by the stand-ins in ``benchmarks/fakes.py``,
+so no credentials or model server are needed. Results are written as JSON
+together with the commit they were measured on; ``--compare`` checks them
+against an earlier run and exits non-zero on a regression.
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --scenarios analyze graph --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fakes import FakeSpreadsheet, fake_ollama, fake_sheets, synthetic_rows
+
+from agent.analysis import analyze_rows
+from agent.graph import create_agent_graph, create_async_agent_graph
+from agent.metrics import JobProfiler
+
+SCENARIOS = ("analyze", "graph", "app")
+
+
+def _percentile(samples, q):
+    """Nearest-rank percentile of sorted samples: the smallest value with q% at or below it."""
+    return samples[max(math.ceil(q / 100 * len(samples)) - 1, 0)]
+
+
+def _summarize(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+    }
+
+
+def _state(spreadsheet_id="bench"):
+    return {
+        "spreadsheet_id": spreadsheet_id,
+        "read_range": "Sheet1",
+        "write_range": "",
+        "service_account_json": "bench.json",
+        "model": "bench",
+        "base_url": "http://bench:11434",
+        "context": "",
+        "use_cache": False,
+        "analysis": {},
+        "insights": "",
+        "error": "",
+    }
+
+
+def bench_analyze(args):
+    """``analyze_rows`` wall time and throughput per sheet size."""
+    results = {}
+    for size in args.rows:
+        data = synthetic_rows(size, args.columns, ragged=args.ragged, missing=args.missing, seed=args.seed)
+        analyze_rows(data[:50])
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            analysis = analyze_rows(data)
+            samples.append(time.perf_counter() - started)
+        if "error" in analysis:
+            raise RuntimeError(f"analyze_rows failed on {size} rows: {analysis['error']}")
+        summary = _summarize(samples)
+        summary["rows_per_s"] = round(size / (summary["p50_ms"] / 1000), 1)
+        results[f"rows_{size}"] = summary
+    return results
+
+
+def _node_means(profilers):
+    spans = {}
+    for profiler in profilers:
+        for span in profiler.spans:
+            spans.setdefault(span["node"], []).append(span["duration_ms"])
+    return {node: round(statistics.fmean(values), 3) for node, values in spans.items()}
+
+
+def bench_graph(args):
+    """End-to-end latency of the sync and async graphs, with a per-node breakdown."""
+    spreadsheet = FakeSpreadsheet(
+        synthetic_rows(args.graph_rows, args.columns, ragged=args.ragged, missing=args.missing, seed=args.seed),
+        latency=args.sheets_latency,
+    )
+    results = {}
+    with fake_sheets(spreadsheet), fake_ollama(args.ttft, args.tokens_per_second, args.completion_tokens):
+        for name, graph in (("sync", create_agent_graph()), ("async", create_async_agent_graph())):
+            samples, profilers = [], []
+            for _ in range(args.repeat):
+                profiler = JobProfiler()
+                config = {"configurable": {"profiler": profiler}}
+                started = time.perf_counter()
+                if name == "sync":
+                    final_state = graph.invoke(_state(), config)
+                else:
+                    final_state = asyncio.run(graph.ainvoke(_state(), config))
+                samples.append(time.perf_counter() - started)
+                profilers.append(profiler)
+                if final_state.get("error"):
+                    raise RuntimeError(f"{name} graph failed: {final_state['error']}")
+            results[name] = {**_summarize(samples), "nodes_mean_ms": _node_means(profilers)}
+    return results
+
+
+def bench_app(args):
+    """Job latency and throughput of ``/analyze`` under concurrent clients."""
+    os.environ.setdefault("WORKER_POOL_SIZE", str(args.workers))
+    os.environ.setdefault("GRAPH_WARMUP", "False")
+    spreadsheet = FakeSpreadsheet(
+        synthetic_rows(args.app_rows, args.columns, ragged=args.ragged, missing=args.missing, seed=args.seed),
+        latency=args.sheets_latency,
+    )
+    with fake_sheets(spreadsheet), fake_ollama(args.ttft, args.tokens_per_second, args.completion_tokens):
+        import app as api
+
+        latencies, rejected, failed = [], [], []
+        lock = threading.Lock()
+
+        def client(jobs):
+            http = api.app.test_client()
+            for _ in range(jobs):
+                started = time.perf_counter()
+                # Distinct ids so requests are not coalesced into one run
+                body = {k: v for k, v in _state(spreadsheet_id=str(uuid.uuid4())).items() if isinstance(v, (str, bool))}
+                response = http.post("/analyze", json=body)
+                if response.status_code == 429:
+                    with lock:
+                        rejected.append(1)
+                    continue
+                job_id = response.get_json()["job_id"]
+                while True:
+                    status = http.get(f"/status/{job_id}").get_json()
+                    if status["status"] in ("completed", "error"):
+                        break
+                    time.sleep(args.poll_interval)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    if status["status"] == "error":
+                        failed.append(status["error"])
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(args.jobs_per_client,)) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} jobs failed, first: {failed[0]}")
+    return {
+        "clients": args.clients,
+        "workers": int(os.environ["WORKER_POOL_SIZE"]),
+        "jobs": len(latencies),
+        "rejected": len(rejected),
+        "jobs_per_s": round(len(latencies) / elapsed, 2),
+        **_summarize(latencies),
+    }
+
+
+BENCHMARKS = {"analyze": bench_analyze, "graph": bench_graph, "app": bench_app}
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, threshold):
+    """Print metric changes against ``baseline``; return the regressions beyond ``threshold``."""
+    current, previous = _flatten(results), _flatten(baseline)
+    regressions = []
+    for name in sorted(current.keys() & previous.keys()):
+        # Latencies should go down and throughputs up; other numbers are informational
+        if name.endswith("_ms"):
+            lower_is_better = True
+        elif name.endswith("_per_s"):
+            lower_is_better = False
+        else:
+            continue
+        before, after = previous[name], current[name]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = change > threshold if lower_is_better else change < -threshold
+        print(f"{'REGRESSION' if worse else 'ok':<10} {name:<55} {before:>12.3f} -> {after:>12.3f} ({change:+.1%})",
+              file=sys.stderr)
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="sheet sizes for the analyze scenario")
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--ragged", type=float, default=0.05, help="share of rows with trailing cells dropped")
+    parser.add_argument("--missing", type=float, default=0.02, help="share of blank cells")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--graph-rows", type=int, default=5000)
+    parser.add_argument("--app-rows", type=int, default=2000)
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="seconds per Sheets request")
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds to the first LLM token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--jobs-per-client", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": {},
+    }
+    for name in args.scenarios:
+        started = time.perf_counter()
+        report["results"][name] = BENCHMARKS[name](args)
+        print(f"{name}: {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
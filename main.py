@@ -1,13 +1,28 @@
 import os
 import sys
+import json
+import asyncio
+import argparse
 import logging
+from typing import TYPE_CHECKING
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# Imported first so the startup report covers everything below
+from agent.startup import startup
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+from agent.registry import get_graph, ASYNC_GRAPH
+from agent.batch import run_batch
+from agent.serialize import to_jsonable
+from agent.metrics import JobMemory
+from agent.approxconfig import approximation_settings
 
-from agent.graph import create_agent_graph, AgentState
+if TYPE_CHECKING:
+    from agent.graph import AgentState
 
 logging.basicConfig(
     level=logging.INFO,
@@ -16,13 +31,8 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def main():
-    
-    logger.info("=" * 80)
-    logger.info("STARTING SPREADSHEET ANALYSIS AGENT")
-    logger.info("=" * 80)
-    
-    config = {
+def default_config():
+    return {
         "spreadsheet_id": os.getenv("SPREADSHEET_ID", "your_spreadsheet_id"),
         "read_range": os.getenv("READ_RANGE", "Sheet1!A1:Z1000"),
         "write_range": os.getenv("WRITE_RANGE", "Sheet1!AB1"),
@@ -30,17 +40,75 @@ def main():
         "model": os.getenv("LLM_MODEL", "llama2"),
         "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
         "context": os.getenv("ANALYSIS_CONTEXT", ""),
-        "raw_data": [],
+        "streaming": os.getenv("ANALYSIS_STREAMING", "False").lower() == "true",
+        "incremental": os.getenv("ANALYSIS_INCREMENTAL", "False").lower() == "true",
+        "approximate": os.getenv("ANALYSIS_APPROXIMATE", "False").lower() == "true",
         "analysis": {},
         "insights": "",
         "error": ""
     }
+
+
+def run_batch_file(path):
+    """
+    Analyze every sheet listed in a JSON file and print one JSON line per sheet
+    
+    The file holds either a list of {"spreadsheet_id", "read_range", ...} objects
+    or {"sheets": [...], ...shared overrides}; env settings fill in the rest.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if isinstance(spec, list):
+        spec = {"sheets": spec}
+    defaults = {**default_config(), **{k: v for k, v in spec.items() if k != "sheets"}}
+    items = [{**defaults, **item} for item in spec.get("sheets", [])]
     
+    logger.info(f"Running batch analysis over {len(items)} sheets from {path}")
+    failed = 0
+    for result in run_batch(items):
+        failed += result["status"] == "error"
+        print(json.dumps(to_jsonable(result)), flush=True)
+    
+    logger.info(f"Batch finished: {len(items)} sheets, {failed} failed")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spreadsheet analysis agent")
+    parser.add_argument("--batch", metavar="FILE", help="JSON file listing sheets to analyze in one run")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="run the graph with non-blocking Sheets and Ollama I/O")
+    parser.add_argument("--approximate", action="store_true",
+                        help="summarize a sample of rows and report confidence intervals")
+    parser.add_argument("--accuracy", type=float,
+                        help="relative accuracy of approximate means (default ANALYSIS_ACCURACY or 0.05)")
+    parser.add_argument("--startup-report", action="store_true",
+                        default=os.getenv("STARTUP_REPORT", "False").lower() == "true",
+                        help="log where the run spent its time before and while running the graph")
+    args = parser.parse_args()
+    startup.mark("imports_done")
+    
+    if args.batch:
+        return run_batch_file(args.batch)
+    
+    logger.info("=" * 80)
+    logger.info("STARTING SPREADSHEET ANALYSIS AGENT")
+    logger.info("=" * 80)
+    
+    config = default_config()
+    if args.approximate:
+        config["approximate"] = True
     try:
-        logger.info("\nCreating LangGraph workflow...")
-        agent_graph = create_agent_graph()
+        config["accuracy"], config["confidence"] = approximation_settings({"accuracy": args.accuracy})
+    except ValueError as e:
+        parser.error(str(e))
+    
+    try:
+        logger.info("\nLoading compiled LangGraph workflow...")
+        with startup.phase("compile graph"):
+            agent_graph = get_graph(ASYNC_GRAPH) if args.use_async else get_graph()
         
-        initial_state: AgentState = config
+        initial_state: "AgentState" = config
         
         logger.info("\nInvoking workflow with the following config:")
         logger.info(f"  - Spreadsheet ID: {config['spreadsheet_id']}")
@@ -49,7 +117,14 @@ def main():
         logger.info(f"  - Ollama Base URL: {config['base_url']}")
         logger.info("\n" + "=" * 80)
         
-        final_state = agent_graph.invoke(initial_state)
+        memory = JobMemory().start()
+        run_config = {"configurable": {"memory": memory}}
+        with startup.phase("run graph"):
+            if args.use_async:
+                final_state = asyncio.run(agent_graph.ainvoke(initial_state, run_config))
+            else:
+                final_state = agent_graph.invoke(initial_state, run_config)
+        memory.stop()
         
         logger.info("=" * 80)
         logger.info("\nWORKFLOW EXECUTION COMPLETED\n")
@@ -65,9 +140,24 @@ def main():
             logger.info("-" * 80)
         
         logger.info("\nFINAL STATE:")
-        logger.info(f"  - Data rows read: {len(final_state.get('raw_data', []))}")
+        logger.info(f"  - Data rows read: {final_state.get('rows_read', 0)}")
         logger.info(f"  - Analysis completed: {'Yes' if final_state.get('analysis') else 'No'}")
+        approximate = final_state.get("analysis", {}).get("approximate")
+        if approximate:
+            logger.info(
+                f"  - Approximate: {approximate['rows_sampled']} of ~{approximate['rows_total_est']} rows sampled, "
+                f"converged: {approximate['converged']}"
+            )
         logger.info(f"  - Insights generated: {'Yes' if final_state.get('insights') else 'No'}")
+        peak = memory.report()
+        if peak["peak_rss_bytes"] is not None:
+            logger.info(
+                f"  - Peak memory: {peak['peak_rss_bytes'] / 2**20:.1f} MiB "
+                f"(+{peak['peak_delta_bytes'] / 2**20:.1f} MiB during the run, in {peak['peak_node'] or 'setup'})"
+            )
+        
+        if args.startup_report:
+            logger.info(f"\nSTARTUP REPORT:\n{startup.format()}")
         
         if final_state.get("error"):
             logger.error(f"\nError: {final_state['error']}")
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRunner:
+    """Event loop on a background thread for running many graphs concurrently.
+
+    Synchronous callers (Flask views, scheduler threads) hand coroutines to
+    ``submit`` and get a ``concurrent.futures.Future`` back. At most
+    ``max_in_flight`` coroutines run at once; the rest wait on the loop
+    without holding a thread, in submission order; ``position`` reports
+    where a job submitted with an id is in that line.
+    """
+
+    def __init__(self, max_in_flight: int = 200):
+        self.max_in_flight = max_in_flight
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._waiting: "OrderedDict[str, None]" = OrderedDict()
+        self._thread = threading.Thread(target=self._run_loop, name="async-runner", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _guarded(self, factory: Callable[[], Awaitable], job_id: Optional[str] = None):
+        async with self._semaphore:
+            with self._lock:
+                self._pending -= 1
+                self._waiting.pop(job_id, None)
+                self._running += 1
+            try:
+                return await factory()
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def submit(self, factory: Callable[[], Awaitable], job_id: Optional[str] = None) -> Future:
+        """Schedule ``factory()`` on the loop; the coroutine is created only once a slot is free."""
+        with self._lock:
+            self._pending += 1
+            if job_id is not None:
+                self._waiting[job_id] = None
+        return asyncio.run_coroutine_threadsafe(self._guarded(factory, job_id), self._loop)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a waiting job, or None once it has started."""
+        with self._lock:
+            for index, waiting_id in enumerate(self._waiting):
+                if waiting_id == job_id:
+                    return index + 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"max_in_flight": self.max_in_flight, "running": self._running, "waiting": self._pending}
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
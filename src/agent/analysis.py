@@ -1,10 +1,30 @@
+import os
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from .ingest import CATEGORICAL, build_frame
+from .stats import SheetAccumulator
+from .parallel import profile_columns
+
 logger=logging.getLogger(__name__)
 
+NUMERICAL_DTYPES=["number","datetime"]
+CATEGORICAL_DTYPES=["object","string","category","bool","boolean"]
+
+# Inputs above this many rows are summarized chunk by chunk with the
+# one-pass accumulators in stats.py instead of a single describe()
+STREAMING_ROW_THRESHOLD=int(os.getenv("ANALYSIS_STREAMING_THRESHOLD","200000"))
+STREAMING_CHUNK_ROWS=int(os.getenv("ANALYSIS_CHUNK_ROWS","50000"))
+# Outliers, histograms and correlations per numeric column (see parallel.py)
+COLUMN_PROFILE=os.getenv("ANALYSIS_COLUMN_PROFILE","True").lower()=="true"
+
+def _describe(df,dtypes):
+    selected=df.select_dtypes(include=dtypes)
+    if selected.columns.empty:
+        return pd.DataFrame()
+    return selected.describe()
+
 def analyze_rows(rows: List[List[Any]]):
     if not rows:
         return {
@@ -16,17 +36,98 @@ def analyze_rows(rows: List[List[Any]]):
         return {
             "error":"no rows after header"
         }
-    df=pd.DataFrame(data,columns=header)
+    if len(data)>STREAMING_ROW_THRESHOLD:
+        logger.info(f"Summarizing {len(data)} rows with the streaming engine")
+        return analyze_row_blocks(
+            [rows[start:start+STREAMING_CHUNK_ROWS] for start in range(0,len(rows),STREAMING_CHUNK_ROWS)]
+        )
+    df,column_types=build_frame(header,data)
+    return _summarize_frame(df,column_types)
 
+def _summarize_frame(df,column_types):
     logger.info("Summary of the numerical columns")
     summary_of_numerical_columns={}
-    summary_of_numerical_columns['summary']=df.describe()
+    summary_of_numerical_columns['summary']=_describe(df,NUMERICAL_DTYPES)
+    if COLUMN_PROFILE:
+        summary_of_numerical_columns.update(profile_columns(df,column_types))
     logger.info("Summary of categorical columns")
     summary_of_categorical_columns={}
 
-    summary_of_categorical_columns['summary']=df.describe(include='object')
+    summary_of_categorical_columns['summary']=_describe(df,CATEGORICAL_DTYPES)
 
     summary={"summary_of_numerical_columns":summary_of_numerical_columns,
-             "summary_of_categorical_columns":summary_of_categorical_columns}
+             "summary_of_categorical_columns":summary_of_categorical_columns,
+             "column_types":column_types,
+             "rows_analyzed":len(df)}
+
+    return summary
+
+
+def analyze_frame_blocks(blocks: Iterable[List[List[Any]]]):
+    """Exact ``analyze_rows`` summary of a sheet delivered as consecutive row blocks.
+
+    Each block is converted to typed columns as it arrives, with column kinds
+    and date formats decided on the first block as in ``analyze_row_blocks``,
+    and the typed blocks are concatenated; the rows never exist as one list
+    of Python strings. Meant for inputs up to STREAMING_ROW_THRESHOLD rows,
+    whose typed frame fits in memory.
+    """
+    header=None
+    column_types=None
+    date_formats={}
+    frames=[]
+    for block in blocks:
+        rows=getattr(block,"rows",block)
+        if header is None:
+            if not rows:
+                continue
+            header,rows=rows[0],rows[1:]
+        if not rows:
+            continue
+        frame,column_types=build_frame(header,rows,schema=column_types,date_formats=date_formats)
+        frames.append(frame)
+
+    if header is None:
+        return {"error":"No Data"}
+    if not frames:
+        return {"error":"no rows after header"}
+    df=frames[0] if len(frames)==1 else pd.concat(frames,ignore_index=True)
+    # Blocks with different category sets concatenate to object columns
+    for name,kind in column_types.items():
+        if kind==CATEGORICAL and name in df and df[name].dtype!="category":
+            df[name]=df[name].astype("category")
+    return _summarize_frame(df,column_types)
+
+
+def analyze_row_blocks(blocks: Iterable[List[List[Any]]]):
+    """Summarize a sheet delivered as consecutive row blocks.
+
+    The first row of the first block is the header. Each block is folded into
+    a SheetAccumulator and then dropped, so memory is bounded by the block
+    size. Accepts plain lists of rows or sheets.RowBlock objects, which lets
+    ``sheets.iter_sheet_blocks`` feed it directly. The result has the same
+    shape as ``analyze_rows`` plus ``rows_analyzed``.
+    """
+    header=None
+    accumulator=None
+    for block in blocks:
+        rows=getattr(block,"rows",block)
+        if header is None:
+            if not rows:
+                continue
+            header,rows=rows[0],rows[1:]
+        if not rows:
+            continue
+        if accumulator is None:
+            accumulator=SheetAccumulator.from_rows(header,rows)
+        else:
+            accumulator.update_rows(rows)
+
+    if header is None:
+        return {"error":"No Data"}
+    if accumulator is None:
+        return {"error":"no rows after header"}
 
+    summary=accumulator.to_summary()
+    summary["rows_analyzed"]=accumulator.rows
     return summary
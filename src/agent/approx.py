@@ -0,0 +1,324 @@
+import os
+import math
+import random
+import logging
+from collections import Counter
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .approxconfig import DEFAULT_ACCURACY, approximation_settings
+from .ingest import DATETIME, build_frame
+from .sheets import SheetsConfig, batch_read, get_sheet_extent, parse_a1_range, _quote_sheet, _column_letters
+from .stats import NUMERIC_KINDS, SheetAccumulator
+
+logger = logging.getLogger(__name__)
+
+# Sampling unit: a contiguous window of rows, fetched as one A1 range
+WINDOW_ROWS = int(os.getenv("APPROX_WINDOW_ROWS", "500"))
+# The sheet is split into this many equal strata; each round reads one window from each
+STRATA = int(os.getenv("APPROX_STRATA", "16"))
+
+
+class _WindowStats:
+    """Per-window sums for one column, the inputs of the cluster-sample variance."""
+
+    def __init__(self):
+        self.counts: List[int] = []
+        self.sums: List[float] = []
+        self.values: List[np.ndarray] = []
+        self.tallies: List[Counter] = []
+
+
+def _numeric_values(series: pd.Series, kind: str) -> np.ndarray:
+    # Same conversion as NumericAccumulator.update: datetimes as int64 nanoseconds
+    if kind == DATETIME:
+        return series.dropna().astype("datetime64[ns]").astype("int64").to_numpy(dtype="float64")
+    return pd.to_numeric(series, errors="coerce").dropna().to_numpy(dtype="float64")
+
+
+def _timestamp(value: float):
+    return pd.Timestamp(int(value)) if math.isfinite(value) else pd.NaT
+
+
+def _ratio_interval(numerators: np.ndarray, denominators: np.ndarray, fpc: float, z: float) -> Tuple[float, float]:
+    """Ratio estimate sum(y)/sum(x) over sampled windows and its half-width (Taylor linearization)."""
+    total = denominators.sum()
+    if total == 0:
+        return float("nan"), float("nan")
+    estimate = numerators.sum() / total
+    m = len(denominators)
+    if m < 2:
+        return estimate, float("inf")
+    residuals = numerators - estimate * denominators
+    variance = fpc * (residuals ** 2).sum() / (m * (m - 1)) / (total / m) ** 2
+    return estimate, z * math.sqrt(max(variance, 0.0))
+
+
+def _total_interval(per_window: np.ndarray, windows_total: int, fpc: float, z: float) -> Tuple[float, float]:
+    """Expanded total (e.g. non-empty cells in the whole range) and its half-width."""
+    m = len(per_window)
+    estimate = per_window.mean() * windows_total
+    if m < 2:
+        return estimate, float("inf")
+    return estimate, z * windows_total * math.sqrt(fpc * per_window.var(ddof=1) / m)
+
+
+def _effective_size(n: int, mean_halfwidth: float, std: float, fpc: float, z: float) -> float:
+    """Sample size an independent sample would need for the same precision (n / design effect)."""
+    if not n or not std or not math.isfinite(mean_halfwidth) or mean_halfwidth == 0:
+        return float(n)
+    srs_halfwidth = z * std * math.sqrt(fpc / n)
+    deff = max((mean_halfwidth / srs_halfwidth) ** 2, 1.0)
+    return max(n / deff, 2.0)
+
+
+class ApproximateAnalysis:
+    """Stratified window sample of one range with confidence intervals.
+
+    The data rows are cut into windows of ``window_rows``; the windows are
+    split into ``strata`` contiguous strata and every round reads one random
+    window per stratum in a single ``batchGet``. Windows are clusters, so
+    means and shares use the ratio estimator with a cluster-sample variance
+    (with finite population correction); the other statistics use the pooled
+    sample with the effective sample size implied by that variance.
+    """
+
+    def __init__(self, header: List[Any], windows_total: int, confidence: float):
+        self.header = header
+        self.windows_total = windows_total
+        self.confidence = confidence
+        self.target = DEFAULT_ACCURACY
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.accumulator: Optional[SheetAccumulator] = None
+        self.schema: Optional[Dict[str, str]] = None
+        self.date_formats: Dict[str, str] = {}
+        self.window_rows: List[int] = []
+        self.columns: Dict[str, _WindowStats] = {}
+
+    @property
+    def windows_read(self) -> int:
+        return len(self.window_rows)
+
+    @property
+    def fpc(self) -> float:
+        return max(1.0 - self.windows_read / self.windows_total, 0.0) if self.windows_total else 0.0
+
+    def add_round(self, windows: List[List[List[Any]]]):
+        if self.schema is None:
+            # Column kinds are decided once, on everything the first round returned
+            pooled = [row for rows in windows for row in rows]
+            if pooled:
+                frame, self.schema = build_frame(self.header, pooled, date_formats=self.date_formats)
+                self.accumulator = SheetAccumulator(list(frame.columns), self.schema, self.date_formats)
+        for rows in windows:
+            self._add_window(rows)
+
+    def _add_window(self, rows: List[List[Any]]):
+        self.window_rows.append(len(rows))
+        frame = None
+        if rows and self.schema is not None:
+            frame, _ = build_frame(self.header, rows, schema=self.schema, date_formats=self.date_formats)
+            self.accumulator.update_frame(frame)
+        for name in (self.accumulator.columns if self.accumulator is not None else []):
+            stats = self.columns.setdefault(name, _WindowStats())
+            # Columns first seen in this window have no cells in the earlier ones
+            while len(stats.counts) < len(self.window_rows) - 1:
+                stats.counts.append(0)
+                stats.sums.append(0.0)
+                stats.tallies.append(Counter())
+            series = frame[name] if frame is not None and name in frame.columns else pd.Series([], dtype=object)
+            if self.schema.get(name) in NUMERIC_KINDS:
+                values = _numeric_values(series, self.schema[name])
+                stats.counts.append(len(values))
+                stats.sums.append(float(values.sum()))
+                stats.values.append(values)
+                stats.tallies.append(Counter())
+            else:
+                present = series.dropna()
+                stats.counts.append(len(present))
+                stats.sums.append(0.0)
+                stats.tallies.append(Counter(present.astype(object).tolist()))
+
+    def _numeric_intervals(self, name: str) -> Dict[str, Any]:
+        stats = self.columns[name]
+        counts = np.asarray(stats.counts, dtype="float64")
+        mean, mean_hw = _ratio_interval(np.asarray(stats.sums), counts, self.fpc, self.z)
+        count, count_hw = _total_interval(counts, self.windows_total, self.fpc, self.z)
+        values = np.sort(np.concatenate(stats.values)) if stats.values else np.empty(0)
+        n = len(values)
+        std = float(values.std(ddof=1)) if n > 1 else float("nan")
+        n_eff = _effective_size(n, mean_hw, std, self.fpc, self.z)
+        std_hw = self.z * std / math.sqrt(2 * max(n_eff - 1, 1.0)) if n > 1 else float("inf")
+        intervals = {
+            "count": [count - count_hw, count + count_hw],
+            "mean": [mean - mean_hw, mean + mean_hw],
+            "std": [max(std - std_hw, 0.0), std + std_hw],
+        }
+        points = {"count": count, "mean": mean, "std": std}
+        for q, label in ((0.25, "25%"), (0.5, "50%"), (0.75, "75%")):
+            if n == 0:
+                points[label], intervals[label] = float("nan"), [float("nan"), float("nan")]
+                continue
+            # Order-statistic interval, widened to the effective sample size
+            spread = self.z * math.sqrt(q * (1 - q) / n_eff)
+            lo, hi = max(q - spread, 0.0), min(q + spread, 1.0)
+            points[label] = float(np.quantile(values, q))
+            intervals[label] = [float(np.quantile(values, lo)), float(np.quantile(values, hi))]
+        scale = std if self.schema[name] == DATETIME else max(abs(mean), std)
+        converged = mean_hw == 0 or (math.isfinite(mean_hw) and scale == scale and mean_hw <= self.target * scale)
+        if self.schema[name] == DATETIME:
+            intervals = {
+                stat: [pd.Timedelta(v) if stat == "std" else _timestamp(v) for v in bounds] if stat != "count" else bounds
+                for stat, bounds in intervals.items()
+            }
+        return {"points": points, "intervals": intervals, "converged": converged}
+
+    def _categorical_intervals(self, name: str) -> Dict[str, Any]:
+        stats = self.columns[name]
+        counts = np.asarray(stats.counts, dtype="float64")
+        count, count_hw = _total_interval(counts, self.windows_total, self.fpc, self.z)
+        totals = Counter()
+        for tally in stats.tallies:
+            totals.update(tally)
+        if not totals:
+            return {"points": {"count": count}, "intervals": {"count": [count - count_hw, count + count_hw]},
+                    "converged": True}
+        top, _ = totals.most_common(1)[0]
+        share, share_hw = _ratio_interval(
+            np.asarray([tally.get(top, 0) for tally in stats.tallies], dtype="float64"), counts, self.fpc, self.z
+        )
+        return {
+            "points": {"count": count, "top": top, "freq": share * count, "unique": len(totals)},
+            "intervals": {
+                "count": [count - count_hw, count + count_hw],
+                "top_share": [max(share - share_hw, 0.0), min(share + share_hw, 1.0)],
+                # Values never sampled cannot be counted; the sample gives a lower bound
+                "unique": [len(totals), None],
+            },
+            "converged": share_hw <= self.target,
+        }
+
+    def estimate(self, target: float) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """Per-column point estimates and intervals, and whether every column met ``target``."""
+        self.target = target
+        results = {}
+        for name in (self.accumulator.columns if self.accumulator is not None else []):
+            if self.schema.get(name) in NUMERIC_KINDS:
+                results[name] = self._numeric_intervals(name)
+            else:
+                results[name] = self._categorical_intervals(name)
+        return results, all(result["converged"] for result in results.values())
+
+    def summary(self, results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """``analyze_rows``-shaped summary with counts and frequencies scaled to the whole range."""
+        summary = self.accumulator.to_summary()
+        numeric = summary["summary_of_numerical_columns"]["summary"]
+        categorical = summary["summary_of_categorical_columns"]["summary"]
+        for name, result in results.items():
+            points = result["points"]
+            if self.schema.get(name) in NUMERIC_KINDS:
+                if self.schema[name] == DATETIME:
+                    numeric.loc["count", name] = int(round(points["count"]))
+                    for stat in ("mean", "25%", "50%", "75%"):
+                        numeric.loc[stat, name] = _timestamp(points[stat])
+                else:
+                    numeric.loc["count", name] = float(round(points["count"]))
+                    for stat in ("mean", "std", "25%", "50%", "75%"):
+                        numeric.loc[stat, name] = points[stat]
+            elif "top" in points:
+                categorical.loc["count", name] = int(round(points["count"]))
+                categorical.loc["top", name] = points["top"]
+                categorical.loc["freq", name] = int(round(points["freq"]))
+        return summary
+
+
+def _window_ranges(config: SheetsConfig) -> Tuple[str, List[Tuple[int, str]]]:
+    """Header range and ``(start_row, A1)`` for every window of data rows in the range."""
+    sheet, first_col, first_row, last_col, last_row = parse_a1_range(config.read_range)
+    row_count, column_count = get_sheet_extent(config.service_account_json, config.spreadsheet_id, sheet, config.priority)
+    first_col = first_col or "A"
+    last_col = last_col or _column_letters(max(column_count, 1))
+    first_row = first_row or 1
+    last_row = min(last_row or row_count, row_count)
+    prefix = f"{_quote_sheet(sheet)}!"
+    header = f"{prefix}{first_col}{first_row}:{last_col}{first_row}"
+    windows = [
+        (start, f"{prefix}{first_col}{start}:{last_col}{min(start + WINDOW_ROWS - 1, last_row)}")
+        for start in range(first_row + 1, last_row + 1, WINDOW_ROWS)
+    ]
+    return header, windows
+
+
+def _rounds(windows: List[Tuple[int, str]], strata: int, rng: random.Random) -> List[List[Tuple[int, str]]]:
+    """One random window per stratum per round, strata being contiguous runs of windows."""
+    groups = [list(group) for group in np.array_split(np.arange(len(windows)), max(min(strata, len(windows)), 1))]
+    for group in groups:
+        rng.shuffle(group)
+    depth = max((len(group) for group in groups), default=0)
+    return [[windows[group[r]] for group in groups if r < len(group)] for r in range(depth)]
+
+
+def analyze_approximate(config: SheetsConfig, accuracy: float = None, confidence: float = None,
+                        strata: int = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Summarize ``config.read_range`` from a stratified sample, stopping once it is accurate enough.
+
+    Reads rounds of windows until every numeric column's mean is within
+    ``accuracy`` (relative to max(|mean|, std); std alone for dates) and
+    every categorical column's top-value share is within ``accuracy``
+    (absolute) at the ``confidence`` level, or the whole range has been read.
+    The result has the ``analyze_rows`` shape plus ``analysis["approximate"]``
+    with the per-column intervals and how much of the sheet was read.
+    """
+    accuracy, confidence = approximation_settings({"accuracy": accuracy, "confidence": confidence})
+    strata = strata or STRATA
+    rng = random.Random(seed if seed is not None else f"{config.spreadsheet_id}|{config.read_range}")
+
+    header_range, windows = _window_ranges(config)
+    rounds = _rounds(windows, strata, rng)
+    sample = None
+    results, converged, rounds_read = {}, False, 0
+    for batch in rounds:
+        ranges = ([header_range] if sample is None else []) + [a1 for _, a1 in batch]
+        values = batch_read(config.service_account_json, config.spreadsheet_id, ranges, config.priority)
+        values = values + [[]] * (len(ranges) - len(values))
+        if sample is None:
+            header, values = values[0][:1], values[1:]
+            if not header:
+                return {"error": "No Data"}
+            sample = ApproximateAnalysis(header[0], len(windows), confidence)
+        sample.add_round(values)
+        rounds_read += 1
+        if sample.accumulator is None:
+            continue
+        results, converged = sample.estimate(accuracy)
+        if converged and sample.windows_read >= 2:
+            break
+
+    if sample is None:
+        return {"error": "No Data"}
+    if sample.accumulator is None or sample.accumulator.rows == 0:
+        return {"error": "no rows after header"}
+
+    rows_sampled = sum(sample.window_rows)
+    summary = sample.summary(results)
+    summary["rows_analyzed"] = rows_sampled
+    summary["approximate"] = {
+        "accuracy": accuracy,
+        "confidence": confidence,
+        "converged": converged,
+        "stopped_early": sample.windows_read < len(windows),
+        "windows_read": sample.windows_read,
+        "windows_total": len(windows),
+        "rounds": rounds_read,
+        "rows_sampled": rows_sampled,
+        "rows_total_est": int(round(rows_sampled * len(windows) / sample.windows_read)),
+        "intervals": {name: result["intervals"] for name, result in results.items()},
+    }
+    logger.info(
+        f"Approximate analysis read {sample.windows_read}/{len(windows)} windows "
+        f"({rows_sampled} rows), converged={converged}"
+    )
+    return summary
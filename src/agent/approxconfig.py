@@ -0,0 +1,28 @@
+import os
+import math
+from typing import Any, Dict, Tuple
+
+# Kept apart from approx so the API and CLI can validate settings without loading pandas
+DEFAULT_ACCURACY = 0.05
+DEFAULT_CONFIDENCE = 0.95
+
+
+def approximation_settings(data: Dict[str, Any]) -> Tuple[float, float]:
+    """(accuracy, confidence) from a request body or CLI options.
+
+    Missing or None values fall back to ANALYSIS_ACCURACY/ANALYSIS_CONFIDENCE,
+    then to the defaults above. Raises ValueError unless accuracy > 0 and
+    0 < confidence < 1, whether the value came from the caller or the env.
+    """
+    accuracy = data.get("accuracy")
+    confidence = data.get("confidence")
+    try:
+        accuracy = float(accuracy if accuracy is not None else os.getenv("ANALYSIS_ACCURACY", DEFAULT_ACCURACY))
+        confidence = float(confidence if confidence is not None else os.getenv("ANALYSIS_CONFIDENCE", DEFAULT_CONFIDENCE))
+    except (TypeError, ValueError):
+        raise ValueError("accuracy and confidence must be numbers")
+    if not (math.isfinite(accuracy) and accuracy > 0):
+        raise ValueError("accuracy must be greater than 0")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence must be between 0 and 1")
+    return accuracy, confidence
@@ -0,0 +1,121 @@
+import os
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+from .sheets import batch_read
+from .rowbuffer import buffer_rows, release_rows
+from .registry import PRELOADED_GRAPH, get_graph
+from .serialize import compact_analysis
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def group_requests(items: List[Dict[str, Any]]):
+    """Group batch items by (credentials, spreadsheet) so each group is one batchGet."""
+    groups = OrderedDict()
+    for index, item in enumerate(items):
+        key = (item["service_account_json"], item["spreadsheet_id"])
+        groups.setdefault(key, []).append((index, item))
+    return groups
+
+
+def _result(index, item, final_state=None, error=None):
+    final_state = final_state or {}
+    error = error or final_state.get("error") or None
+    return {
+        "index": index,
+        "spreadsheet_id": item["spreadsheet_id"],
+        "read_range": item["read_range"],
+        "status": "error" if error else "completed",
+        "error": error,
+        "rows_read": final_state.get("rows_read", 0),
+        "analysis": compact_analysis(final_state.get("analysis", {})) if not error else {},
+        "insights": final_state.get("insights", "") if not error else "",
+    }
+
+
+def run_batch(items: List[Dict[str, Any]], max_workers: int = None, fetch_concurrency: int = None,
+              llm_concurrency: int = None) -> Iterator[Dict[str, Any]]:
+    """Analyze many spreadsheet ranges, yielding one result per item as it finishes.
+
+    Each item is a full graph config (spreadsheet_id, read_range, model, ...).
+    Ranges of the same spreadsheet are fetched with one ``batchGet``; as soon
+    as a spreadsheet's rows arrive its ranges are analyzed in parallel on the
+    preloaded graph variant, so Sheets reads, pandas work and LLM calls
+    overlap. At most ``llm_concurrency`` LLM calls run at once.
+    """
+    max_workers = max_workers or int(os.getenv("BATCH_WORKERS", "8"))
+    fetch_concurrency = fetch_concurrency or int(os.getenv("BATCH_FETCH_CONCURRENCY", "4"))
+    llm_concurrency = llm_concurrency or int(os.getenv("BATCH_LLM_CONCURRENCY", "2"))
+
+    graph = get_graph(PRELOADED_GRAPH)
+    run_config = {"configurable": {"llm_limiter": threading.BoundedSemaphore(llm_concurrency)}}
+    results: "queue.Queue" = queue.Queue()
+    groups = group_requests(items)
+    pending = {"count": len(items)}
+    submitted = []
+    pending_lock = threading.Lock()
+
+    def finish(result):
+        results.put(result)
+        with pending_lock:
+            pending["count"] -= 1
+            if pending["count"] == 0:
+                results.put(_DONE)
+
+    def analyze(index, item, handle):
+        try:
+            final_state = graph.invoke({**item, "rows_handle": handle}, run_config)
+            finish(_result(index, item, final_state))
+        except Exception as e:
+            logger.error(f"Batch analysis failed for {item['spreadsheet_id']} {item['read_range']}: {str(e)}")
+            finish(_result(index, item, error=str(e)))
+        finally:
+            release_rows(handle)
+
+    def fetch(key, members):
+        service_account_json, spreadsheet_id = key
+        started = 0
+        handle = None
+        try:
+            values = batch_read(service_account_json, spreadsheet_id, [item["read_range"] for _, item in members])
+            values = values + [[]] * (len(members) - len(values))
+            # Rows wait for a worker in buffers, not as lists of Python strings
+            for (index, item), rows in zip(members, values):
+                handle = buffer_rows(rows).handle
+                submitted.append((analysis_pool.submit(analyze, index, item, handle), handle))
+                handle = None
+                started += 1
+        except Exception as e:
+            # Every member still needs a result or the stream never ends
+            logger.error(f"Batch fetch failed for {spreadsheet_id}: {str(e)}")
+            if handle is not None:
+                release_rows(handle)
+            for index, item in members[started:]:
+                finish(_result(index, item, error=f"Data reading failed: {str(e)}"))
+
+    if not items:
+        return
+    analysis_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-analyze")
+    fetch_pool = ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix="batch-fetch")
+    try:
+        for key, members in groups.items():
+            fetch_pool.submit(fetch, key, members)
+        while True:
+            result = results.get()
+            if result is _DONE:
+                break
+            yield result
+    finally:
+        # A consumer that stops early (e.g. a dropped HTTP stream) cancels queued work
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        analysis_pool.shutdown(wait=False, cancel_futures=True)
+        for future, handle in submitted:
+            if future.cancelled():
+                release_rows(handle)
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(rows_digest, model, context, prompt_version):
+    """Content hash of everything that determines an analysis + insights result.
+
+    ``rows_digest`` is the hash of the sheet rows (``RowBuffer.digest``).
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([rows_digest, model, context, prompt_version], default=str).encode())
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=256, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteTier:
+    """On-disk tier: pickled results in a single SQLite table, LRU by last access."""
+
+    def __init__(self, path, max_entries=10000, ttl=86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return pickle.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, blob, now, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """Two-tier (memory, then optional SQLite) cache of finished analyses."""
+
+    def __init__(self, memory: MemoryTier, disk: Optional[SQLiteTier] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key) -> Optional[Any]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Result cache disk read failed: {str(e)}")
+                value = None
+            if value is not None:
+                self._count("disk_hits")
+                self.memory.put(key, value)
+                return value
+        self._count("misses")
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value)
+            except Exception as e:
+                logger.warning(f"Result cache disk write failed: {str(e)}")
+        self._count("stores")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide cache configured from RESULT_CACHE_* env vars (None when disabled)."""
+    global _cache
+    if os.getenv("RESULT_CACHE_ENABLED", "True").lower() != "true":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                memory = MemoryTier(
+                    max_entries=int(os.getenv("RESULT_CACHE_SIZE", "256")),
+                    ttl=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+                )
+                disk = None
+                path = os.getenv("RESULT_CACHE_PATH", "")
+                if path:
+                    disk = SQLiteTier(
+                        path,
+                        max_entries=int(os.getenv("RESULT_CACHE_DISK_SIZE", "10000")),
+                        ttl=float(os.getenv("RESULT_CACHE_DISK_TTL", "86400")),
+                    )
+                _cache = ResultCache(memory, disk)
+    return _cache
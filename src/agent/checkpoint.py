@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Optional, Tuple
+
+from .serialize import compress, decompress, supported_encodings
+
+logger = logging.getLogger(__name__)
+
+# Serialized values at least this large (in practice the analysis summary) are compressed
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "4096"))
+# Checkpoints of jobs nobody resumed are deleted this long after their last write (0 keeps them)
+CHECKPOINT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(24 * 3600)))
+# prune_checkpoints does the actual sweep at most this often
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "600"))
+
+
+class CompactSerializer:
+    """Checkpoint serializer that compresses large values.
+
+    Values are encoded by LangGraph's ``JsonPlusSerializer`` (MessagePack,
+    falling back to pickle for the DataFrames inside ``analysis``; the
+    database is private to this service); blobs over ``min_bytes`` are then
+    zstd- or gzip-compressed and tagged by appending the codec to the type,
+    so uncompressed checkpoints written earlier still load.
+    """
+
+    def __init__(self, min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES, encoding: Optional[str] = None):
+        from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+        self.inner = JsonPlusSerializer(pickle_fallback=True)
+        self.min_bytes = min_bytes
+        self.encoding = encoding or supported_encodings()[0]
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if len(data) < self.min_bytes:
+            return type_, data
+        return f"{type_}+{self.encoding}", compress(data, self.encoding)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, blob = data
+        base, sep, encoding = type_.rpartition("+")
+        if sep:
+            type_, blob = base, decompress(blob, encoding)
+        return self.inner.loads_typed((type_, blob))
+
+
+_saver_class = None
+
+
+def _threaded_saver_class():
+    """``ThreadedSqliteSaver``, defined on first use so importing this module does not load LangGraph."""
+    global _saver_class
+    if _saver_class is None:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        class ThreadedSqliteSaver(SqliteSaver):
+            """``SqliteSaver`` usable from ``astream``: async methods run the sync ones in a thread.
+
+            The saver serializes access to its single connection with a lock, so the
+            same instance serves worker threads and the event loop at once. It also
+            records when each thread was last written, so ``prune`` can drop the
+            checkpoints of jobs that were never resumed.
+            """
+
+            def setup(self):
+                if self.is_setup:
+                    return
+                super().setup()
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+                )
+                # Threads written before the table existed start their TTL now
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO thread_activity SELECT DISTINCT thread_id, ? FROM checkpoints",
+                    (time.time(),),
+                )
+                self.conn.commit()
+
+            def put(self, config, checkpoint, metadata, new_versions):
+                saved = super().put(config, checkpoint, metadata, new_versions)
+                with self.cursor() as cur:
+                    cur.execute(
+                        "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                        (str(config["configurable"]["thread_id"]), time.time()),
+                    )
+                return saved
+
+            def delete_thread(self, thread_id):
+                super().delete_thread(thread_id)
+                with self.cursor() as cur:
+                    cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+            def prune(self, max_age: float) -> int:
+                """Delete every thread not written for ``max_age`` seconds; returns how many."""
+                with self.cursor(transaction=False) as cur:
+                    cur.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?", (time.time() - max_age,))
+                    expired = [row[0] for row in cur.fetchall()]
+                for thread_id in expired:
+                    self.delete_thread(thread_id)
+                return len(expired)
+
+            async def aget_tuple(self, config):
+                return await asyncio.to_thread(self.get_tuple, config)
+
+            async def alist(self, config, *, filter=None, before=None, limit=None):
+                items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+                for item in items:
+                    yield item
+
+            async def aput(self, config, checkpoint, metadata, new_versions):
+                return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+            async def aput_writes(self, config, writes, task_id, task_path=""):
+                return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+            async def adelete_thread(self, thread_id):
+                return await asyncio.to_thread(self.delete_thread, thread_id)
+
+            async def aget_delta_channel_history(self, *, config, channels):
+                return await asyncio.to_thread(lambda: self.get_delta_channel_history(config=config, channels=channels))
+
+        _saver_class = ThreadedSqliteSaver
+    return _saver_class
+
+
+def __getattr__(name):
+    if name == "ThreadedSqliteSaver":
+        return _threaded_saver_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def thread_config(thread_id: str, **configurable) -> dict:
+    return {"configurable": {"thread_id": thread_id, **configurable}}
+
+
+def resume_config(graph, thread_id: str, node: str) -> Optional[dict]:
+    """Config of the newest checkpoint whose next step is ``node``, or None.
+
+    Streaming from it re-runs ``node`` with the state every earlier node left
+    behind, so work finished before the failure is not repeated.
+    """
+    for snapshot in graph.get_state_history(thread_config(thread_id)):
+        if node in snapshot.next:
+            return snapshot.config
+    return None
+
+
+def pending_node(graph, thread_id: str) -> Optional[str]:
+    """Node the newest checkpoint was about to run, e.g. the one a restart interrupted."""
+    snapshot = graph.get_state(thread_config(thread_id))
+    return snapshot.next[0] if snapshot.next else None
+
+
+def delete_checkpoints(thread_id: str):
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return
+    try:
+        checkpointer.delete_thread(thread_id)
+    except Exception as e:
+        logger.warning(f"Could not delete checkpoints of {thread_id}: {str(e)}")
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def prune_checkpoints(max_age: float = None, force: bool = False) -> int:
+    """Delete checkpoints of jobs idle for CHECKPOINT_TTL_SECONDS.
+
+    Cheap to call after every job: unless ``force`` is set the sweep runs at
+    most once per CHECKPOINT_PRUNE_INTERVAL. Returns the number of jobs pruned.
+    """
+    global _last_prune
+    max_age = CHECKPOINT_TTL_SECONDS if max_age is None else max_age
+    checkpointer = get_checkpointer()
+    if checkpointer is None or max_age <= 0:
+        return 0
+    with _prune_lock:
+        now = time.monotonic()
+        if not force and now - _last_prune < CHECKPOINT_PRUNE_INTERVAL:
+            return 0
+        _last_prune = now
+    try:
+        pruned = checkpointer.prune(max_age)
+    except Exception as e:
+        logger.warning(f"Could not prune checkpoints: {str(e)}")
+        return 0
+    if pruned:
+        logger.info(f"Pruned checkpoints of {pruned} jobs idle for over {max_age:.0f}s")
+    return pruned
+
+
+_checkpointer = None
+_checkpointer_unavailable = False
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> Optional["ThreadedSqliteSaver"]:
+    """Process-wide SQLite checkpointer at CHECKPOINT_PATH.
+
+    Checkpointing is opt-in: None unless CHECKPOINT_PATH is set (and
+    langgraph-checkpoint-sqlite is installed); graphs then compile without a
+    checkpointer and jobs cannot be resumed, but still run.
+    """
+    global _checkpointer, _checkpointer_unavailable
+    path = os.getenv("CHECKPOINT_PATH", "")
+    if not path or _checkpointer_unavailable:
+        return None
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None and not _checkpointer_unavailable:
+                try:
+                    saver_class = _threaded_saver_class()
+                except ImportError as e:
+                    logger.warning(f"Checkpointing disabled, install langgraph-checkpoint-sqlite to enable it: {str(e)}")
+                    _checkpointer_unavailable = True
+                    return None
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                saver = saver_class(conn, serde=CompactSerializer())
+                saver.setup()
+                logger.info(f"Graph checkpoints stored in {path}")
+                _checkpointer = saver
+    return _checkpointer
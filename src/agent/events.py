@@ -0,0 +1,101 @@
+import time
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Events kept per job so late subscribers can replay what they missed
+MAX_EVENTS_PER_JOB = 5000
+# Finished jobs' event logs are dropped after this many seconds
+FINISHED_RETENTION = 300
+
+
+class _JobLog:
+    def __init__(self):
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.next_id = 1
+        self.finished_at: Optional[float] = None
+
+
+class JobEvents:
+    """In-process pub/sub of per-job progress events (node transitions, tokens).
+
+    Every event gets an increasing id so a subscriber can resume after a
+    reconnect (SSE ``Last-Event-ID``). A job's log ends with a ``done`` event.
+    """
+
+    def __init__(self):
+        self._logs: Dict[str, _JobLog] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id: str, event: str, data: Dict[str, Any]):
+        with self._cond:
+            log = self._logs.setdefault(job_id, _JobLog())
+            if log.finished_at is not None:
+                return
+            log.events.append((log.next_id, event, data))
+            log.next_id += 1
+            if len(log.events) > MAX_EVENTS_PER_JOB:
+                del log.events[: len(log.events) - MAX_EVENTS_PER_JOB]
+            if event == "done":
+                log.finished_at = time.time()
+            self._cond.notify_all()
+        self._prune()
+
+    def reopen(self, job_id: str):
+        """Start a new log for a job that runs again (e.g. resumed); ids keep increasing."""
+        with self._cond:
+            previous = self._logs.get(job_id)
+            log = self._logs[job_id] = _JobLog()
+            if previous is not None:
+                log.next_id = previous.next_id
+
+    def has_log(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._logs
+
+    def subscribe(self, job_id: str, last_id: int = 0, heartbeat: float = 15.0) -> Iterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+        """Yield ``(id, event, data)`` after ``last_id`` until ``done``; yields None as a heartbeat."""
+        while True:
+            with self._cond:
+                log = self._logs.get(job_id)
+                pending = [e for e in log.events if e[0] > last_id] if log else []
+                if not pending:
+                    self._cond.wait(timeout=heartbeat)
+                    log = self._logs.get(job_id)
+                    pending = [e for e in log.events if e[0] > last_id] if log else []
+            if not pending:
+                yield None
+                continue
+            for event in pending:
+                last_id = event[0]
+                yield event
+                if event[1] == "done":
+                    return
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_RETENTION
+        with self._cond:
+            expired = [job_id for job_id, log in self._logs.items()
+                       if log.finished_at is not None and log.finished_at < cutoff]
+            for job_id in expired:
+                del self._logs[job_id]
+
+
+class EventSink:
+    """Callable handed to the graph (configurable ``event_sink``) for one job."""
+
+    def __init__(self, events: JobEvents, job_id: str, on_partial=None, partial_interval: float = 0.5):
+        self.events = events
+        self.job_id = job_id
+        self.on_partial = on_partial
+        self.partial_interval = partial_interval
+        self._text: List[str] = []
+        self._last_partial = 0.0
+
+    def __call__(self, event: str, data: Dict[str, Any]):
+        self.events.publish(self.job_id, event, data)
+        if event == "token":
+            self._text.append(data.get("text", ""))
+            now = time.monotonic()
+            if self.on_partial is not None and now - self._last_partial >= self.partial_interval:
+                self._last_partial = now
+                self.on_partial("".join(self._text))
@@ -1,14 +1,20 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.types import Command
+from langchain_core.runnables import RunnableConfig
+from contextlib import nullcontext
 from typing import TypedDict, Annotated, Any
 from operator import add
+import asyncio
 import logging
 
-from .sheets import read_sheet, SheetsConfig
-from .analysis import analyze_rows
-from .llm import llm_generate_insights
+from .sheets import aread_sheet, iter_sheet_blocks, SheetsConfig
+from .ratelimit import BACKGROUND
+from .llm import generate_insights_with_stats, agenerate_insights_with_stats, PROMPT_VERSION, LLM_FAILURE_PREFIX
+from .cache import cache_key, get_result_cache
+from .rowbuffer import buffer_rows, buffer_blocks, get_row_buffer, release_rows
+from .metrics import instrument_node
+from .checkpoint import get_checkpointer
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -20,51 +26,222 @@ class AgentState(TypedDict):
     model: str
     base_url: str
     context: str
-    raw_data: list
+    streaming: bool
+    incremental: bool
+    incremental_info: dict
+    approximate: bool
+    accuracy: float
+    confidence: float
+    sheets_priority: str
+    # Handle of the RowBuffer holding the sheet rows until analyze_data is done
+    rows_handle: str
+    rows_read: int
     analysis: dict
     insights: str
+    llm_stats: dict
+    use_cache: bool
+    cache_key: str
+    cache_hit: bool
     error: str
 
 
-def node_read_data(state: AgentState) -> Command[AgentState]:
+def _sheets_config(state: AgentState) -> SheetsConfig:
+    return SheetsConfig(
+        spreadsheet_id=state.get("spreadsheet_id"),
+        read_range=state.get("read_range"),
+        write_range=state.get("write_range"),
+        service_account_json=state.get("service_account_json", "crediantials/service_account.json"),
+        priority=state.get("sheets_priority") or BACKGROUND
+    )
+
+
+def _configurable(config: RunnableConfig) -> dict:
+    return (config or {}).get("configurable") or {}
+
+
+def _sheet_rows(blocks):
+    """Rows of consecutive ``RowBlock``s, with blank rows between blocks put back as a single read returns them."""
+    next_row = None
+    for block in blocks:
+        if next_row is not None and block.start_row > next_row:
+            yield [[] for _ in range(block.start_row - next_row)]
+        yield block.rows
+        next_row = block.end_row + 1
+
+
+def _buffer_sheet(sheets_config: SheetsConfig, read_blocks=None):
+    """Read a range into a new row buffer block by block, so the rows never exist as one list."""
+    return buffer_blocks(_sheet_rows((read_blocks or iter_sheet_blocks)(sheets_config)))
+
+
+def node_read_data(state: AgentState, config: RunnableConfig = None) -> Command[AgentState]:
     logger.info("Node 1: Reading data from Google Sheets...")
+    if state.get("streaming"):
+        logger.info("Streaming mode: rows will be read chunk by chunk during analysis")
+        return Command(update={})
+    if state.get("incremental"):
+        logger.info("Incremental mode: only rows appended since the last run will be read")
+        return Command(update={})
+    if state.get("approximate"):
+        logger.info("Approximate mode: a sample of rows will be read during analysis")
+        return Command(update={})
     try:
-        config = SheetsConfig(
-            spreadsheet_id=state.get("spreadsheet_id"),
-            read_range=state.get("read_range"),
-            write_range=state.get("write_range"),
-            service_account_json=state.get("service_account_json", "crediantials/service_account.json")
-        )
-        raw_data = read_sheet(config)
-        logger.info(f"Successfully read {len(raw_data)} rows from sheet")
+        # configurable["read_sheet_blocks"] stands in for the Sheets read (see GraphRegistry.warmup)
+        buffer = _buffer_sheet(_sheets_config(state), _configurable(config).get("read_sheet_blocks"))
+        logger.info(f"Successfully read {len(buffer)} rows from sheet")
         
-        return Command(update={"raw_data": raw_data})
+        return Command(update={"rows_handle": buffer.handle, "rows_read": len(buffer)})
     except Exception as e:
         logger.error(f"Failed to read data: {str(e)}")
         return Command(update={"error": f"Data reading failed: {str(e)}"})
 
 
+def node_use_preloaded_data(state: AgentState) -> Command[AgentState]:
+    logger.info("Node 1: Using preloaded sheet data...")
+    buffer = get_row_buffer(state.get("rows_handle"))
+    return Command(update={"rows_read": len(buffer) if buffer is not None else 0})
+
+
 def node_analyze_data(state: AgentState) -> Command[AgentState]:
     logger.info("Node 2: Analyzing data...")
+    if state.get("streaming"):
+        return _analyze_streaming(state)
+    if state.get("incremental"):
+        return _analyze_incremental(state)
+    if state.get("approximate"):
+        return _analyze_approximate(state)
+    handle = state.get("rows_handle")
     try:
-        raw_data = state.get("raw_data", [])
-        if not raw_data:
+        buffer = get_row_buffer(handle)
+        if buffer is None and handle:
+            # Buffers live in process memory; a job resumed after a failure or a restart reads again
+            logger.info("Row buffer no longer available, reading the sheet again")
+            buffer = _buffer_sheet(_sheets_config(state))
+            release_rows(handle)
+            handle = buffer.handle
+        if buffer is None or not len(buffer):
             return Command(update={"error": "No data to analyze"})
         
-        analysis = analyze_rows(raw_data)
+        cache = get_result_cache() if state.get("use_cache", True) else None
+        key = ""
+        if cache is not None:
+            key = cache_key(buffer.digest(), state.get("model", ""), state.get("context", ""), PROMPT_VERSION)
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info("Result cache hit, skipping analysis and LLM call")
+                return Command(update={
+                    "analysis": cached["analysis"],
+                    "insights": cached["insights"],
+                    "cache_key": key,
+                    "cache_hit": True,
+                })
+        
+        # pandas is loaded by the first analysis, not when the graph is built
+        from .analysis import analyze_frame_blocks, analyze_row_blocks, STREAMING_ROW_THRESHOLD, STREAMING_CHUNK_ROWS
+
+        # Either way the buffer is decoded block by block, never into one list of rows
+        if len(buffer) - 1 > STREAMING_ROW_THRESHOLD:
+            analysis = analyze_row_blocks(buffer.blocks(STREAMING_CHUNK_ROWS))
+        else:
+            analysis = analyze_frame_blocks(buffer.blocks(STREAMING_CHUNK_ROWS))
         
         if "error" in analysis:
             return Command(update={"error": analysis["error"]})
         
         logger.info("Data analysis completed")
-        return Command(update={"analysis": analysis})
+        return Command(update={"analysis": analysis, "cache_key": key, "cache_hit": False})
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
         return Command(update={"error": f"Analysis failed: {str(e)}"})
+    finally:
+        # Only the row count and the summary go further down the graph
+        release_rows(handle)
+
+
+def _analyze_streaming(state: AgentState) -> Command[AgentState]:
+    from .analysis import analyze_row_blocks
+
+    try:
+        analysis = analyze_row_blocks(iter_sheet_blocks(_sheets_config(state)))
+        if "error" in analysis:
+            return Command(update={"error": analysis["error"]})
+
+        rows_read = analysis["rows_analyzed"] + 1
+        logger.info(f"Streaming analysis completed over {rows_read} rows")
+        return Command(update={"analysis": analysis, "rows_read": rows_read})
+    except Exception as e:
+        logger.error(f"Streaming analysis failed: {str(e)}")
+        return Command(update={"error": f"Streaming analysis failed: {str(e)}"})
+
+
+def _analyze_incremental(state: AgentState) -> Command[AgentState]:
+    from .incremental import analyze_incremental
+
+    try:
+        analysis, info = analyze_incremental(_sheets_config(state))
+        if "error" in analysis:
+            return Command(update={"error": analysis["error"], "incremental_info": info})
+
+        logger.info(
+            f"Incremental analysis ({info['mode']}) completed: "
+            f"{info['rows_fetched']} of {info['rows_total']} rows fetched"
+        )
+        return Command(update={"analysis": analysis, "rows_read": info["rows_total"], "incremental_info": info})
+    except Exception as e:
+        logger.error(f"Incremental analysis failed: {str(e)}")
+        return Command(update={"error": f"Incremental analysis failed: {str(e)}"})
+
+
+def _analyze_approximate(state: AgentState) -> Command[AgentState]:
+    from .approx import analyze_approximate
+
+    try:
+        analysis = analyze_approximate(
+            _sheets_config(state), accuracy=state.get("accuracy"), confidence=state.get("confidence")
+        )
+        if "error" in analysis:
+            return Command(update={"error": analysis["error"]})
+
+        info = analysis["approximate"]
+        logger.info(
+            f"Approximate analysis completed: {info['rows_sampled']} of ~{info['rows_total_est']} rows sampled"
+        )
+        return Command(update={"analysis": analysis, "rows_read": info["rows_sampled"] + 1})
+    except Exception as e:
+        logger.error(f"Approximate analysis failed: {str(e)}")
+        return Command(update={"error": f"Approximate analysis failed: {str(e)}"})
+
+
+def _remember_insights(state: AgentState, analysis: dict, insights: str):
+    key = state.get("cache_key")
+    cache = get_result_cache()
+    if key and cache is not None and not insights.startswith(LLM_FAILURE_PREFIX):
+        cache.put(key, {"analysis": analysis, "insights": insights})
+
+
+def _token_callback(configurable: dict):
+    """Forward streamed LLM tokens to configurable["event_sink"](event, data), if given."""
+    sink = configurable.get("event_sink")
+    if sink is None:
+        return None
+    return lambda text: sink("token", {"text": text})
 
 
-def node_generate_insights(state: AgentState) -> Command[AgentState]:
+def _log_llm_stats(llm_stats: dict):
+    if not llm_stats:
+        return
+    logger.info(
+        f"Insights generated: prompt ~{llm_stats.get('prompt_tokens_est')} tokens "
+        f"({llm_stats.get('columns_included')}/{llm_stats.get('columns_total')} columns), "
+        f"queued {llm_stats.get('queue_ms')} ms, TTFT {llm_stats.get('ttft_ms')} ms, total {llm_stats.get('total_ms')} ms"
+    )
+
+
+def node_generate_insights(state: AgentState, config: RunnableConfig = None) -> Command[AgentState]:
     logger.info("Node 3: Generating insights with LLM...")
+    if state.get("cache_hit"):
+        logger.info("Using cached insights")
+        return Command(update={})
     try:
         analysis = state.get("analysis", {})
         model = state.get("model", "qwen2.5:0.5b")
@@ -74,14 +251,25 @@ def node_generate_insights(state: AgentState) -> Command[AgentState]:
         if "error" in analysis:
             return Command(update={"error": f"Cannot generate insights: {analysis['error']}"})
         
-        insights = llm_generate_insights(
-            analysis=analysis,
-            model=model,
-            base_url=base_url
-        )
+        # Callers running many graphs at once can cap concurrent LLM calls
+        # by passing a semaphore as configurable["llm_limiter"]
+        configurable = _configurable(config)
+        limiter = configurable.get("llm_limiter") or nullcontext()
+        generate = configurable.get("generate_insights") or generate_insights_with_stats
+        # An LLM failure fails the node, so a checkpointed run can resume here
+        with limiter:
+            insights, llm_stats = generate(
+                analysis=analysis,
+                model=model,
+                base_url=base_url,
+                context=context,
+                on_token=_token_callback(configurable)
+            )
+        
+        _remember_insights(state, analysis, insights)
         
-        logger.info("Insights generated successfully")
-        return Command(update={"insights": str(insights)})
+        _log_llm_stats(llm_stats)
+        return Command(update={"insights": insights, "llm_stats": llm_stats})
     except Exception as e:
         logger.error(f"Insights generation failed: {str(e)}")
         return Command(update={"error": f"Insights generation failed: {str(e)}"})
@@ -107,22 +295,126 @@ def node_validate_output(state: AgentState) -> Command[AgentState]:
         return Command(update={"error": f"Validation failed: {str(e)}"}, goto=END)
 
 
-def create_agent_graph():
+NODES = {
+    "read_data": node_read_data,
+    "analyze_data": node_analyze_data,
+    "generate_insights": node_generate_insights,
+    "validate_output": node_validate_output,
+}
+
+
+async def anode_read_data(state: AgentState, config: RunnableConfig = None) -> Command[AgentState]:
+    if state.get("streaming") or state.get("incremental") or state.get("approximate"):
+        return node_read_data(state)
+    logger.info("Node 1: Reading data from Google Sheets (async)...")
+    try:
+        # Stand-ins are plain functions in both graph variants
+        read_blocks = _configurable(config).get("read_sheet_blocks")
+        sheets_config = _sheets_config(state)
+        if read_blocks is not None:
+            buffer = await asyncio.to_thread(_buffer_sheet, sheets_config, read_blocks)
+        else:
+            # One values.get over httpx; the parsed response is the row list, so it is buffered whole
+            buffer = buffer_rows(await aread_sheet(sheets_config))
+        logger.info(f"Successfully read {len(buffer)} rows from sheet")
+        
+        return Command(update={"rows_handle": buffer.handle, "rows_read": len(buffer)})
+    except Exception as e:
+        logger.error(f"Failed to read data: {str(e)}")
+        return Command(update={"error": f"Data reading failed: {str(e)}"})
+
+
+async def anode_analyze_data(state: AgentState) -> Command[AgentState]:
+    # pandas work is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(node_analyze_data, state)
+
+
+async def anode_generate_insights(state: AgentState, config: RunnableConfig = None) -> Command[AgentState]:
+    logger.info("Node 3: Generating insights with LLM (async)...")
+    if state.get("cache_hit"):
+        logger.info("Using cached insights")
+        return Command(update={})
+    try:
+        analysis = state.get("analysis", {})
+        
+        if "error" in analysis:
+            return Command(update={"error": f"Cannot generate insights: {analysis['error']}"})
+        
+        configurable = _configurable(config)
+        limiter = configurable.get("llm_limiter")
+        generate = configurable.get("generate_insights")
+        kwargs = dict(
+            analysis=analysis,
+            model=state.get("model", "qwen2.5:0.5b"),
+            base_url=state.get("base_url"),
+            context=state.get("context", ""),
+            on_token=_token_callback(configurable)
+        )
+        call = asyncio.to_thread(generate, **kwargs) if generate is not None else agenerate_insights_with_stats(**kwargs)
+        if limiter is not None:
+            async with limiter:
+                insights, llm_stats = await call
+        else:
+            insights, llm_stats = await call
+        
+        _remember_insights(state, analysis, insights)
+        
+        _log_llm_stats(llm_stats)
+        return Command(update={"insights": insights, "llm_stats": llm_stats})
+    except Exception as e:
+        logger.error(f"Insights generation failed: {str(e)}")
+        return Command(update={"error": f"Insights generation failed: {str(e)}"})
+
+
+def _continue_to(next_node):
+    """Route to ``next_node``, or straight to validation once a node has recorded an error."""
+    def route(state: AgentState):
+        return "validate_output" if state.get("error") else next_node
+    return route
+
+
+def create_agent_graph(nodes=None, checkpointer=None):
     logger.info("Building agentic workflow graph...")
     
     graph = StateGraph(AgentState)
     
-    graph.add_node("read_data", node_read_data)
-    graph.add_node("analyze_data", node_analyze_data)
-    graph.add_node("generate_insights", node_generate_insights)
-    graph.add_node("validate_output", node_validate_output)
+    # Every node reports latency and domain metrics, and honours a per-job profiler
+    node_fns = {**NODES, **(nodes or {})}
+    for name, fn in node_fns.items():
+        graph.add_node(name, instrument_node(name, fn))
     
+    # A failed node skips the rest, so its error is the one reported and a
+    # checkpointed run can be resumed from exactly that node
     graph.add_edge(START, "read_data")
-    graph.add_edge("read_data", "analyze_data")
-    graph.add_edge("analyze_data", "generate_insights")
+    graph.add_conditional_edges("read_data", _continue_to("analyze_data"), ["analyze_data", "validate_output"])
+    graph.add_conditional_edges("analyze_data", _continue_to("generate_insights"), ["generate_insights", "validate_output"])
     graph.add_edge("generate_insights", "validate_output")
     
-    compiled_graph = graph.compile()
+    compiled_graph = graph.compile(checkpointer=checkpointer)
     logger.info("Graph compiled successfully")
     
     return compiled_graph
+
+
+def create_preloaded_graph():
+    """Graph variant for callers that fetched the rows themselves (e.g. batch runs)."""
+    return create_agent_graph(nodes={"read_data": node_use_preloaded_data})
+
+
+
+def create_async_agent_graph(checkpointer=None):
+    """Graph variant for ``ainvoke``: Sheets and Ollama I/O never block the event loop."""
+    return create_agent_graph(nodes={
+        "read_data": anode_read_data,
+        "analyze_data": anode_analyze_data,
+        "generate_insights": anode_generate_insights,
+    }, checkpointer=checkpointer)
+
+
+def create_resumable_graph():
+    """Default graph with a checkpoint after every node (CHECKPOINT_PATH); runs need a thread_id."""
+    return create_agent_graph(checkpointer=get_checkpointer())
+
+
+def create_async_resumable_graph():
+    return create_async_agent_graph(checkpointer=get_checkpointer())
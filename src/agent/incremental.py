@@ -0,0 +1,201 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import MemoryTier, SQLiteTier
+from .sheets import SheetsConfig, batch_read, read_sheet, parse_a1_range, get_sheet_extent, _quote_sheet, _column_letters
+from .stats import SheetAccumulator
+
+logger = logging.getLogger(__name__)
+
+FULL = "full"
+DELTA = "delta"
+UNCHANGED = "unchanged"
+
+
+def row_hash(row: Optional[List[Any]]) -> str:
+    return hashlib.sha256(json.dumps(row or [], separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+@dataclass
+class IncrementalState:
+    """What was analyzed last time for one (spreadsheet, range).
+
+    ``row_count`` counts the header, so the next unseen row is
+    ``first_row + row_count``. The header hash and the hash of the last
+    processed row fingerprint the prefix: inserting or deleting rows shifts
+    the last row and a new header changes the columns, so either mismatch
+    triggers a rebuild. In-place edits to other processed cells are not
+    detected; append-only sheets are the intended use.
+    """
+    row_count: int
+    header_hash: str
+    last_row_hash: str
+    accumulator: SheetAccumulator
+    updated_at: float = field(default_factory=time.time)
+
+
+class IncrementalStore:
+    """Persisted ``IncrementalState`` per (spreadsheet, range): memory, then optional SQLite."""
+
+    def __init__(self, memory: MemoryTier, disk: Optional[SQLiteTier] = None):
+        self.memory = memory
+        self.disk = disk
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def key(spreadsheet_id: str, read_range: str) -> str:
+        return f"{spreadsheet_id}|{read_range}"
+
+    def lock(self, key: str) -> threading.Lock:
+        """Per-key lock so two runs cannot fold the same new rows twice."""
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str) -> Optional[IncrementalState]:
+        state = self.memory.get(key)
+        if state is None and self.disk is not None:
+            try:
+                state = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"Incremental state read failed: {str(e)}")
+            if state is not None:
+                self.memory.put(key, state)
+        return state
+
+    def put(self, key: str, state: IncrementalState):
+        self.memory.put(key, state)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, state)
+            except Exception as e:
+                logger.warning(f"Incremental state write failed: {str(e)}")
+
+
+def _tail_range(config: SheetsConfig, start_row: int) -> Optional[str]:
+    """A1 range of the rows from ``start_row`` to the end of ``config.read_range``."""
+    sheet, first_col, first_row, last_col, last_row = parse_a1_range(config.read_range)
+    if last_row is not None and start_row > last_row:
+        return None
+    if last_col is None:
+        _, column_count = get_sheet_extent(config.service_account_json, config.spreadsheet_id, sheet, config.priority)
+        last_col = _column_letters(max(column_count, 1))
+    return f"{_quote_sheet(sheet)}!{first_col or 'A'}{start_row}:{last_col}{last_row or ''}"
+
+
+def _row_range(config: SheetsConfig, row: int) -> str:
+    sheet, first_col, _, last_col, _ = parse_a1_range(config.read_range)
+    if first_col is None:
+        return f"{_quote_sheet(sheet)}!{row}:{row}"
+    return f"{_quote_sheet(sheet)}!{first_col}{row}:{last_col or first_col}{row}"
+
+
+def _summary(accumulator: SheetAccumulator) -> Dict[str, Any]:
+    summary = accumulator.to_summary()
+    summary["rows_analyzed"] = accumulator.rows
+    return summary
+
+
+def _rebuild(config: SheetsConfig, store: IncrementalStore, key: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    rows = read_sheet(config)
+    if not rows:
+        return {"error": "No Data"}, {"mode": FULL, "rows_fetched": 0}
+    if len(rows) < 2:
+        return {"error": "no rows after header"}, {"mode": FULL, "rows_fetched": len(rows)}
+    accumulator = SheetAccumulator.from_rows(rows[0], rows[1:])
+    store.put(key, IncrementalState(
+        row_count=len(rows),
+        header_hash=row_hash(rows[0]),
+        last_row_hash=row_hash(rows[-1]),
+        accumulator=accumulator,
+    ))
+    return _summary(accumulator), {"mode": FULL, "rows_fetched": len(rows), "rows_total": len(rows)}
+
+
+def analyze_incremental(config: SheetsConfig, store: "IncrementalStore" = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Summarize ``config.read_range``, reading only the rows appended since the last run.
+
+    One ``batchGet`` fetches the header row, the last row processed last
+    time and everything after it. If the header and that row are unchanged,
+    the new rows are folded into the stored mergeable statistics; otherwise
+    (or on the first run) the range is read and summarized from scratch.
+    Returns ``(analysis, info)``; ``info["mode"]`` is "full", "delta" or
+    "unchanged", ``info["rows_fetched"]`` is how many rows were read and
+    ``info["rows_total"]`` how many the range now has, header included.
+    """
+    store = store or get_incremental_store()
+    key = IncrementalStore.key(config.spreadsheet_id, config.read_range)
+    with store.lock(key):
+        previous = store.get(key)
+        if previous is None:
+            logger.info(f"No incremental state for {key}, analyzing the full range")
+            return _rebuild(config, store, key)
+
+        _, _, first_row, _, _ = parse_a1_range(config.read_range)
+        first_row = first_row or 1
+        last_seen = first_row + previous.row_count - 1
+        ranges = [_row_range(config, first_row), _row_range(config, last_seen)]
+        tail = _tail_range(config, last_seen + 1)
+        if tail is not None:
+            ranges.append(tail)
+        values = batch_read(config.service_account_json, config.spreadsheet_id, ranges, config.priority)
+        values = values + [[]] * (len(ranges) - len(values))
+        header, anchor = values[0][:1], values[1][:1]
+        new_rows = values[2] if tail is not None else []
+
+        if row_hash(header[0] if header else None) != previous.header_hash or \
+                row_hash(anchor[0] if anchor else None) != previous.last_row_hash:
+            logger.info(f"Rows before row {last_seen + 1} changed in {key}, rebuilding")
+            analysis, info = _rebuild(config, store, key)
+            info["rows_fetched"] += sum(len(v) for v in values)
+            info["prefix_changed"] = True
+            return analysis, info
+
+        accumulator = previous.accumulator
+        row_count = previous.row_count
+        if new_rows:
+            # Fold into a copy so a failure cannot leave half-updated state in the store
+            accumulator = copy.deepcopy(accumulator)
+            accumulator.update_rows(new_rows)
+            row_count += len(new_rows)
+            store.put(key, IncrementalState(
+                row_count=row_count,
+                header_hash=previous.header_hash,
+                last_row_hash=row_hash(new_rows[-1]),
+                accumulator=accumulator,
+            ))
+        logger.info(f"Incremental analysis of {key}: {len(new_rows)} new rows")
+        return _summary(accumulator), {
+            "mode": DELTA if new_rows else UNCHANGED,
+            "rows_fetched": sum(len(v) for v in values),
+            "rows_total": row_count,
+        }
+
+
+_store: Optional[IncrementalStore] = None
+_store_lock = threading.Lock()
+
+
+def get_incremental_store() -> IncrementalStore:
+    """Process-wide store; set INCREMENTAL_STATE_PATH to keep state across restarts."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                memory = MemoryTier(
+                    max_entries=int(os.getenv("INCREMENTAL_STATE_SIZE", "256")),
+                    ttl=float(os.getenv("INCREMENTAL_STATE_TTL", "0")),
+                )
+                disk = None
+                path = os.getenv("INCREMENTAL_STATE_PATH", "")
+                if path:
+                    disk = SQLiteTier(path, max_entries=int(os.getenv("INCREMENTAL_STATE_DISK_SIZE", "10000")), ttl=0)
+                _store = IncrementalStore(memory, disk)
+    return _store
@@ -0,0 +1,228 @@
+import re
+import warnings
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NUMERIC = "numeric"
+PERCENT = "percent"
+BOOLEAN = "boolean"
+DATETIME = "datetime"
+CATEGORICAL = "categorical"
+TEXT = "text"
+
+# Share of non-empty cells that must parse before a column takes a type
+PARSE_THRESHOLD = 0.95
+# Values checked before attempting a full-column parse
+SCREEN_SIZE = 64
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_RATIO = 0.5
+# Integral floats are stored as integers only below this magnitude, where float64 is still exact
+EXACT_INT_LIMIT = 2 ** 53
+
+TRUE_VALUES = {"true", "yes", "y", "t"}
+FALSE_VALUES = {"false", "no", "n", "f"}
+
+_CURRENCY_AND_GROUPING = re.compile(r"[\s,$€£¥₹]")
+_PARENS_NEGATIVE = re.compile(r"^\((.*)\)$")
+# "007", "-0123": identifiers and ZIP codes whose leading zeros a number would drop
+_LEADING_ZERO = re.compile(r"^[+-]?0\d")
+_LOOKS_LIKE_DATE = re.compile(r"\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|\d{4}-\d{2}|[A-Za-z]{3,9}\.? \d{1,2},? \d{4}")
+
+
+def normalize_header(header: List[Any], width: int) -> List[str]:
+    """Stringify the header, name blank cells and de-duplicate repeated names."""
+    names = []
+    seen: Dict[str, int] = {}
+    for i in range(width):
+        name = str(header[i]).strip() if i < len(header) and header[i] is not None else ""
+        name = name or f"column_{i + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _clean_text(series: pd.Series) -> pd.Series:
+    text = series.astype("string").str.strip()
+    return text.mask(text == "")
+
+
+def _parse_numeric(text: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Parse plain, currency, accounting-negative and percent strings.
+
+    Plain numbers go through ``pd.to_numeric`` directly; only the cells that
+    fail are cleaned with the slower string operations.
+    """
+    values = pd.to_numeric(text, errors="coerce").astype("float64")
+    is_percent = pd.Series(False, index=text.index)
+    failed = values.isna() & text.notna()
+    if failed.any():
+        rest = text[failed]
+        rest_percent = rest.str.endswith("%").fillna(False).astype(bool)
+        cleaned = rest.str.replace(_CURRENCY_AND_GROUPING, "", regex=True).str.rstrip("%")
+        cleaned = cleaned.str.replace(_PARENS_NEGATIVE, r"-\1", regex=True)
+        parsed = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+        values[failed] = parsed.where(~rest_percent, parsed / 100.0)
+        is_percent[failed] = rest_percent
+    return values, is_percent
+
+
+def _sample_passes(present: pd.Series, parse) -> bool:
+    """Cheap screen on the first values before parsing a whole column."""
+    sample = present.iloc[:SCREEN_SIZE]
+    return parse(sample).notna().sum() >= PARSE_THRESHOLD * len(sample)
+
+
+def _parse_datetime(text: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(text, errors="coerce", format=date_format or "mixed")
+
+
+def _date_format_candidates(sample: pd.Series) -> List[str]:
+    from pandas.tseries.api import guess_datetime_format
+
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for value in sample.iloc[:8]:
+            for dayfirst in (False, True):
+                date_format = guess_datetime_format(value, dayfirst=dayfirst)
+                if date_format and date_format not in candidates:
+                    candidates.append(date_format)
+    return candidates
+
+
+def _infer_dates(text: pd.Series, sample: pd.Series) -> Tuple[pd.Series, Optional[str]]:
+    """Parse a date column with one format for every cell.
+
+    Candidate formats are guessed from the screen sample read month-first
+    and day-first; the one parsing most of the sample wins, and formats that
+    tie on the sample (e.g. "1/5/2024" fits both) are decided on the whole
+    column, month-first if they still tie. Columns no single format covers
+    fall back to per-cell parsing. Returns ``(dates, format or None)``.
+    """
+    scored = []
+    for date_format in _date_format_candidates(sample):
+        scored.append((_parse_datetime(sample, date_format).notna().sum(), date_format))
+    best = max((hits for hits, _ in scored), default=0)
+    if best < PARSE_THRESHOLD * len(sample):
+        return _parse_datetime(text), None
+    dates, chosen = None, None
+    for hits, date_format in scored:
+        if hits < best:
+            continue
+        parsed = _parse_datetime(text, date_format)
+        if dates is None or parsed.notna().sum() > dates.notna().sum():
+            dates, chosen = parsed, date_format
+    return dates, chosen
+
+
+def _compact_numeric(values: pd.Series) -> pd.Series:
+    if values.isna().any():
+        return values
+    array = values.to_numpy()
+    if len(array) and np.abs(array).max() < EXACT_INT_LIMIT and np.all(np.mod(array, 1) == 0):
+        return pd.to_numeric(values.astype("int64"), downcast="integer")
+    return values
+
+
+def _infer_column(series: pd.Series) -> Tuple[str, pd.Series, Optional[str]]:
+    text = _clean_text(series)
+    present = text.dropna()
+    if present.empty:
+        return TEXT, text, None
+    threshold = PARSE_THRESHOLD * len(present)
+
+    lowered = present.str.lower()
+    if lowered.isin(TRUE_VALUES | FALSE_VALUES).sum() >= threshold:
+        return BOOLEAN, coerce_column(series, BOOLEAN), None
+
+    if (_sample_passes(present, lambda sample: _parse_numeric(sample)[0])
+            and not present.str.contains(_LEADING_ZERO).any()):
+        values, is_percent = _parse_numeric(text)
+        if values.notna().sum() >= threshold:
+            kind = PERCENT if is_percent.sum() >= threshold else NUMERIC
+            return kind, _compact_numeric(values), None
+
+    if _sample_passes(present, lambda sample: sample.where(sample.str.contains(_LOOKS_LIKE_DATE))):
+        dates, date_format = _infer_dates(text, present.iloc[:SCREEN_SIZE])
+        if dates.notna().sum() >= threshold:
+            return DATETIME, dates, date_format
+
+    if present.nunique() <= CATEGORY_MAX_RATIO * len(present):
+        return CATEGORICAL, text.astype("category"), None
+    return TEXT, text, None
+
+
+def infer_column(series: pd.Series) -> Tuple[str, pd.Series]:
+    """Infer the kind of a raw column and return it with the converted values.
+
+    Parses are attempted cheapest-first and the winning parse is reused as the
+    converted column, so every cell is parsed at most once per candidate type.
+    Numbers written with leading zeros ("00123") stay text, and date columns
+    are parsed with a single format (see ``_infer_dates``).
+    """
+    kind, values, _ = _infer_column(series)
+    return kind, values
+
+
+def infer_column_kind(series: pd.Series) -> str:
+    return infer_column(series)[0]
+
+
+def coerce_column(series: pd.Series, kind: str, date_format: Optional[str] = None) -> pd.Series:
+    """Convert a raw string column to the compact dtype for ``kind``."""
+    text = _clean_text(series)
+    if kind in (NUMERIC, PERCENT):
+        values, _ = _parse_numeric(text)
+        return _compact_numeric(values)
+    if kind == BOOLEAN:
+        lowered = text.str.lower()
+        mapped = lowered.map(lambda v: True if v in TRUE_VALUES else (False if v in FALSE_VALUES else pd.NA))
+        return mapped.astype("boolean")
+    if kind == DATETIME:
+        return _parse_datetime(text, date_format)
+    if kind == CATEGORICAL:
+        return text.astype("category")
+    return text
+
+
+def build_frame(header: List[Any], data: List[List[Any]], schema: Optional[Dict[str, str]] = None,
+                date_formats: Optional[Dict[str, str]] = None):
+    """Build a typed DataFrame from raw Sheets rows.
+
+    Ragged rows are padded with missing values and rows longer than the header
+    get generated column names. Column types are inferred unless ``schema``
+    (column name -> kind) is passed, which lets later chunks of the same sheet
+    reuse the types decided on the first one. ``date_formats`` (column name ->
+    strptime format) works the same way for date columns: inference fills it
+    in and later chunks parse with it. Returns ``(frame, schema)``.
+    """
+    width = max([len(header)] + [len(row) for row in data]) if data else len(header)
+    columns = normalize_header(header, width)
+    raw = pd.DataFrame(data, columns=range(width) if data else None, dtype=object)
+    raw = raw.reindex(columns=range(width))
+    raw.columns = columns
+
+    converted = {}
+    if schema is None:
+        schema = {}
+        for name in columns:
+            schema[name], converted[name], date_format = _infer_column(raw[name])
+            if date_format and date_formats is not None:
+                date_formats[name] = date_format
+    else:
+        for name in columns:
+            converted[name] = coerce_column(raw[name], schema.get(name, TEXT), (date_formats or {}).get(name))
+
+    frame = pd.DataFrame(converted, index=pd.RangeIndex(len(raw)))
+    return frame, schema
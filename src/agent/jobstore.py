@@ -0,0 +1,272 @@
+import os
+import abc
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .serialize import to_jsonable, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Job states that are never evicted for size; they still expire by TTL
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobStore(abc.ABC):
+    """Interface for job records keyed by job id.
+
+    Records are plain dicts with at least ``status``. Stores add
+    ``created_at``/``updated_at`` timestamps and convert payloads to JSON
+    types on write, so no live DataFrames are kept around.
+    """
+
+    @abc.abstractmethod
+    def put(self, job_id: str, record: Dict[str, Any]):
+        """Store ``record`` for ``job_id``, replacing any previous record."""
+
+    @abc.abstractmethod
+    def update(self, job_id: str, **fields):
+        """Merge ``fields`` into an existing record; unknown job ids are ignored."""
+
+    @abc.abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the record, or None if it is unknown or evicted."""
+
+    @abc.abstractmethod
+    def delete(self, job_id: str):
+        """Drop the record if present."""
+
+    @abc.abstractmethod
+    def list(self, status: Optional[str] = None, spreadsheet_id: Optional[str] = None,
+             limit: int = 50, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """Return (total matching, page of {job_id, status, ...}) newest first."""
+
+    def fail_active(self, reason: str) -> int:
+        """Mark queued/running jobs as failed, e.g. ones orphaned by a restart."""
+        total = 0
+        for status in ACTIVE_STATUSES:
+            while True:
+                _, page = self.list(status=status, limit=500)
+                if not page:
+                    break
+                for job in page:
+                    self.update(job["job_id"], status="error", error=reason)
+                total += len(page)
+        return total
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+
+def _summary(job_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "status": record.get("status"),
+        "spreadsheet_id": record.get("spreadsheet_id"),
+        "created_at": record.get("created_at"),
+        "updated_at": record.get("updated_at"),
+    }
+
+
+class MemoryJobStore(JobStore):
+    """In-process store bounded by ``max_jobs`` and ``ttl`` seconds."""
+
+    def __init__(self, max_jobs: int = 1000, ttl: float = 86400):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        if self.ttl:
+            expired = [job_id for job_id, record in self._jobs.items() if now - record["updated_at"] > self.ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if len(self._jobs) > self.max_jobs:
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.max_jobs:
+                    break
+                if self._jobs[job_id].get("status") not in ACTIVE_STATUSES:
+                    del self._jobs[job_id]
+
+    def put(self, job_id, record):
+        now = time.time()
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            stored = to_jsonable(record)
+            stored["created_at"] = previous["created_at"] if previous else now
+            stored["updated_at"] = now
+            if previous and "spreadsheet_id" not in stored:
+                stored["spreadsheet_id"] = previous.get("spreadsheet_id")
+            self._jobs[job_id] = stored
+            self._evict(now)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return
+            record.update(to_jsonable(fields))
+            record["updated_at"] = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return dict(record) if record is not None else None
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def list(self, status=None, spreadsheet_id=None, limit=50, offset=0):
+        with self._lock:
+            matches = [
+                _summary(job_id, record)
+                for job_id, record in reversed(self._jobs.items())
+                if (status is None or record.get("status") == status)
+                and (spreadsheet_id is None or record.get("spreadsheet_id") == spreadsheet_id)
+            ]
+        return len(matches), matches[offset:offset + limit]
+
+
+class SQLiteJobStore(JobStore):
+    """Durable store: one indexed row per job, payload kept as zlib-compressed JSON.
+
+    ``partial_insights`` is rewritten for every streamed chunk of a running
+    job, so it lives in its own plain-text column; updating it alone never
+    touches (or recompresses) the payload.
+    """
+
+    def __init__(self, path: str, max_jobs: int = 100000, ttl: float = 7 * 86400):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, spreadsheet_id TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, payload BLOB NOT NULL, partial_insights TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "partial_insights" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN partial_insights TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_sheet_created ON jobs(spreadsheet_id, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs(created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs(updated_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _encode(record):
+        return zlib.compress(dumps(record), 6)
+
+    @staticmethod
+    def _decode(blob):
+        return loads(zlib.decompress(blob))
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - self.ttl,))
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        self._conn.execute(
+            f"DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status NOT IN ({placeholders}) "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*ACTIVE_STATUSES, self.max_jobs),
+        )
+
+    def put(self, job_id, record):
+        now = time.time()
+        payload = to_jsonable(record)
+        partial = payload.pop("partial_insights", None)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, spreadsheet_id FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            created_at = row[0] if row else now
+            spreadsheet_id = payload.get("spreadsheet_id") or (row[1] if row else None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs "
+                "(job_id, status, spreadsheet_id, created_at, updated_at, payload, partial_insights) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, payload.get("status", ""), spreadsheet_id, created_at, now, self._encode(payload), partial),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def update(self, job_id, **fields):
+        fields = to_jsonable(fields)
+        with self._lock:
+            if "partial_insights" in fields:
+                self._conn.execute(
+                    "UPDATE jobs SET partial_insights = ?, updated_at = ? WHERE job_id = ?",
+                    (fields.pop("partial_insights"), time.time(), job_id),
+                )
+            if fields:
+                row = self._conn.execute("SELECT payload FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is not None:
+                    payload = self._decode(row[0])
+                    payload.update(fields)
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, payload = ? WHERE job_id = ?",
+                        (payload.get("status", ""), time.time(), self._encode(payload), job_id),
+                    )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, spreadsheet_id, created_at, updated_at, partial_insights FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        record = self._decode(row[0])
+        record.update(spreadsheet_id=row[1], created_at=row[2], updated_at=row[3])
+        if row[4] is not None:
+            record["partial_insights"] = row[4]
+        return record
+
+    def delete(self, job_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+    def list(self, status=None, spreadsheet_id=None, limit=50, offset=0):
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if spreadsheet_id is not None:
+            clauses.append("spreadsheet_id = ?")
+            params.append(spreadsheet_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM jobs {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT job_id, status, spreadsheet_id, created_at, updated_at FROM jobs {where} "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return total, [
+            {"job_id": r[0], "status": r[1], "spreadsheet_id": r[2], "created_at": r[3], "updated_at": r[4]}
+            for r in rows
+        ]
+
+
+def get_job_store() -> JobStore:
+    """Build the store selected by JOB_STORE (memory or sqlite)."""
+    backend = os.getenv("JOB_STORE", "memory").lower()
+    ttl = float(os.getenv("JOB_TTL", "86400"))
+    if backend == "sqlite":
+        path = os.getenv("JOB_STORE_PATH", "jobs.db")
+        logger.info(f"Using SQLite job store at {path}")
+        return SQLiteJobStore(path, max_jobs=int(os.getenv("JOB_STORE_MAX", "100000")), ttl=ttl)
+    if backend != "memory":
+        raise ValueError(f"Unknown JOB_STORE backend '{backend}'")
+    return MemoryJobStore(max_jobs=int(os.getenv("JOB_STORE_MAX", "1000")), ttl=ttl)
@@ -1,49 +1,253 @@
 import os
-from langchain_ollama import ChatOllama
+import math
+import time
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from .llmpool import get_llm_pool
+
+# Bump whenever craft_prompt changes so cached insights are not reused
+PROMPT_VERSION = "2"
+LLM_FAILURE_PREFIX = "LLM Unavailable or failed to load"
+
+# Rough prompt size cap; columns are dropped least-informative first to fit
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+
+# The system message is identical for every call, so Ollama can reuse the
+# KV cache for this prefix instead of re-processing it on each request
+SYSTEM_PROMPT = (
+    "You are a data analyst. Given the summary statistics, "
+    "write 3-6 concise, actionable insights for a business audience. "
+    "Generate a short narrative with bullet points focusing on trends, "
+    "anomalies, and recommendations. Keep it under 120 words.\n"
+    "Statistics arrive as pipe-separated tables, one row per column, most informative first.\n"
+    "Numeric columns: name|n|mean|sd|min|p25|p50|p75|max\n"
+    "Categorical columns: name|n|unique|top|top_share"
+)
+
 def get_ollama(model, temperature=0.2, base_url=None):
-    model_name = model
-    url = base_url
-    return ChatOllama(model=model_name, temperature=temperature, base_url=url)
+    """Shared client for (model, base_url, temperature); connections are kept alive between calls."""
+    return get_llm_pool().client(model=model, temperature=temperature, base_url=base_url)
 
 
-def craft_prompt(analysis, context):
-    sys = (
-        "You are a data analyst. Given the summary statistics, "
-        "write 3-6 concise, actionable insights for a business audience."
-    )
-    summary_of_numericals = analysis.get('summary_of_numerical_columns', {})
-    summary_of_categoricals = analysis.get('summary_of_categorical_columns', {})
-
-    lines = []
-    if summary_of_numericals and 'summary' in summary_of_numericals:
-        lines.append("Preliminary insights of numerical columns:\n" + "\n- ".join(str(row) for row in str(summary_of_numericals['summary']).split('\n')))
-    
-    if summary_of_categoricals and 'summary' in summary_of_categoricals:
-        lines.append("Preliminary insights of categorical columns:\n" + "\n- ".join(str(row) for row in str(summary_of_categoricals['summary']).split('\n')))
-        
+def estimate_tokens(text):
+    """Cheap token estimate (~3.5 characters per token for English and numbers)."""
+    return math.ceil(len(text) / 3.5)
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()[:19].replace("T00:00:00", "")
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "-"
+        return f"{value:.4g}"
+    return str(value)
+
+
+def _as_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _numeric_score(stats, rows):
+    """Informativeness of a numeric column: spread, skew, outliers and missing values."""
+    count, mean, std = _as_float(stats.get("count")), _as_float(stats.get("mean")), _as_float(stats.get("std"))
+    q25, q50, q75 = _as_float(stats.get("25%")), _as_float(stats.get("50%")), _as_float(stats.get("75%"))
+    low, high = _as_float(stats.get("min")), _as_float(stats.get("max"))
+    score = 0.0
+    if std and mean is not None:
+        score += min(std / (abs(mean) or 1.0), 5.0)
+        if q50 is not None:
+            score += min(abs(mean - q50) / std, 3.0)
+    if None not in (q25, q75, low, high):
+        iqr = (q75 - q25) or (std or 1.0)
+        score += min(max(high - q75, q25 - low, 0.0) / (1.5 * iqr), 5.0)
+    if count is not None and rows:
+        score += 2.0 * (1.0 - count / rows)
+    return score
+
+
+def _categorical_score(stats, rows):
+    count, unique, freq = _as_float(stats.get("count")), _as_float(stats.get("unique")), _as_float(stats.get("freq"))
+    score = 0.0
+    if count:
+        if freq is not None:
+            score += 2.0 * freq / count
+        if unique is not None and unique > 1:
+            score += 1.0 - min(unique / count, 1.0)
+        if rows:
+            score += 2.0 * (1.0 - count / rows)
+    return score
+
+
+def _column_rows(summary, kind):
+    if summary is None or getattr(summary, "empty", True):
+        return []
+    rows = []
+    for column in summary.columns:
+        stats = summary[column].to_dict()
+        count = _as_float(stats.get("count"))
+        if kind == "numeric":
+            values = [int(count) if count is not None else None]
+            values += [stats.get(k) for k in ("mean", "std", "min", "25%", "50%", "75%", "max")]
+        else:
+            freq = _as_float(stats.get("freq"))
+            share = f"{freq / count:.0%}" if count and freq is not None else "-"
+            values = [int(count) if count is not None else None, stats.get("unique"), stats.get("top"), share]
+        line = "|".join([str(column)] + [_fmt(v) for v in values])
+        rows.append((kind, column, stats, count, line))
+    return rows
+
+
+def encode_stats(analysis, token_budget=None):
+    """Dense tabular encoding of the analysis that fits ``token_budget``.
+
+    Columns are ranked by informativeness (relative spread, skew, outliers and
+    null rate for numeric columns; dominance, low cardinality and null rate for
+    categorical ones) and added best-first until the budget is used up.
+    Returns ``(text, info)`` where ``info`` records what was kept and dropped.
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    numerical = analysis.get('summary_of_numerical_columns', {}).get('summary')
+    categorical = analysis.get('summary_of_categorical_columns', {}).get('summary')
+    candidates = _column_rows(numerical, "numeric") + _column_rows(categorical, "categorical")
+    rows = analysis.get("rows_analyzed") or max([c[3] or 0 for c in candidates] or [0])
+    approximate = analysis.get("approximate")
+    if approximate:
+        # Counts in a sampled summary are already scaled to the whole sheet
+        rows = approximate["rows_total_est"]
+
+    scored = []
+    for kind, column, stats, _, line in candidates:
+        score = _numeric_score(stats, rows) if kind == "numeric" else _categorical_score(stats, rows)
+        scored.append((score, kind, line))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    kept = {"numeric": [], "categorical": []}
+    used = estimate_tokens(f"Rows: {rows}\nNumeric:\nCategorical:\n")
+    omitted = 0
+    for _, kind, line in scored:
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            omitted += 1
+            continue
+        kept[kind].append(line)
+        used += cost
+
+    parts = [f"Rows: {_fmt(rows)}"]
+    if approximate:
+        parts.append(
+            f"(Estimated from a {approximate['rows_sampled']}-row sample: means within "
+            f"±{approximate['accuracy']:.0%} at {approximate['confidence']:.0%} confidence)"
+        )
+    if kept["numeric"]:
+        parts.append("Numeric:\n" + "\n".join(kept["numeric"]))
+    if kept["categorical"]:
+        parts.append("Categorical:\n" + "\n".join(kept["categorical"]))
+    if omitted:
+        parts.append(f"({omitted} less informative columns omitted)")
+    info = {
+        "columns_total": len(scored),
+        "columns_included": len(kept["numeric"]) + len(kept["categorical"]),
+        "columns_omitted": omitted,
+    }
+    return "\n".join(parts), info
+
+
+def build_prompt(analysis, context, token_budget=None):
+    """Messages for the LLM plus prompt size details (chars, estimated tokens, columns kept)."""
+    stats_text, info = encode_stats(analysis, token_budget)
+    human = stats_text
     if context:
-        lines.append(f"Context: {context}")
+        human += f"\nContext: {context}"
+    msgs = [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=human)]
+    info["prompt_chars"] = len(SYSTEM_PROMPT) + len(human)
+    info["prompt_tokens_est"] = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(human)
+    return msgs, info
+
+
+def craft_prompt(analysis, context):
+    return build_prompt(analysis, context)[0]
+
 
-    user_content = (
-        "Using the information above, generate a short narrative with bullet points focusing on trends, "
-        "anomalies, and recommendations. Keep it under 120 words"
-    )
+def _finish_stats(info, started, first_token_at, text, usage):
+    info["ttft_ms"] = round((first_token_at - started) * 1000, 1) if first_token_at else None
+    info["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    info["completion_chars"] = len(text)
+    if usage:
+        info["prompt_tokens"] = usage.get("input_tokens")
+        info["completion_tokens"] = usage.get("output_tokens")
+    return info
 
-    combined_content = "\n\n".join(lines) + "\n\n" + user_content
 
-    return [SystemMessage(content=sys), HumanMessage(content=combined_content)]
+def generate_insights_with_stats(analysis, model=None, base_url=None, context="", on_token=None):
+    """Stream a completion and return ``(text, stats)`` with prompt size and time-to-first-token.
+
+    ``on_token`` is called with each streamed text fragment as it arrives.
+    """
+    model = model or os.getenv("LLM_MODEL", "qwen2.5:0.5b")
+    base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+    pool = get_llm_pool()
+    llm = get_ollama(model=model, base_url=base_url)
+    msgs, info = build_prompt(analysis, context)
+    queued = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    # Wait for a free slot on this endpoint; requests are served in arrival order
+    with pool.slot(base_url):
+        started = time.perf_counter()
+        for chunk in llm.stream(msgs):
+            if first_token_at is None and chunk.content:
+                first_token_at = time.perf_counter()
+            parts.append(chunk.content)
+            if on_token is not None and chunk.content:
+                on_token(chunk.content)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+    info["queue_ms"] = round((started - queued) * 1000, 1)
+    text = "".join(parts)
+    return text, _finish_stats(info, started, first_token_at, text, usage)
+
+
+async def agenerate_insights_with_stats(analysis, model=None, base_url=None, context="", on_token=None):
+    model = model or os.getenv("LLM_MODEL", "qwen2.5:0.5b")
+    base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+    pool = get_llm_pool()
+    llm = pool.aclient(model=model, base_url=base_url)
+    msgs, info = build_prompt(analysis, context)
+    queued = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    async with pool.aslot(base_url):
+        started = time.perf_counter()
+        async for chunk in llm.astream(msgs):
+            if first_token_at is None and chunk.content:
+                first_token_at = time.perf_counter()
+            parts.append(chunk.content)
+            if on_token is not None and chunk.content:
+                on_token(chunk.content)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+    info["queue_ms"] = round((started - queued) * 1000, 1)
+    text = "".join(parts)
+    return text, _finish_stats(info, started, first_token_at, text, usage)
+
 
 def llm_generate_insights(analysis, model=None, base_url=None, context=""):
     try:
-        model = model or os.getenv("LLM_MODEL", "qwen2.5:0.5b")
-        base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        
-        llm = get_ollama(model=model, base_url=base_url)
-        msgs = craft_prompt(analysis, context)
-        resp = llm.invoke(msgs)
-
-        return resp.content if hasattr(resp, 'content') else str(resp)
+        return generate_insights_with_stats(analysis, model, base_url, context)[0]
+    except Exception as e:
+        return f"{LLM_FAILURE_PREFIX}: {str(e)}"
+
+async def allm_generate_insights(analysis, model=None, base_url=None, context=""):
+    try:
+        return (await agenerate_insights_with_stats(analysis, model, base_url, context))[0]
     except Exception as e:
-        return f"LLM Unavailable or failed to load: {str(e)}"
\ No newline at end of file
+        return f"{LLM_FAILURE_PREFIX}: {str(e)}"
@@ -0,0 +1,239 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from langchain_ollama import ChatOllama
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests allowed per Ollama endpoint; match the server's
+# OLLAMA_NUM_PARALLEL so requests beyond it wait here, not inside Ollama
+DEFAULT_ENDPOINT_LIMIT = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+# Ollama evicts the model (and its KV cache) after this much idle time
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "300"))
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "enqueued_at")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class EndpointLimiter:
+    """FIFO-fair semaphore shared by worker threads and event-loop coroutines.
+
+    Slots are handed to waiters strictly in arrival order, whichever side
+    they come from, so one busy caller cannot starve the others. Coroutines
+    wait on a future instead of holding a thread.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._in_flight = 0
+        self.counters = {"completed": 0, "queued": 0, "wait_ms_total": 0.0}
+
+    def _grant(self, waiter: _Waiter):
+        # Called with the lock held; the slot is already counted as in flight
+        self.counters["wait_ms_total"] += (time.perf_counter() - waiter.enqueued_at) * 1000
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def acquire(self):
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+            self.counters["queued"] += 1
+        waiter.event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+            self.counters["queued"] += 1
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                self.release(completed=False)
+            raise
+
+    def release(self, completed: bool = True):
+        with self._lock:
+            if completed:
+                self.counters["completed"] += 1
+            if self._waiters:
+                # Hand the slot straight to the oldest waiter
+                self._grant(self._waiters.popleft())
+            else:
+                self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            completed = self.counters["completed"]
+            granted = completed + self._in_flight
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "completed": completed,
+                "queued_total": self.counters["queued"],
+                "avg_wait_ms": round(self.counters["wait_ms_total"] / granted, 1) if granted else 0.0,
+            }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class OllamaPool:
+    """Shared ``ChatOllama`` clients plus a concurrency limiter per endpoint.
+
+    Clients are cached per (model, base_url, temperature) so their HTTP
+    connections stay open between calls. Each base_url gets an
+    ``EndpointLimiter``; requests beyond its limit queue in arrival order and
+    are pipelined onto the endpoint as slots free up. Async clients are kept
+    per event loop because httpx connections cannot cross loops.
+
+    Prompts are not batched client-side: Ollama's chat API takes one
+    conversation per request and has no batch endpoint. The server batches
+    the requests running in its OLLAMA_NUM_PARALLEL slots itself, so the
+    pool's job is to keep exactly that many requests in flight per endpoint.
+    """
+
+    def __init__(self, default_limit: int = DEFAULT_ENDPOINT_LIMIT, limits: Optional[Dict[str, int]] = None):
+        self.default_limit = default_limit
+        self.limits = limits or {}
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, "ChatOllama"] = {}
+        self._async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._limiters: Dict[str, EndpointLimiter] = {}
+
+    def _new_client(self, model, temperature, base_url, limit):
+        # langchain_ollama is the slowest import in the service; load it with the first client
+        import httpx
+        from langchain_ollama import ChatOllama
+
+        return ChatOllama(
+            model=model,
+            temperature=temperature,
+            base_url=base_url,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            client_kwargs={
+                "timeout": OLLAMA_TIMEOUT,
+                "limits": httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+            },
+        )
+
+    def client(self, model, temperature=0.2, base_url=None) -> "ChatOllama":
+        key = (model, base_url, temperature)
+        limit = self.limiter(base_url).limit
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                llm = self._clients[key] = self._new_client(model, temperature, base_url, limit)
+            return llm
+
+    def aclient(self, model, temperature=0.2, base_url=None) -> "ChatOllama":
+        """Client for use on the running event loop."""
+        loop = asyncio.get_running_loop()
+        key = (model, base_url, temperature)
+        limit = self.limiter(base_url).limit
+        with self._lock:
+            clients = self._async_clients.setdefault(loop, {})
+            llm = clients.get(key)
+            if llm is None:
+                llm = clients[key] = self._new_client(model, temperature, base_url, limit)
+            return llm
+
+    def limiter(self, base_url) -> EndpointLimiter:
+        base_url = base_url or ""
+        with self._lock:
+            limiter = self._limiters.get(base_url)
+            if limiter is None:
+                limiter = EndpointLimiter(self.limits.get(base_url, self.default_limit))
+                self._limiters[base_url] = limiter
+                logger.info(f"Ollama endpoint {base_url or '(default)'}: {limiter.limit} concurrent requests")
+            return limiter
+
+    @contextmanager
+    def slot(self, base_url):
+        """Hold one of the endpoint's request slots for the duration of a call."""
+        limiter = self.limiter(base_url)
+        limiter.acquire()
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    @asynccontextmanager
+    async def aslot(self, base_url):
+        limiter = self.limiter(base_url)
+        await limiter.aacquire()
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self):
+        with self._lock:
+            limiters = dict(self._limiters)
+            clients = len(self._clients) + sum(len(c) for c in self._async_clients.values())
+        endpoints = {url or "(default)": limiter.stats() for url, limiter in limiters.items()}
+        return {
+            "clients": clients,
+            "endpoints": endpoints,
+            "in_flight": sum(e["in_flight"] for e in endpoints.values()),
+            "queue_depth": sum(e["queue_depth"] for e in endpoints.values()),
+        }
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """Parse OLLAMA_ENDPOINT_LIMITS, e.g. "http://gpu-a:11434=8,http://gpu-b:11434=2"."""
+    limits = {}
+    for item in spec.split(","):
+        url, sep, value = item.strip().rpartition("=")
+        if sep and url:
+            limits[url] = int(value)
+    return limits
+
+
+_pool: Optional[OllamaPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> OllamaPool:
+    """Process-wide pool configured from OLLAMA_NUM_PARALLEL and OLLAMA_ENDPOINT_LIMITS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OllamaPool(limits=_parse_limits(os.getenv("OLLAMA_ENDPOINT_LIMITS", "")))
+    return _pool
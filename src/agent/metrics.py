@@ -0,0 +1,469 @@
+import io
+import os
+import math
+import time
+import pstats
+import inspect
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a fast in-memory node up to a slow LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Bytes; 1 MiB up to 16 GiB in powers of four
+MEMORY_BUCKETS = tuple(float(4 ** i * 1024 * 1024) for i in range(8))
+
+# How often process memory is sampled while a job is being tracked
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", "0.05"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_number(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _labels(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    """Gauge that is either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), callback: Optional[Callable[[], Any]] = None):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is not None:
+            # The callback returns a number, or {label value tuple: number} for labelled gauges
+            result = self.callback()
+            items = list(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            if value is None:
+                continue
+            key = key if isinstance(key, tuple) else (key,)
+            yield self.name, _labels(self.labelnames, key), float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum, then count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, key, ("le", _number(bound))), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, key), series[-2]
+            yield f"{self.name}_count", _labels(self.labelnames, key), series[-1]
+
+
+class MetricsRegistry:
+    """Minimal Prometheus registry rendering the text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=(), callback=None) -> Gauge:
+        gauge = self.register(Gauge(name, help, labelnames, callback))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        blocks = []
+        for metric in metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                logger.warning(f"Could not collect metric {metric.name}: {str(e)}")
+        return "\n".join(blocks) + "\n"
+
+
+registry = MetricsRegistry()
+
+NODE_DURATION = registry.histogram(
+    "agent_node_duration_seconds", "Time spent in each graph node.", ["node"])
+NODE_ERRORS = registry.counter(
+    "agent_node_errors_total", "Graph node runs that ended with an error in the state.", ["node"])
+ROWS_INGESTED = registry.counter(
+    "agent_rows_ingested_total", "Spreadsheet rows read, header included.")
+BYTES_INGESTED = registry.counter(
+    "agent_bytes_ingested_total", "Encoded size of the rows read, as held in row buffers.")
+LLM_TOKENS = registry.counter(
+    "agent_llm_tokens_total", "LLM tokens by direction (estimated when the server reports none).", ["kind"])
+LLM_TTFT = registry.histogram(
+    "agent_llm_time_to_first_token_seconds", "Time from sending the prompt to the first streamed token.")
+LLM_QUEUE = registry.histogram(
+    "agent_llm_queue_seconds", "Time waiting for a free Ollama endpoint slot.")
+RESULT_CACHE = registry.counter(
+    "agent_result_cache_lookups_total", "Result cache lookups made by graph runs.", ["result"])
+JOBS = registry.counter(
+    "agent_jobs_total", "Finished analysis jobs by final status.", ["status"])
+JOB_PEAK_MEMORY = registry.histogram(
+    "agent_job_peak_memory_bytes", "Peak process memory growth while a job ran.", buckets=MEMORY_BUCKETS)
+
+
+def record_update(node: str, update: Dict[str, Any]):
+    """Derive domain metrics from a node's state update."""
+    if update.get("error"):
+        NODE_ERRORS.inc(node=node)
+    if "rows_handle" in update:
+        from .rowbuffer import get_row_buffer
+
+        ROWS_INGESTED.inc(update.get("rows_read", 0))
+        buffer = get_row_buffer(update["rows_handle"])
+        if buffer is not None:
+            BYTES_INGESTED.inc(buffer.nbytes)
+    elif "rows_read" in update:
+        # Preloaded, streaming and incremental runs report a count without the rows
+        fetched = (update.get("incremental_info") or {}).get("rows_fetched", update["rows_read"])
+        ROWS_INGESTED.inc(fetched)
+    if update.get("cache_key"):
+        RESULT_CACHE.inc(result="hit" if update.get("cache_hit") else "miss")
+    llm_stats = update.get("llm_stats") or {}
+    if llm_stats:
+        prompt = llm_stats.get("prompt_tokens") or llm_stats.get("prompt_tokens_est") or 0
+        LLM_TOKENS.inc(prompt, kind="prompt")
+        # Same ~3.5 characters per token estimate as llm.estimate_tokens
+        completion = llm_stats.get("completion_tokens") or math.ceil(llm_stats.get("completion_chars", 0) / 3.5)
+        LLM_TOKENS.inc(completion, kind="completion")
+        if llm_stats.get("ttft_ms") is not None:
+            LLM_TTFT.observe(llm_stats["ttft_ms"] / 1000)
+        if llm_stats.get("queue_ms") is not None:
+            LLM_QUEUE.observe(llm_stats["queue_ms"] / 1000)
+
+
+class JobProfiler:
+    """Per-job tracing hook, passed to a graph run as ``configurable["profiler"]``.
+
+    Records a span (start offset and duration) for every node; with
+    ``cprofile=True`` synchronous nodes also run under cProfile and
+    ``report()`` includes the hottest functions.
+    """
+
+    def __init__(self, cprofile: bool = False, top: int = 25):
+        self.cprofile = cprofile
+        self.top = top
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._profile = cProfile.Profile() if cprofile else None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, node: str, profile: bool = True):
+        started = time.perf_counter()
+        profiling = self._profile is not None and profile
+        if profiling:
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process; keep the span only
+                profiling = False
+        try:
+            yield
+        finally:
+            if profiling:
+                self._profile.disable()
+            with self._lock:
+                self.spans.append({
+                    "node": node,
+                    "start_ms": round((started - self.started) * 1000, 2),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                })
+
+    def report(self) -> Dict[str, Any]:
+        report = {"spans": list(self.spans), "total_ms": round((time.perf_counter() - self.started) * 1000, 2)}
+        if self._profile is not None:
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+            report["profile"] = out.getvalue()
+        return report
+
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def process_rss() -> Optional[int]:
+    """Resident memory of this process in bytes; None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _MemorySampler:
+    """One background thread sampling process memory for every job being tracked."""
+
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._jobs = set()
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, job: "JobMemory"):
+        with self._changed:
+            self._jobs.add(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+                self._thread.start()
+            self._changed.notify()
+
+    def discard(self, job: "JobMemory"):
+        with self._changed:
+            self._jobs.discard(job)
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._jobs:
+                    self._changed.wait()
+                jobs = list(self._jobs)
+            rss = process_rss()
+            if rss is None:
+                return
+            for job in jobs:
+                job.observe(rss)
+            time.sleep(self.interval)
+
+
+_sampler = _MemorySampler()
+
+
+class JobMemory:
+    """Peak memory of one job, passed to a graph run as ``configurable["memory"]``.
+
+    Process RSS is sampled in the background between ``start`` and ``stop`` and
+    at every node boundary; each peak is attributed to the node running at
+    the time. RSS is process-wide, so with concurrent jobs ``peak_bytes``
+    bounds each of them from above; ``peak_delta_bytes`` (growth over the
+    RSS at job start) is the per-job figure.
+    """
+
+    def __init__(self):
+        self.start_bytes: Optional[int] = None
+        self.peak_bytes: Optional[int] = None
+        self.peak_node: Optional[str] = None
+        self.node: Optional[str] = None
+        self.node_peaks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, rss: Optional[int]):
+        if rss is None:
+            return
+        with self._lock:
+            if self.peak_bytes is None or rss > self.peak_bytes:
+                self.peak_bytes = rss
+                self.peak_node = self.node
+            if self.node is not None and rss > self.node_peaks.get(self.node, 0):
+                self.node_peaks[self.node] = rss
+
+    def start(self):
+        self.start_bytes = process_rss()
+        self.observe(self.start_bytes)
+        _sampler.add(self)
+        return self
+
+    def stop(self):
+        self.observe(process_rss())
+        _sampler.discard(self)
+        if self.peak_delta_bytes is not None:
+            JOB_PEAK_MEMORY.observe(self.peak_delta_bytes)
+
+    @contextmanager
+    def span(self, node: str):
+        self.node = node
+        self.observe(process_rss())
+        try:
+            yield
+        finally:
+            self.observe(process_rss())
+            self.node = None
+
+    @property
+    def peak_delta_bytes(self) -> Optional[int]:
+        if self.start_bytes is None or self.peak_bytes is None:
+            return None
+        return self.peak_bytes - self.start_bytes
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "start_rss_bytes": self.start_bytes,
+                "peak_rss_bytes": self.peak_bytes,
+                "peak_delta_bytes": self.peak_delta_bytes,
+                "peak_node": self.peak_node,
+                "node_peak_rss_bytes": dict(self.node_peaks),
+            }
+
+
+def _update_of(result) -> Dict[str, Any]:
+    update = getattr(result, "update", result)
+    return update if isinstance(update, dict) else {}
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node with latency, error and domain metrics plus the per-job profiler hook."""
+    takes_config = "config" in inspect.signature(fn).parameters
+
+    def _hooks(config):
+        configurable = (config or {}).get("configurable") or {}
+        return configurable.get("profiler"), configurable.get("memory")
+
+    if inspect.iscoroutinefunction(fn):
+        async def node(state, config=None):
+            profiler, memory = _hooks(config)
+            started = time.perf_counter()
+            # cProfile cannot follow a coroutine across awaits, so async nodes only get spans
+            with profiler.span(name, profile=False) if profiler is not None else _nullspan(), \
+                    memory.span(name) if memory is not None else _nullspan():
+                result = await (fn(state, config) if takes_config else fn(state))
+            NODE_DURATION.observe(time.perf_counter() - started, node=name)
+            record_update(name, _update_of(result))
+            return result
+    else:
+        def node(state, config=None):
+            profiler, memory = _hooks(config)
+            started = time.perf_counter()
+            with profiler.span(name) if profiler is not None else _nullspan(), \
+                    memory.span(name) if memory is not None else _nullspan():
+                result = fn(state, config) if takes_config else fn(state)
+            NODE_DURATION.observe(time.perf_counter() - started, node=name)
+            record_update(name, _update_of(result))
+            return result
+
+    node.__name__ = getattr(fn, "__name__", name)
+    node.__doc__ = fn.__doc__
+    return node
+
+
+@contextmanager
+def _nullspan():
+    yield
@@ -0,0 +1,236 @@
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .ingest import DATETIME, NUMERIC, PERCENT
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_KINDS = (NUMERIC, PERCENT, DATETIME)
+
+HISTOGRAM_BINS = int(os.getenv("ANALYSIS_HISTOGRAM_BINS", "10"))
+# Column pairs with |r| at or above this are reported, strongest first
+CORRELATION_MIN = float(os.getenv("ANALYSIS_CORRELATION_MIN", "0.5"))
+CORRELATION_TOP = int(os.getenv("ANALYSIS_CORRELATION_TOP", "20"))
+# Below either size the profile is computed in-process; the pool would cost more than it saves
+PARALLEL_MIN_COLUMNS = int(os.getenv("ANALYSIS_PARALLEL_MIN_COLUMNS", "32"))
+PARALLEL_MIN_CELLS = int(os.getenv("ANALYSIS_PARALLEL_MIN_CELLS", "1000000"))
+# Not fork: the API process already runs scheduler, refresher and sampler threads, and a
+# child forked while one of them holds a lock can deadlock on it
+MP_START_METHOD = os.getenv(
+    "ANALYSIS_MP_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+
+def numeric_matrix(frame: pd.DataFrame, column_types: Dict[str, str]) -> Tuple[List[str], np.ndarray]:
+    """Numeric, percent and datetime columns as one column-major float64 matrix (NaN = missing)."""
+    names = [name for name in frame.columns if column_types.get(name) in NUMERIC_KINDS]
+    matrix = np.empty((len(frame), len(names)), dtype=np.float64, order="F")
+    for j, name in enumerate(names):
+        column = frame[name]
+        if column_types[name] == DATETIME:
+            values = column.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+            values[column.isna().to_numpy()] = np.nan
+        else:
+            values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        matrix[:, j] = values
+    return names, matrix
+
+
+def _column_profile(values: np.ndarray) -> Dict[str, Any]:
+    """IQR outlier counts and a fixed-bin histogram for one column."""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {"outliers_low": 0, "outliers_high": 0, "outlier_share": 0.0,
+                "histogram": {"edges": [], "counts": []}}
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    low = int(np.count_nonzero(values < q1 - 1.5 * iqr))
+    high = int(np.count_nonzero(values > q3 + 1.5 * iqr))
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        "outliers_low": low,
+        "outliers_high": high,
+        "outlier_share": (low + high) / len(values),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def _correlation_rows(matrix: np.ndarray, means: np.ndarray, rows: slice) -> np.ndarray:
+    """Pairwise-complete Pearson r of columns ``rows`` against every column.
+
+    Missing values are masked per pair, as in ``DataFrame.corr``, but all
+    pairs are computed together as a handful of matrix products. Columns are
+    centred on ``means`` (their nanmeans) first: the sums of products then
+    stay small, so a column like 1.7e9 ± 50 keeps its precision.
+    """
+    valid = np.isfinite(matrix)
+    filled = np.where(valid, matrix - means, 0.0)
+    mask = valid.astype(np.float64)
+    block, block_mask = filled[:, rows], mask[:, rows]
+    n = block_mask.T @ mask
+    sum_x = block.T @ mask
+    sum_y = block_mask.T @ filled
+    sum_xy = block.T @ filled
+    sum_x2 = (block * block).T @ mask
+    sum_y2 = block_mask.T @ (filled * filled)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_x2 - sum_x * sum_x / n
+        var_y = sum_y2 - sum_y * sum_y / n
+        r = cov / np.sqrt(var_x * var_y)
+    r[n < 3] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def column_means(matrix: np.ndarray) -> np.ndarray:
+    """Per-column nanmean, 0 for columns without values."""
+    valid = np.isfinite(matrix)
+    counts = valid.sum(axis=0)
+    sums = np.where(valid, matrix, 0.0).sum(axis=0)
+    return np.divide(sums, counts, out=np.zeros(matrix.shape[1]), where=counts > 0)
+
+
+def _profile_block(matrix: np.ndarray, means: np.ndarray, start: int, stop: int, correlations: bool):
+    profiles = [_column_profile(matrix[:, j]) for j in range(start, stop)]
+    corr = _correlation_rows(matrix, means, slice(start, stop)) if correlations else None
+    return start, profiles, corr
+
+
+def _profile_shared_block(shm_name: str, shape: Tuple[int, int], means: np.ndarray, start: int, stop: int,
+                          correlations: bool):
+    """Process-pool entry point: view the parent's shared buffer without copying it."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order="F")
+        result = _profile_block(matrix, means, start, stop, correlations)
+        del matrix
+        return result
+    finally:
+        shm.close()
+
+
+class ColumnExecutor:
+    """Runs per-column profiling over column blocks on a reusable process pool.
+
+    The numeric matrix is copied once into shared memory in column-major
+    order, so every column is contiguous and workers map it zero-copy; only
+    the small per-column results travel back through pickling.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Workers only need this module; the fork server imports it once so
+                # they do not each load numpy and pandas. The entry script is still
+                # re-run in every worker as __mp_main__, so it must be import-safe
+                context = multiprocessing.get_context(MP_START_METHOD)
+                if MP_START_METHOD == "forkserver":
+                    context.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    def _blocks(self, columns: int) -> List[Tuple[int, int]]:
+        count = min(columns, self.max_workers * 2)
+        edges = np.linspace(0, columns, count + 1).astype(int)
+        return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    def run(self, matrix: np.ndarray, correlations: bool = True):
+        rows, columns = matrix.shape
+        blocks = self._blocks(columns)
+        means = column_means(matrix)
+        inline = (
+            self.max_workers < 2 or len(blocks) < 2
+            or columns < PARALLEL_MIN_COLUMNS or rows * columns < PARALLEL_MIN_CELLS
+        )
+        if inline:
+            parts = [_profile_block(matrix, means, start, stop, correlations) for start, stop in blocks]
+        else:
+            shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            shared = None
+            try:
+                shared = np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf, order="F")
+                shared[:] = matrix
+                pool = self._get_pool()
+                futures = [
+                    pool.submit(_profile_shared_block, shm.name, matrix.shape, means, start, stop, correlations)
+                    for start, stop in blocks
+                ]
+                parts = [future.result() for future in futures]
+            finally:
+                # The buffer cannot be closed while a numpy view still points into it
+                shared = None
+                shm.close()
+                shm.unlink()
+        parts.sort(key=lambda part: part[0])
+        profiles = [profile for _, block_profiles, _ in parts for profile in block_profiles]
+        corr = np.vstack([part[2] for part in parts]) if correlations and parts else None
+        return profiles, corr
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _top_correlations(names: List[str], corr: np.ndarray) -> List[List[Any]]:
+    upper = np.triu_indices(len(names), k=1)
+    values = corr[upper]
+    keep = np.flatnonzero(np.abs(np.nan_to_num(values)) >= CORRELATION_MIN)
+    keep = keep[np.argsort(-np.abs(values[keep]))][:CORRELATION_TOP]
+    return [[names[upper[0][i]], names[upper[1][i]], round(float(values[i]), 4)] for i in keep]
+
+
+def profile_columns(frame: pd.DataFrame, column_types: Dict[str, str],
+                    executor: "ColumnExecutor" = None) -> Dict[str, Any]:
+    """Outliers, histograms and strongest correlations of the numeric columns.
+
+    Returns ``{"outliers": DataFrame, "histograms": {...}, "correlations": [...]}``
+    ready to sit next to ``summary`` in ``summary_of_numerical_columns``.
+    Datetime histograms and fences are in nanoseconds since the epoch.
+    """
+    names, matrix = numeric_matrix(frame, column_types)
+    if not names:
+        return {}
+    executor = executor or get_column_executor()
+    profiles, corr = executor.run(matrix, correlations=len(names) > 1)
+    outliers = pd.DataFrame(
+        {name: [p["outliers_low"], p["outliers_high"], p["outlier_share"]] for name, p in zip(names, profiles)},
+        index=["low", "high", "share"],
+    )
+    return {
+        "outliers": outliers,
+        "histograms": {name: p["histogram"] for name, p in zip(names, profiles)},
+        "correlations": _top_correlations(names, corr) if corr is not None else [],
+    }
+
+
+_executor: Optional[ColumnExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_column_executor() -> ColumnExecutor:
+    """Process-wide executor sized by ANALYSIS_WORKERS (default: CPU count)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(os.getenv("ANALYSIS_WORKERS", "0")) or None
+                _executor = ColumnExecutor(max_workers=workers)
+                atexit.register(_executor.shutdown)
+    return _executor
@@ -0,0 +1,271 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_PRIORITY_RANK = {INTERACTIVE: 0, BACKGROUND: 1}
+
+# Status codes worth retrying: quota exhaustion and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+SHEETS_MAX_ATTEMPTS = int(os.getenv("SHEETS_MAX_ATTEMPTS", "6"))
+
+
+class TokenBucket:
+    """Requests-per-minute bucket that refills continuously up to ``burst``."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, reserve: float = 0.0) -> float:
+        """Seconds until one token is available while keeping ``reserve`` tokens back."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        needed = 1.0 + reserve - self.tokens
+        if needed <= 0:
+            return 0.0
+        return needed / self.rate if self.rate > 0 else float("inf")
+
+
+class SheetsRateLimiter:
+    """Process-wide Sheets quota limiter.
+
+    Every call takes one token from its service account's bucket and one from
+    its spreadsheet's bucket. Waiters competing for the same tokens are
+    served in priority order; a waiter held back only by its own
+    spreadsheet's bucket does not hold up callers on other spreadsheets of
+    the account. Background callers may not dip into the last
+    ``interactive_reserve`` fraction of an account's bucket, so interactive
+    requests get through even while batch jobs are saturating the quota.
+    A 429 pauses the whole account until its Retry-After has passed.
+    """
+
+    def __init__(self, account_per_minute: float = 60, spreadsheet_per_minute: float = 60,
+                 interactive_reserve: float = 0.2):
+        self.account_per_minute = account_per_minute
+        self.spreadsheet_per_minute = spreadsheet_per_minute
+        self.interactive_reserve = interactive_reserve
+        self._cond = threading.Condition()
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._spreadsheets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._waiting: Dict[int, Tuple[int, str, str]] = {}
+        self._seq = itertools.count()
+        self.counters = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "retries": 0, "throttled": 0}
+
+    def _buckets(self, account: str, spreadsheet_id: str):
+        account_bucket = self._accounts.get(account)
+        if account_bucket is None:
+            account_bucket = self._accounts[account] = TokenBucket(self.account_per_minute)
+        key = (account, spreadsheet_id)
+        sheet_bucket = self._spreadsheets.get(key)
+        if sheet_bucket is None:
+            sheet_bucket = self._spreadsheets[key] = TokenBucket(self.spreadsheet_per_minute)
+        return account_bucket, sheet_bucket
+
+    def _sheet_ready(self, account: str, spreadsheet_id: str, now: float) -> bool:
+        bucket = self._spreadsheets.get((account, spreadsheet_id))
+        if bucket is None:
+            return True
+        bucket.refill(now)
+        return bucket.wait_time(now) <= 0
+
+    def _try_take(self, ticket: int, account: str, spreadsheet_id: str, rank: int) -> float:
+        """Take tokens for a registered waiter; returns 0 on success, else seconds to wait."""
+        now = time.monotonic()
+        account_bucket, sheet_bucket = self._buckets(account, spreadsheet_id)
+        account_bucket.refill(now)
+        sheet_bucket.refill(now)
+        # Waiters on the same spreadsheet go in priority, then arrival, order.
+        # On other spreadsheets of the account only higher-priority waiters
+        # that are waiting for the account's tokens go first; one stuck on
+        # its own spreadsheet's bucket would otherwise block everyone
+        for other, (other_rank, other_account, other_sheet) in self._waiting.items():
+            if other_account != account or other == ticket:
+                continue
+            if other_sheet == spreadsheet_id:
+                ahead = other_rank < rank or (other_rank == rank and other < ticket)
+            else:
+                ahead = other_rank < rank and self._sheet_ready(account, other_sheet, now)
+            if ahead:
+                return 0.05
+        reserve = self.interactive_reserve * account_bucket.capacity if rank > 0 else 0.0
+        wait = max(account_bucket.wait_time(now, reserve), sheet_bucket.wait_time(now))
+        if wait > 0:
+            return wait
+        account_bucket.tokens -= 1.0
+        sheet_bucket.tokens -= 1.0
+        self.counters["acquired"] += 1
+        return 0.0
+
+    def _register(self, account: str, spreadsheet_id: str, priority: str) -> Tuple[int, int]:
+        ticket = next(self._seq)
+        rank = _PRIORITY_RANK.get(priority, _PRIORITY_RANK[BACKGROUND])
+        self._waiting[ticket] = (rank, account, spreadsheet_id)
+        return ticket, rank
+
+    def _finish(self, ticket: int, started: float):
+        self._waiting.pop(ticket, None)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.counters["waited"] += 1
+            self.counters["wait_seconds"] += waited
+        self._cond.notify_all()
+
+    def acquire(self, account: str, spreadsheet_id: str, priority: str = BACKGROUND):
+        started = time.monotonic()
+        with self._cond:
+            ticket, rank = self._register(account, spreadsheet_id, priority)
+            try:
+                while True:
+                    wait = self._try_take(ticket, account, spreadsheet_id, rank)
+                    if wait <= 0:
+                        return
+                    self._cond.wait(timeout=min(wait, 1.0))
+            finally:
+                self._finish(ticket, started)
+
+    async def aacquire(self, account: str, spreadsheet_id: str, priority: str = BACKGROUND):
+        started = time.monotonic()
+        with self._cond:
+            ticket, rank = self._register(account, spreadsheet_id, priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_take(ticket, account, spreadsheet_id, rank)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(min(wait, 1.0))
+        finally:
+            with self._cond:
+                self._finish(ticket, started)
+
+    def retry_delay(self, account: str, attempt: int, status: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retrying a failed call; a 429 also pauses every caller on the account."""
+        delay = backoff_delay(attempt, retry_after)
+        with self._cond:
+            self.counters["retries"] += 1
+            if status == 429:
+                # The quota is shared, so hold everyone on this account back, not just this caller
+                bucket = self._accounts.get(account)
+                if bucket is not None:
+                    bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+                self.counters["throttled"] += 1
+        return delay
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                **self.counters,
+                "wait_seconds": round(self.counters["wait_seconds"], 3),
+                "waiting": len(self._waiting),
+                "accounts": {
+                    os.path.basename(account): {
+                        "tokens": round(min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate), 1),
+                        "per_minute": round(bucket.rate * 60, 1),
+                        "blocked_for": round(max(bucket.blocked_until - now, 0.0), 1),
+                    }
+                    for account, bucket in self._accounts.items()
+                },
+            }
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, base: float = 1.0, cap: float = 32.0) -> float:
+    """Delay before retry ``attempt`` (1-based): Retry-After if given, else full-jitter exponential."""
+    if retry_after is not None:
+        return min(max(retry_after, 0.0), cap * 2)
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def parse_retry_after(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def error_status(error: Exception) -> Tuple[Optional[int], Optional[float]]:
+    """(HTTP status, Retry-After seconds) of a googleapiclient ``HttpError`` or httpx error."""
+    response = getattr(error, "resp", None)
+    if response is not None:
+        # httplib2.Response is a dict of lower-cased headers with a .status
+        return response.status, parse_retry_after(response.get("retry-after"))
+    response = getattr(error, "response", None)
+    if response is not None and hasattr(response, "status_code"):
+        return response.status_code, parse_retry_after(response.headers.get("retry-after"))
+    return None, None
+
+
+def call_with_retry(fn: Callable, account: str, spreadsheet_id: str, priority: str = BACKGROUND,
+                    limiter: "SheetsRateLimiter" = None, max_attempts: int = None):
+    """Run ``fn()`` under the rate limiter, retrying 429/5xx responses with backoff."""
+    limiter = limiter or get_rate_limiter()
+    max_attempts = max_attempts or SHEETS_MAX_ATTEMPTS
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.acquire(account, spreadsheet_id, priority)
+        try:
+            return fn()
+        except Exception as e:
+            status, retry_after = error_status(e)
+            if status not in RETRYABLE_STATUS or attempt >= max_attempts:
+                raise
+            delay = limiter.retry_delay(account, attempt, status, retry_after)
+            logger.warning(f"Sheets call for {spreadsheet_id} got HTTP {status}, retry {attempt} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def acall_with_retry(fn: Callable, account: str, spreadsheet_id: str, priority: str = BACKGROUND,
+                           limiter: "SheetsRateLimiter" = None, max_attempts: int = None):
+    """Async ``call_with_retry``; ``fn`` returns an awaitable."""
+    limiter = limiter or get_rate_limiter()
+    max_attempts = max_attempts or SHEETS_MAX_ATTEMPTS
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.aacquire(account, spreadsheet_id, priority)
+        try:
+            return await fn()
+        except Exception as e:
+            status, retry_after = error_status(e)
+            if status not in RETRYABLE_STATUS or attempt >= max_attempts:
+                raise
+            delay = limiter.retry_delay(account, attempt, status, retry_after)
+            logger.warning(f"Sheets call for {spreadsheet_id} got HTTP {status}, retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+_limiter: Optional[SheetsRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> SheetsRateLimiter:
+    """Process-wide limiter configured from SHEETS_* env vars (Google's default read quota is 60/min per user)."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = SheetsRateLimiter(
+                    account_per_minute=float(os.getenv("SHEETS_READS_PER_MINUTE", "60")),
+                    spreadsheet_per_minute=float(os.getenv("SHEETS_SPREADSHEET_READS_PER_MINUTE", "60")),
+                    interactive_reserve=float(os.getenv("SHEETS_INTERACTIVE_RESERVE", "0.2")),
+                )
+    return _limiter
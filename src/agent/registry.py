@@ -0,0 +1,170 @@
+import uuid
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRAPH = "default"
+PRELOADED_GRAPH = "preloaded"
+ASYNC_GRAPH = "async"
+# Checkpointed variants used for API jobs, so a failed job can resume from the failed node
+RESUMABLE_GRAPH = "resumable"
+ASYNC_RESUMABLE_GRAPH = "async_resumable"
+# Variants whose nodes are coroutines and must be run with ainvoke/astream
+ASYNC_VARIANTS = {ASYNC_GRAPH, ASYNC_RESUMABLE_GRAPH}
+
+WARMUP_ROWS = [
+    ["region", "units", "revenue"],
+    ["north", "12", "340.5"],
+    ["south", "7", "120.0"],
+    ["east", "31", "880.25"],
+]
+
+
+class GraphRegistry:
+    """Process-wide cache of compiled graphs, keyed by variant name.
+
+    Compiled LangGraph graphs are immutable and safe to invoke from many
+    threads at once, so each variant is built a single time and then shared.
+    Builders can be swapped at runtime with ``reload``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._builders: Dict[str, Callable] = {}
+        self._graphs: Dict[str, object] = {}
+
+    def register(self, name: str, builder: Callable, replace: bool = False):
+        with self._lock:
+            if name in self._builders and not replace:
+                raise ValueError(f"Graph variant '{name}' is already registered")
+            self._builders[name] = builder
+            self._graphs.pop(name, None)
+
+    def get(self, name: str = DEFAULT_GRAPH):
+        graph = self._graphs.get(name)
+        if graph is not None:
+            return graph
+        with self._lock:
+            graph = self._graphs.get(name)
+            if graph is None:
+                if name not in self._builders:
+                    raise KeyError(f"Unknown graph variant '{name}'")
+                started = time.perf_counter()
+                graph = self._builders[name]()
+                self._graphs[name] = graph
+                logger.info(f"Compiled graph '{name}' in {(time.perf_counter() - started) * 1000:.1f} ms")
+            return graph
+
+    def reload(self, name: str = DEFAULT_GRAPH, builder: Optional[Callable] = None):
+        """Rebuild a variant (optionally with a new builder) and swap it in atomically."""
+        with self._lock:
+            builder = builder or self._builders.get(name)
+            if builder is None:
+                raise KeyError(f"Unknown graph variant '{name}'")
+            graph = builder()
+            self._builders[name] = builder
+            self._graphs[name] = graph
+        logger.info(f"Reloaded graph '{name}'")
+        return graph
+
+    def variants(self):
+        with self._lock:
+            return sorted(self._builders)
+
+    def warmup(self, name: str = DEFAULT_GRAPH, invoke: bool = True):
+        """Compile a variant and optionally run it once on a stub input.
+
+        The run goes through the compiled variant itself, with the Sheets read
+        and the LLM call swapped for local stand-ins through the run config,
+        so it exercises that graph's runtime and checkpointer, pandas and the
+        prompt builder without touching the network. Checkpoints the run
+        leaves behind are deleted.
+        """
+        graph = self.get(name)
+        if not invoke:
+            return graph
+        from .rowbuffer import buffer_rows, release_rows
+
+        started = time.perf_counter()
+        config = _warmup_config(f"warmup-{uuid.uuid4().hex}")
+        # The preloaded variant reads this handle; the others replace it with their own read
+        state = {**_warmup_state(), "rows_handle": buffer_rows(WARMUP_ROWS).handle}
+        final_state = {}
+        try:
+            if name in ASYNC_VARIANTS:
+                final_state = asyncio.run(graph.ainvoke(state, config))
+            else:
+                final_state = graph.invoke(state, config)
+        finally:
+            release_rows(state["rows_handle"])
+            release_rows(final_state.get("rows_handle"))
+            if graph.checkpointer is not None:
+                graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+        if final_state.get("error"):
+            raise RuntimeError(f"Warmup run of '{name}' failed: {final_state['error']}")
+        logger.info(f"Warmup run of '{name}' completed in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return graph
+
+
+def _warmup_state():
+    return {
+        "spreadsheet_id": "warmup",
+        "read_range": "Sheet1!A1:C4",
+        "write_range": "",
+        "service_account_json": "",
+        "model": "",
+        "base_url": "",
+        "context": "",
+        "use_cache": False,
+        "analysis": {},
+        "insights": "",
+        "error": "",
+    }
+
+
+def _warmup_config(thread_id: str = "warmup") -> dict:
+    """Run config that swaps the Sheets read and the LLM call for stand-ins."""
+    return {"configurable": {
+        "thread_id": thread_id,
+        "read_sheet_blocks": _standin_read_sheet_blocks,
+        "generate_insights": _standin_generate_insights,
+    }}
+
+
+def _standin_read_sheet_blocks(config):
+    from .sheets import RowBlock
+
+    return [RowBlock(start_row=1, rows=[list(row) for row in WARMUP_ROWS])]
+
+
+def _standin_generate_insights(analysis, model=None, base_url=None, context="", on_token=None):
+    from .llm import craft_prompt
+
+    craft_prompt(analysis, context)
+    return "warmup", {}
+
+
+def _lazy_builder(factory: str) -> Callable:
+    """Builder that imports ``agent.graph`` (and with it LangGraph) only when the variant is first compiled."""
+    def build():
+        from . import graph
+
+        return getattr(graph, factory)()
+    build.__name__ = factory
+    return build
+
+
+registry = GraphRegistry()
+registry.register(DEFAULT_GRAPH, _lazy_builder("create_agent_graph"))
+registry.register(PRELOADED_GRAPH, _lazy_builder("create_preloaded_graph"))
+registry.register(ASYNC_GRAPH, _lazy_builder("create_async_agent_graph"))
+registry.register(RESUMABLE_GRAPH, _lazy_builder("create_resumable_graph"))
+registry.register(ASYNC_RESUMABLE_GRAPH, _lazy_builder("create_async_resumable_graph"))
+
+
+def get_graph(name: str = DEFAULT_GRAPH):
+    return registry.get(name)
@@ -0,0 +1,165 @@
+import io
+import os
+import mmap
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .serialize import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Buffers past this size move from memory to a temporary file
+ROW_BUFFER_SPILL_BYTES = int(os.getenv("ROW_BUFFER_SPILL_BYTES", str(8 * 1024 * 1024)))
+# Where spilled buffers go (default: the system temp directory)
+ROW_BUFFER_DIR = os.getenv("ROW_BUFFER_DIR") or None
+
+
+class RowBuffer:
+    """Sheet rows kept outside the graph state, one compact JSON array per line.
+
+    The encoded rows are several times smaller than the list of lists of
+    Python strings they come from. Up to ``spill_bytes`` they stay in
+    memory; past that they move to an unlinked temporary file that is
+    memory-mapped for reading, so the OS can page them out under pressure.
+    Graph state carries only ``handle``; ``release_rows`` frees the buffer.
+    """
+
+    def __init__(self, spill_bytes: Optional[int] = None, directory: Optional[str] = None):
+        self.handle = uuid.uuid4().hex
+        self.spill_bytes = spill_bytes if spill_bytes is not None else ROW_BUFFER_SPILL_BYTES
+        self.directory = directory or ROW_BUFFER_DIR
+        self.rows = 0
+        self.nbytes = 0
+        self._sha = hashlib.sha256()
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def append(self, rows: List[List[Any]]):
+        if not rows:
+            return
+        encoded = b"".join(dumps(row) + b"\n" for row in rows)
+        with self._lock:
+            if self._file is None and self.nbytes + len(encoded) > self.spill_bytes:
+                self._spill()
+            (self._file or self._memory).write(encoded)
+            self._sha.update(encoded)
+            self.rows += len(rows)
+            self.nbytes += len(encoded)
+
+    def _spill(self):
+        self._file = tempfile.TemporaryFile(prefix="rows-", dir=self.directory)
+        self._file.write(self._memory.getbuffer())
+        self._memory = None
+        logger.info(f"Row buffer {self.handle} spilled {self.nbytes} bytes to disk")
+
+    def digest(self) -> str:
+        """SHA-256 of the rows' encoding, i.e. of the sheet contents."""
+        with self._lock:
+            return self._sha.hexdigest()
+
+    def _lines(self) -> Iterator[bytes]:
+        with self._lock:
+            if self._file is None:
+                data = self._memory.getvalue()
+            else:
+                self._file.flush()
+                data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.nbytes else b""
+        try:
+            start = 0
+            while start < len(data):
+                end = data.find(b"\n", start)
+                yield data[start:end]
+                start = end + 1
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def blocks(self, chunk_rows: int) -> Iterator[List[List[Any]]]:
+        """Decoded rows in consecutive lists of at most ``chunk_rows``."""
+        block = []
+        for line in self._lines():
+            block.append(line)
+            if len(block) == chunk_rows:
+                yield loads(b"[" + b",".join(block) + b"]")
+                block = []
+        if block:
+            yield loads(b"[" + b",".join(block) + b"]")
+
+    def read(self) -> List[List[Any]]:
+        rows = []
+        for block in self.blocks(max(self.rows, 1)):
+            rows.extend(block)
+        return rows
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._memory = None
+
+
+_buffers: Dict[str, RowBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def buffer_rows(rows: List[List[Any]], spill_bytes: Optional[int] = None) -> RowBuffer:
+    """Copy ``rows`` into a new registered buffer; the caller can drop its list afterwards."""
+    buffer = RowBuffer(spill_bytes)
+    buffer.append(rows)
+    with _buffers_lock:
+        _buffers[buffer.handle] = buffer
+    return buffer
+
+
+def buffer_blocks(blocks: Iterable[List[List[Any]]], spill_bytes: Optional[int] = None) -> RowBuffer:
+    """``buffer_rows`` for rows arriving in blocks; each block is encoded as it comes and can then be dropped."""
+    buffer = RowBuffer(spill_bytes)
+    try:
+        for rows in blocks:
+            buffer.append(rows)
+    except BaseException:
+        buffer.close()
+        raise
+    with _buffers_lock:
+        _buffers[buffer.handle] = buffer
+    return buffer
+
+
+def get_row_buffer(handle: Optional[str]) -> Optional[RowBuffer]:
+    if not handle:
+        return None
+    with _buffers_lock:
+        return _buffers.get(handle)
+
+
+def release_rows(handle: Optional[str]):
+    """Free a buffer; unknown or already released handles are ignored."""
+    if not handle:
+        return
+    with _buffers_lock:
+        buffer = _buffers.pop(handle, None)
+    if buffer is not None:
+        buffer.close()
+
+
+def buffer_stats() -> Dict[str, int]:
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    return {
+        "buffers": len(buffers),
+        "bytes": sum(buffer.nbytes for buffer in buffers),
+        "spilled": sum(buffer.spilled for buffer in buffers),
+    }
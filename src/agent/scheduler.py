@@ -0,0 +1,120 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised by ``JobScheduler.submit`` when the bounded queue has no room."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _QueuedJob:
+    priority: int
+    tag: float
+    seq: int
+    job_id: str = field(compare=False)
+    tenant: str = field(compare=False)
+    fn: Callable = field(compare=False)
+    args: Tuple[Any, ...] = field(compare=False)
+
+
+class JobScheduler:
+    """Fixed worker pool fed by a bounded, tenant-fair priority queue.
+
+    Lower ``priority`` values run first. Within a priority level jobs are
+    ordered by start-time fair queuing: each tenant's jobs get increasing
+    virtual tags, so a tenant that floods the queue only delays its own work
+    while other tenants keep interleaving.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._tenant_tags: Dict[str, float] = {}
+        self._running: Dict[str, float] = {}
+        self._avg_duration = 30.0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"analysis-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_id: str, fn: Callable, *args, tenant: str = "default", priority: int = 0):
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                raise QueueFull(self.retry_after())
+            tag = max(self._virtual_time, self._tenant_tags.get(tenant, 0.0)) + 1.0
+            self._tenant_tags[tenant] = tag
+            heapq.heappush(self._heap, _QueuedJob(priority, tag, next(self._seq), job_id, tenant, fn, args))
+            self._cond.notify()
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based position of a queued job, or None once it has started."""
+        with self._cond:
+            for index, job in enumerate(sorted(self._heap)):
+                if job.job_id == job_id:
+                    return index + 1
+        return None
+
+    def retry_after(self) -> int:
+        with self._cond:
+            backlog = len(self._heap) + len(self._running)
+            return max(1, math.ceil(self._avg_duration * backlog / max(self.workers, 1)))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queue_capacity": self.max_queue,
+                "queued": len(self._heap),
+                "running": len(self._running),
+                "avg_job_seconds": round(self._avg_duration, 3),
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = heapq.heappop(self._heap)
+                self._virtual_time = max(self._virtual_time, job.tag)
+                if not self._heap:
+                    self._tenant_tags.clear()
+                started = time.monotonic()
+                self._running[job.job_id] = started
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} raised: {str(e)}", exc_info=True)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running.pop(job.job_id, None)
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
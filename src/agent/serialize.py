@@ -0,0 +1,183 @@
+import sys
+import json
+import math
+import gzip
+import datetime
+import importlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:  # optional: only JSON responses are offered without it
+    ormsgpack = None
+
+try:
+    import zstandard
+except ImportError:  # optional: responses and checkpoints fall back to gzip
+    zstandard = None
+
+# Version of the compact analysis layout produced by compact_analysis()
+RESULT_SCHEMA_VERSION = 1
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+_modules: Dict[str, Any] = {}
+
+
+def _loaded(name: str):
+    # A value can only be a numpy/pandas object once numpy/pandas were imported
+    # by someone else, so plain job records never pay for importing them here
+    module = _modules.get(name)
+    if module is None and name in sys.modules:
+        # import_module waits for an import still running in another thread (e.g. the warmup)
+        module = _modules[name] = importlib.import_module(name)
+    return module
+
+
+def _scalar(value: Any) -> Any:
+    if value is None:
+        return None
+    np, pd = _loaded("numpy"), _loaded("pandas")
+    if pd is not None:
+        if value is pd.NA or value is pd.NaT:
+            return None
+        if isinstance(value, pd.Timedelta):
+            return value.total_seconds()
+    if isinstance(value, bool) or (np is not None and isinstance(value, np.bool_)):
+        return bool(value)
+    if np is not None and isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, float) or (np is not None and isinstance(value, np.floating)):
+        value = float(value)
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Convert analysis results (DataFrames, Series, numpy values) to plain JSON types.
+
+    DataFrames become ``{"columns": [...], "index": [...], "data": [[...]]}``
+    (pandas' "split" layout) so the payload carries no live pandas objects.
+    """
+    np, pd = _loaded("numpy"), _loaded("pandas")
+    if pd is not None and isinstance(obj, pd.DataFrame):
+        return {
+            "columns": [str(c) for c in obj.columns],
+            "index": [str(i) for i in obj.index],
+            "data": [[_scalar(v) for v in row] for row in obj.itertuples(index=False, name=None)],
+        }
+    if pd is not None and isinstance(obj, pd.Series):
+        return {str(k): _scalar(v) for k, v in obj.items()}
+    if np is not None and isinstance(obj, np.ndarray):
+        return [to_jsonable(v) for v in obj.tolist()]
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    return _scalar(obj)
+
+
+def _stat_arrays(summary: Optional["pd.DataFrame"]) -> Dict[str, Any]:
+    if summary is None or getattr(summary, "empty", True):
+        return {"columns": [], "stats": {}}
+    stats = {}
+    for stat, values in zip(summary.index, summary.to_numpy(dtype=object)):
+        values = [_scalar(v) for v in values]
+        if stat in ("count", "unique", "freq"):
+            values = [int(v) if isinstance(v, float) else v for v in values]
+        stats[str(stat)] = values
+    return {"columns": [str(c) for c in summary.columns], "stats": stats}
+
+
+def compact_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Columnar, JSON-ready form of an ``analyze_rows`` result.
+
+    Each summary table becomes one array per statistic, aligned with its
+    ``columns`` list::
+
+        {"schema": 1, "rows_analyzed": 1200, "column_types": {...},
+         "numeric": {"columns": ["price", "qty"],
+                     "stats": {"count": [1200, 1180], "mean": [9.5, 3.1], ...}},
+         "categorical": {"columns": ["region"],
+                         "stats": {"count": [1200], "unique": [4], "top": ["N"], "freq": [610]}}}
+
+    Missing values are null. Other keys are passed through ``to_jsonable``.
+    """
+    if not analysis or "error" in analysis:
+        return to_jsonable(analysis or {})
+    compact = {
+        "schema": RESULT_SCHEMA_VERSION,
+        "rows_analyzed": _scalar(analysis.get("rows_analyzed")),
+        "column_types": to_jsonable(analysis.get("column_types", {})),
+        "numeric": _stat_arrays(analysis.get("summary_of_numerical_columns", {}).get("summary")),
+        # Per-column profile (outliers, histograms, correlations), when it was computed
+        **{
+            key: to_jsonable(value)
+            for key, value in analysis.get("summary_of_numerical_columns", {}).items() if key != "summary"
+        },
+        "categorical": _stat_arrays(analysis.get("summary_of_categorical_columns", {}).get("summary")),
+    }
+    for key, value in analysis.items():
+        if key not in ("summary_of_numerical_columns", "summary_of_categorical_columns") and key not in compact:
+            compact[key] = to_jsonable(value)
+    return compact
+
+
+def _default(obj: Any) -> Any:
+    # Called by the encoders only for values they cannot handle natively
+    np, pd = _loaded("numpy"), _loaded("pandas")
+    if (pd is not None and isinstance(obj, (pd.DataFrame, pd.Series))) or (np is not None and isinstance(obj, np.ndarray)):
+        return to_jsonable(obj)
+    value = _scalar(obj)
+    if value is obj:
+        raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+    return value
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON (orjson when available); pandas/numpy values are converted."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(to_jsonable(obj), separators=(",", ":")).encode()
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    if ormsgpack is None:
+        raise RuntimeError("MessagePack output needs the ormsgpack package")
+    return ormsgpack.packb(obj, default=_default, option=ormsgpack.OPT_NON_STR_KEYS)
+
+
+def supported_encodings() -> List[str]:
+    """Content-Encodings ``compress`` can produce, best first."""
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=5)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompress(body)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
@@ -1,41 +1,410 @@
 import os
+import re
+import json
+import asyncio
+import weakref
+import logging
+import threading
+import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from urllib.parse import quote
 
 from dataclasses import dataclass
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from .ratelimit import BACKGROUND, call_with_retry, acall_with_retry
 
+logger=logging.getLogger(__name__)
 
 SCOPES=['https://www.googleapis.com/auth/spreadsheets']
 
+# google-auth, googleapiclient and httpx are imported by the functions that
+# first need them, so importing this module (and the app) stays cheap
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN=datetime.timedelta(minutes=5)
+
 @dataclass
 class SheetsConfig:
     spreadsheet_id:str
     read_range:str
     write_range:str
     service_account_json:str="crediantials/service_account.json"
+    # "interactive" callers are served ahead of "background" jobs when quota is short
+    priority:str=BACKGROUND
 
-def get_sheets_service(service_account_json):
+
+_discovery_lock=threading.Lock()
+_discovery_doc=None
+
+def _sheets_discovery_doc():
+    """Sheets v4 discovery document, parsed once from the copy bundled with googleapiclient."""
+    global _discovery_doc
+    if _discovery_doc is None:
+        with _discovery_lock:
+            if _discovery_doc is None:
+                from googleapiclient.discovery_cache import get_static_doc
+                _discovery_doc=json.loads(get_static_doc("sheets","v4"))
+    return _discovery_doc
+
+
+class SheetsClientPool:
+    """Pool of authorized Sheets clients sharing one set of credentials.
+
+    ``httplib2.Http`` is not thread-safe, so every client owns its own
+    keep-alive HTTP session and is handed to at most one thread at a time.
+    A background thread refreshes the shared access token before it expires,
+    so requests never pay for a token round-trip inline.
+    """
+
+    def __init__(self,json_path,scopes,max_size=8,timeout=60):
+        from google.oauth2 import service_account
+
+        self.json_path=json_path
+        self.scopes=tuple(scopes)
+        self.max_size=max_size
+        self.timeout=timeout
+        self.credentials=service_account.Credentials.from_service_account_file(json_path,scopes=list(self.scopes))
+        self._credentials_lock=threading.Lock()
+        self._idle=[]
+        self._sessions=[]
+        self._created=0
+        self._available=threading.Condition()
+        self._stop=threading.Event()
+        self._refresher=threading.Thread(target=self._refresh_loop,name="sheets-token-refresh",daemon=True)
+        self._refresher.start()
+
+    def _build_client(self):
+        import httplib2
+        import google_auth_httplib2
+        from googleapiclient.discovery import build_from_document
+
+        session=httplib2.Http(timeout=self.timeout)
+        http=google_auth_httplib2.AuthorizedHttp(self.credentials,http=session)
+        service=build_from_document(_sheets_discovery_doc(),http=http)
+        return service.spreadsheets(),session
+
+    def _new_client(self):
+        client,session=self._build_client()
+        self._sessions.append(session)
+        return client
+
+    def standalone_client(self):
+        """Client outside the pool: shares the credentials and their refresh, but
+        its HTTP session is neither tracked nor reused and goes away with it."""
+        client,_=self._build_client()
+        return client
+
+    @contextmanager
+    def checkout(self):
+        with self._available:
+            while not self._idle and self._created>=self.max_size:
+                self._available.wait()
+            if self._idle:
+                client=self._idle.pop()
+            else:
+                self._created+=1
+                client=None
+        if client is None:
+            try:
+                client=self._new_client()
+            except Exception:
+                with self._available:
+                    self._created-=1
+                    self._available.notify()
+                raise
+        try:
+            yield client
+        finally:
+            with self._available:
+                self._idle.append(client)
+                self._available.notify()
+
+    def refresh(self):
+        from google.auth.transport.requests import Request
+
+        with self._credentials_lock:
+            self.credentials.refresh(Request())
+
+    def _seconds_until_refresh(self):
+        expiry=self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return 0
+        now=datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max((expiry-TOKEN_REFRESH_MARGIN-now).total_seconds(),0)
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            delay=self._seconds_until_refresh()
+            if delay and self._stop.wait(delay):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Background token refresh failed: {str(e)}")
+                if self._stop.wait(30):
+                    return
+
+    def close(self):
+        self._stop.set()
+        with self._available:
+            self._idle.clear()
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+
+
+_pools={}
+_pools_lock=threading.Lock()
+
+def _resolve_json_path(service_account_json):
     json_path=service_account_json or os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON","crediantials/service_account.json")
 
     if not os.path.exists(json_path):
         raise FileNotFoundError(
             f"Google service account file not found at {json_path}"
         )
-    creds=service_account.Credentials.from_service_account_file(json_path,scopes=SCOPES)
-    service=build("sheets","v4",credentials=creds)
+    return os.path.abspath(json_path)
+
+def get_client_pool(service_account_json,scopes=SCOPES):
+    json_path=_resolve_json_path(service_account_json)
+    key=(json_path,tuple(sorted(scopes)))
+    pool=_pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool=_pools.get(key)
+            if pool is None:
+                pool=SheetsClientPool(json_path,scopes,max_size=int(os.getenv("SHEETS_POOL_SIZE","8")))
+                _pools[key]=pool
+    return pool
+
+@contextmanager
+def sheets_client(service_account_json,scopes=SCOPES):
+    with get_client_pool(service_account_json,scopes).checkout() as sheets:
+        yield sheets
+
+def get_sheets_service(service_account_json):
+    """Dedicated (unpooled) spreadsheets resource sharing the pooled credentials.
+
+    Prefer ``sheets_client`` for request-scoped use; the object returned here
+    owns its own HTTP session, is not registered with the pool and must not
+    be shared across threads.
+    """
+    return get_client_pool(service_account_json).standalone_client()
+
+
+def execute(service_account_json,spreadsheet_id,build_request,priority=BACKGROUND):
+    """Run ``build_request(sheets).execute()`` on a pooled client within the Sheets quota.
+
+    Every Sheets call goes through the process-wide rate limiter; 429 and 5xx
+    responses are retried with backoff. No pooled client is held while waiting.
+    """
+    def call():
+        with sheets_client(service_account_json) as sheets:
+            return build_request(sheets).execute()
+    return call_with_retry(call,_resolve_json_path(service_account_json),spreadsheet_id,priority)
 
-    return service.spreadsheets()
-    
 
 def read_sheet(config: SheetsConfig):
-    sheets=get_sheets_service(config.service_account_json)
-    result=result = (
-        sheets.values()
-        .get(spreadsheetId=config.spreadsheet_id, range=config.read_range)
-        .execute()
+    result = execute(
+        config.service_account_json,
+        config.spreadsheet_id,
+        lambda sheets: sheets.values().get(spreadsheetId=config.spreadsheet_id, range=config.read_range),
+        config.priority,
     )
     values = result.get("values", [])
     return values
 
 
+SHEETS_API_URL="https://sheets.googleapis.com/v4/spreadsheets"
+
+_async_clients=weakref.WeakKeyDictionary()
+
+def _async_http():
+    """httpx.AsyncClient for the running event loop (clients cannot cross loops)."""
+    loop=asyncio.get_running_loop()
+    client=_async_clients.get(loop)
+    if client is None:
+        import httpx
+
+        client=httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0),
+            limits=httpx.Limits(max_connections=int(os.getenv("SHEETS_ASYNC_MAX_CONNECTIONS","100"))),
+        )
+        _async_clients[loop]=client
+    return client
+
+async def _access_token(pool):
+    if not pool.credentials.valid:
+        await asyncio.to_thread(pool.refresh)
+    return pool.credentials.token
+
+async def aread_sheet(config: SheetsConfig):
+    """Non-blocking read_sheet: calls the Sheets REST API directly over httpx.
+
+    Shares credentials (and their background refresh) with the sync client
+    pool; only a token refresh that is actually due runs in a worker thread.
+    """
+    pool=await asyncio.to_thread(get_client_pool,config.service_account_json)
+    url=f"{SHEETS_API_URL}/{quote(config.spreadsheet_id,safe='')}/values/{quote(config.read_range,safe='')}"
+
+    async def call():
+        token=await _access_token(pool)
+        response=await _async_http().get(url,headers={"Authorization":f"Bearer {token}"})
+        response.raise_for_status()
+        return response.json()
+
+    result=await acall_with_retry(call,pool.json_path,config.spreadsheet_id,config.priority)
+    return result.get("values",[])
+
+
+def batch_read(service_account_json,spreadsheet_id,ranges,priority=BACKGROUND):
+    """Read several ranges of one spreadsheet with a single values().batchGet.
+
+    Returns one list of rows per requested range, in request order.
+    """
+    ranges=list(ranges)
+    result=execute(
+        service_account_json,
+        spreadsheet_id,
+        lambda sheets: sheets.values().batchGet(spreadsheetId=spreadsheet_id,ranges=ranges),
+        priority,
+    )
+    value_ranges=result.get("valueRanges",[])
+    return [value_range.get("values",[]) for value_range in value_ranges]
+
+
+@dataclass
+class RowBlock:
+    start_row:int
+    rows:list
+
+    @property
+    def end_row(self):
+        return self.start_row+len(self.rows)-1
+
+    def __len__(self):
+        return len(self.rows)
+
+
+_A1_CELL=re.compile(r"^([A-Za-z]*)(\d*)$")
+
+def _column_number(letters):
+    number=0
+    for ch in letters.upper():
+        number=number*26+(ord(ch)-ord("A")+1)
+    return number
+
+def _column_letters(number):
+    letters=""
+    while number>0:
+        number,rem=divmod(number-1,26)
+        letters=chr(ord("A")+rem)+letters
+    return letters
+
+def parse_a1_range(a1_range):
+    """Split an A1 range into (sheet, first_col, first_row, last_col, last_row).
+
+    Missing bounds come back as None, e.g. ``Sheet1!A:Z`` has no row bounds
+    and a bare ``Sheet1`` has none at all.
+    """
+    sheet,_,cells=a1_range.rpartition("!")
+    if not sheet:
+        sheet,cells=cells,""
+    if not cells:
+        return sheet,None,None,None,None
+    start,_,end=cells.partition(":")
+    start_match=_A1_CELL.match(start)
+    end_match=_A1_CELL.match(end or start)
+    if not start_match or not end_match:
+        raise ValueError(f"Unsupported A1 range: {a1_range}")
+    first_col,first_row=start_match.groups()
+    last_col,last_row=end_match.groups()
+    return (
+        sheet,
+        first_col.upper() or None,
+        int(first_row) if first_row else None,
+        last_col.upper() or None,
+        int(last_row) if last_row else None,
+    )
+
+def _quote_sheet(sheet):
+    if sheet.startswith("'"):
+        return sheet
+    return "'"+sheet.replace("'","''")+"'"
+
+def get_sheet_extent(service_account_json,spreadsheet_id,sheet,priority=BACKGROUND):
+    """Return the (row_count, column_count) grid size of a single sheet."""
+    meta=execute(
+        service_account_json,
+        spreadsheet_id,
+        lambda sheets: sheets.get(
+            spreadsheetId=spreadsheet_id,
+            ranges=[_quote_sheet(sheet)],
+            fields="sheets(properties(title,gridProperties(rowCount,columnCount)))",
+        ),
+        priority,
+    )
+    grid=meta["sheets"][0]["properties"]["gridProperties"]
+    return grid.get("rowCount",0),grid.get("columnCount",0)
+
+def _fetch_windows(service_account_json,spreadsheet_id,windows,priority=BACKGROUND):
+    value_ranges=batch_read(service_account_json,spreadsheet_id,[a1 for _,a1 in windows],priority)
+    return [
+        RowBlock(start_row=start,rows=rows)
+        for (start,_),rows in zip(windows,value_ranges)
+    ]
+
+def iter_sheet_blocks(config: SheetsConfig,chunk_rows=None,max_concurrency=None,windows_per_request=2):
+    """Stream ``config.read_range`` as consecutive ``RowBlock`` objects.
+
+    The sheet's real grid size replaces any missing bounds, so ``Sheet1!A:Z``
+    or ``Sheet1`` reads every row; explicit row bounds are still honoured.
+    Row windows of ``chunk_rows`` are fetched through ``values().batchGet``
+    with at most ``max_concurrency`` requests in flight, and blocks are
+    yielded in sheet order as soon as they arrive. The first block starts
+    with the range's first row (normally the header). Reading always runs to
+    the end of the range, capped at the grid's row count, so runs of blank
+    rows are skipped rather than taken for the end of the data.
+    """
+    chunk_rows=chunk_rows or int(os.getenv("SHEETS_CHUNK_ROWS","5000"))
+    max_concurrency=max_concurrency or int(os.getenv("SHEETS_STREAM_CONCURRENCY","4"))
+
+    sheet,first_col,first_row,last_col,last_row=parse_a1_range(config.read_range)
+    row_count,column_count=get_sheet_extent(config.service_account_json,config.spreadsheet_id,sheet,config.priority)
+    first_col=first_col or "A"
+    last_col=last_col or _column_letters(max(column_count,1))
+    first_row=first_row or 1
+    last_row=min(last_row or row_count,row_count)
+
+    def requests():
+        windows=[]
+        for start in range(first_row,last_row+1,chunk_rows):
+            end=min(start+chunk_rows-1,last_row)
+            windows.append((start,f"{_quote_sheet(sheet)}!{first_col}{start}:{last_col}{end}"))
+            if len(windows)==windows_per_request:
+                yield windows
+                windows=[]
+        if windows:
+            yield windows
+
+    pending=deque()
+    executor=ThreadPoolExecutor(max_workers=max_concurrency,thread_name_prefix="sheets-stream")
+    try:
+        request_iter=requests()
+        for windows in islice(request_iter,max_concurrency):
+            pending.append(executor.submit(_fetch_windows,config.service_account_json,config.spreadsheet_id,windows,config.priority))
+        while pending:
+            blocks=pending.popleft().result()
+            next_windows=next(request_iter,None)
+            if next_windows is not None:
+                pending.append(executor.submit(_fetch_windows,config.service_account_json,config.spreadsheet_id,next_windows,config.priority))
+            for block in blocks:
+                if block.rows:
+                    yield block
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -0,0 +1,44 @@
+import threading
+from typing import Dict, Hashable, List, Optional
+
+
+class SingleFlight:
+    """Tracks in-flight jobs by request key so duplicates can share one run.
+
+    The first job for a key becomes the leader; identical requests made while
+    it is queued or running are recorded as followers and receive the
+    leader's result when ``complete`` is called.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leaders: Dict[Hashable, str] = {}
+        self._followers: Dict[Hashable, List[str]] = {}
+        self.counters = {"leaders": 0, "coalesced": 0}
+
+    def join(self, key: Hashable, job_id: str) -> Optional[str]:
+        """Register ``job_id``; return the leader's job id if one is in flight, else None."""
+        with self._lock:
+            leader = self._leaders.get(key)
+            if leader is None:
+                self._leaders[key] = job_id
+                self._followers[key] = []
+                self.counters["leaders"] += 1
+                return None
+            self._followers[key].append(job_id)
+            self.counters["coalesced"] += 1
+            return leader
+
+    def complete(self, key: Hashable) -> List[str]:
+        """Forget the in-flight leader for ``key`` and return its followers."""
+        with self._lock:
+            self._leaders.pop(key, None)
+            return self._followers.pop(key, [])
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "in_flight": len(self._leaders),
+                "waiting_followers": sum(len(f) for f in self._followers.values()),
+            }
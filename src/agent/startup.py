@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Packages the first job would otherwise import inline, in the order it needs them
+WARM_IMPORTS = (
+    "numpy",
+    "pandas",
+    "google.oauth2.service_account",
+    "googleapiclient.discovery",
+    "langchain_ollama",
+    "langgraph.graph",
+)
+# Pause between warm-up attempts after a failure (0 gives up after the first)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+
+class StartupReport:
+    """Where the process spent its time between starting and being ready to serve.
+
+    ``phase`` times a startup step and ``timed_import`` the first import of a
+    package; both are kept with their offset from ``started``. Milestones
+    ("up", "ready", "first_request", ...) are recorded the first time they
+    happen. ``format`` renders the steps like ``python -X importtime``.
+    A failed warm-up is kept in ``error`` and leaves the report not ready.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.steps = []
+        self.milestones: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def _since_start(self, at: float) -> float:
+        return round((at - self.started) * 1000, 1)
+
+    def _record(self, kind: str, name: str, started: float):
+        ended = time.perf_counter()
+        with self._lock:
+            self.steps.append({
+                "kind": kind,
+                "name": name,
+                "ms": round((ended - started) * 1000, 1),
+                "at_ms": self._since_start(ended),
+            })
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record("phase", name, started)
+
+    def timed_import(self, module: str):
+        """Import ``module``, recording how long it took if it was not loaded yet."""
+        if module in sys.modules:
+            return sys.modules[module]
+        started = time.perf_counter()
+        imported = importlib.import_module(module)
+        self._record("import", module, started)
+        return imported
+
+    def mark(self, milestone: str):
+        with self._lock:
+            self.milestones.setdefault(milestone, self._since_start(time.perf_counter()))
+
+    def mark_failed(self, error: str):
+        with self._lock:
+            self.error = error
+            self.failures += 1
+
+    def mark_ready(self):
+        self.error = None
+        self.mark("ready")
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "uptime_ms": self._since_start(time.perf_counter()),
+                "milestones": dict(self.milestones),
+                "steps": list(self.steps),
+                "modules_loaded": len(sys.modules),
+                "error": self.error,
+                "failed_attempts": self.failures,
+            }
+
+    def format(self) -> str:
+        report = self.as_dict()
+        lines = ["startup: self [ms] |  at [ms] | step"]
+        for step in report["steps"]:
+            name = f"import {step['name']}" if step["kind"] == "import" else step["name"]
+            lines.append(f"startup: {step['ms']:>9.1f} | {step['at_ms']:>8.1f} | {name}")
+        for milestone, at in sorted(report["milestones"].items(), key=lambda item: item[1]):
+            lines.append(f"startup: {'':>9} | {at:>8.1f} | <{milestone}>")
+        lines.append(f"startup: {report['modules_loaded']} modules loaded")
+        return "\n".join(lines)
+
+
+def warm_up(graphs: Iterable[str], invoke: bool = False, report: Optional[StartupReport] = None,
+            imports: Iterable[str] = WARM_IMPORTS) -> bool:
+    """Import the heavy packages, compile ``graphs`` and load the Sheets discovery document.
+
+    With ``invoke`` every graph also runs once on a stub input with stand-in
+    sources (see ``GraphRegistry.warmup``). Marks ``report`` ready and
+    returns True when every step succeeded; a failure is logged and kept in
+    the report, which stays not ready since jobs would most likely fail the
+    same way.
+    """
+    from .registry import registry
+    from .sheets import _sheets_discovery_doc
+
+    report = report or startup
+    graphs = list(graphs)
+    try:
+        for module in imports:
+            report.timed_import(module)
+        for name in graphs:
+            with report.phase(f"compile graph '{name}'"):
+                registry.get(name)
+        with report.phase("sheets discovery document"):
+            _sheets_discovery_doc()
+        if invoke:
+            for name in graphs:
+                with report.phase(f"warmup run '{name}'"):
+                    registry.warmup(name, invoke=True)
+    except Exception as e:
+        report.mark_failed(str(e))
+        logger.error(f"Warmup failed, not ready: {str(e)}", exc_info=True)
+        return False
+    report.mark_ready()
+    logger.info(f"Ready after {report.milestones['ready']:.0f} ms\n{report.format()}")
+    return True
+
+
+def _warm_up_until_ready(graphs, invoke, report, retry_seconds):
+    while not warm_up(graphs, invoke, report) and retry_seconds > 0:
+        logger.info(f"Retrying warmup in {retry_seconds:.0f}s")
+        time.sleep(retry_seconds)
+
+
+def warm_up_in_background(graphs: Iterable[str], invoke: bool = False, report: Optional[StartupReport] = None,
+                          retry_seconds: float = WARMUP_RETRY_SECONDS) -> threading.Thread:
+    """Run ``warm_up`` on a daemon thread, retrying every ``retry_seconds`` until it succeeds."""
+    thread = threading.Thread(
+        target=_warm_up_until_ready, args=(list(graphs), invoke, report, retry_seconds), name="warmup", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+# Created when the entry point first imports this module, which it does before anything heavy
+startup = StartupReport()
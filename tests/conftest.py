@@ -0,0 +1,32 @@
+import os
+import sys
+from contextlib import ExitStack
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# agent lives under src/; the Sheets and Ollama fakes under benchmarks/
+sys.path[:0] = [os.path.join(ROOT, "src"), ROOT]
+
+
+@pytest.fixture
+def sheet():
+    """``sheet(rows)`` serves ``rows`` as Sheet1 to every Sheets call until the test ends."""
+    from benchmarks.fakes import FakeSpreadsheet, fake_sheets
+
+    with ExitStack() as stack:
+        def install(rows):
+            return stack.enter_context(fake_sheets(FakeSpreadsheet(rows, latency=0)))
+
+        yield install
+
+
+@pytest.fixture
+def sheets_config():
+    from agent.sheets import SheetsConfig
+
+    def make(read_range="Sheet1"):
+        return SheetsConfig(spreadsheet_id="sheet", read_range=read_range, write_range="",
+                            service_account_json="fake.json")
+
+    return make
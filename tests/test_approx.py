@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from agent.approx import analyze_approximate
+from agent.approxconfig import approximation_settings
+from agent.ingest import build_frame
+
+from benchmarks.fakes import synthetic_rows
+
+
+def test_large_sheet_stops_early_with_interval_around_true_mean(sheet, sheets_config):
+    rows = synthetic_rows(40_000, 4, kinds=("numeric", "category"), seed=21)
+    sheet(rows)
+    analysis = analyze_approximate(sheets_config(), accuracy=0.05, confidence=0.95, seed=1)
+    info = analysis["approximate"]
+    assert info["converged"]
+    assert info["stopped_early"]
+    assert info["windows_read"] < info["windows_total"] == 80
+    assert info["rows_sampled"] == analysis["rows_analyzed"] < 40_000
+
+    frame, _ = build_frame(rows[0], rows[1:])
+    for name in ("numeric_1", "numeric_3"):
+        low, high = info["intervals"][name]["mean"]
+        assert low <= frame[name].mean() <= high
+
+
+def test_intervals_cover_the_true_mean_at_the_stated_rate(sheet, sheets_config):
+    rows = synthetic_rows(20_000, 1, kinds=("numeric",), seed=22)
+    sheet(rows)
+    truth = np.mean([float(row[0]) for row in rows[1:]])
+    covered = 0
+    for seed in range(20):
+        low, high = analyze_approximate(sheets_config(), accuracy=0.02, seed=seed)["approximate"]["intervals"]["numeric_1"]["mean"]
+        covered += low <= truth <= high
+    # 95% intervals: missing more than 4 of 20 is very unlikely (p < 0.02)
+    assert covered >= 16
+
+
+def test_small_sheet_is_read_in_full(sheet, sheets_config):
+    sheet(synthetic_rows(300, 3, seed=23))
+    info = analyze_approximate(sheets_config(), seed=1)["approximate"]
+    assert info["windows_read"] == info["windows_total"] == 1
+    assert not info["stopped_early"]
+
+
+def test_empty_sheet(sheet, sheets_config):
+    sheet([])
+    assert analyze_approximate(sheets_config())["error"] == "No Data"
+
+
+@pytest.mark.parametrize("data", [
+    {"accuracy": 0},
+    {"accuracy": "nope"},
+    {"accuracy": float("nan")},
+    {"confidence": 1},
+    {"confidence": 0},
+])
+def test_invalid_settings_are_rejected(data):
+    with pytest.raises(ValueError):
+        approximation_settings(data)
+
+
+def test_settings_fall_back_to_environment(monkeypatch):
+    assert approximation_settings({"accuracy": None}) == (0.05, 0.95)
+    monkeypatch.setenv("ANALYSIS_ACCURACY", "0.1")
+    monkeypatch.setenv("ANALYSIS_CONFIDENCE", "0.9")
+    assert approximation_settings({}) == (0.1, 0.9)
+    assert approximation_settings({"accuracy": "0.2"}) == (0.2, 0.9)
+    monkeypatch.setenv("ANALYSIS_CONFIDENCE", "2")
+    with pytest.raises(ValueError):
+        approximation_settings({})
@@ -0,0 +1,80 @@
+import pytest
+
+from agent.analysis import analyze_rows
+from agent.cache import MemoryTier
+from agent.incremental import DELTA, FULL, UNCHANGED, IncrementalStore, analyze_incremental
+
+from benchmarks.fakes import synthetic_rows
+
+
+@pytest.fixture
+def store():
+    return IncrementalStore(MemoryTier(max_entries=16, ttl=0))
+
+
+def _assert_same_summary(folded, full):
+    assert folded["rows_analyzed"] == full["rows_analyzed"]
+    assert folded["column_types"] == full["column_types"]
+    numeric_a = folded["summary_of_numerical_columns"]["summary"]
+    numeric_b = full["summary_of_numerical_columns"]["summary"]
+    for name in numeric_b.columns:
+        for stat in ("count", "min", "max"):
+            assert numeric_a.loc[stat, name] == numeric_b.loc[stat, name]
+        if full["column_types"][name] != "datetime":
+            assert numeric_a.loc["mean", name] == pytest.approx(numeric_b.loc["mean", name], rel=1e-9)
+            assert numeric_a.loc["std", name] == pytest.approx(numeric_b.loc["std", name], rel=1e-9)
+    categorical_a = folded["summary_of_categorical_columns"]["summary"]
+    categorical_b = full["summary_of_categorical_columns"]["summary"]
+    assert list(categorical_a.columns) == list(categorical_b.columns)
+    for name in categorical_b.columns:
+        count, unique, top, freq = categorical_b[name].tolist()
+        assert categorical_a[name].tolist()[:2] == [count, unique]
+        if unique <= 256:
+            assert categorical_a[name].tolist()[2:] == [top, freq]
+        else:
+            # Past the Misra-Gries capacity frequencies are lower bounds off by at most count / capacity
+            assert freq - count / 256 <= categorical_a.loc["freq", name] <= freq
+
+
+def test_appended_rows_are_folded_like_a_full_reanalysis(sheet, sheets_config, store):
+    rows = synthetic_rows(3_000, 7, seed=11)
+    spreadsheet = sheet(rows[:2_001])
+    config = sheets_config()
+
+    _, info = analyze_incremental(config, store)
+    assert info["mode"] == FULL
+
+    spreadsheet.rows.extend(rows[2_001:])
+    folded, info = analyze_incremental(config, store)
+    assert info["mode"] == DELTA
+    assert info["rows_total"] == len(rows)
+    # Header, anchor row and the 1,000 new rows
+    assert info["rows_fetched"] == 1_002
+
+    _, fresh = analyze_incremental(config, IncrementalStore(MemoryTier(max_entries=16, ttl=0)))
+    assert fresh["mode"] == FULL
+    _assert_same_summary(folded, analyze_rows(rows))
+
+
+def test_unchanged_sheet_reads_no_new_rows(sheet, sheets_config, store):
+    sheet(synthetic_rows(500, 4, seed=12))
+    config = sheets_config()
+    first, _ = analyze_incremental(config, store)
+    again, info = analyze_incremental(config, store)
+    assert info["mode"] == UNCHANGED
+    assert info["rows_fetched"] == 2
+    assert again["rows_analyzed"] == first["rows_analyzed"]
+
+
+def test_edited_prefix_triggers_rebuild(sheet, sheets_config, store):
+    rows = synthetic_rows(500, 4, seed=13)
+    spreadsheet = sheet(rows)
+    config = sheets_config()
+    analyze_incremental(config, store)
+
+    spreadsheet.rows[-1] = ["changed"] + spreadsheet.rows[-1][1:]
+    spreadsheet.rows.append(rows[1])
+    analysis, info = analyze_incremental(config, store)
+    assert info["mode"] == FULL
+    assert info["prefix_changed"]
+    assert analysis["rows_analyzed"] == len(spreadsheet.rows) - 1
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from agent.ingest import CATEGORICAL, DATETIME, NUMERIC, PERCENT, TEXT, build_frame, infer_column_kind
+
+
+@pytest.mark.parametrize("values, kind", [
+    (["1", "2.5", "$1,000", "(3)"], NUMERIC),
+    (["10%", "2.5%", "99%"], PERCENT),
+    (["2024-01-05", "2024-02-10", "2024-03-15"], DATETIME),
+    (["007", "012", "345"], TEXT),
+    (["a", "b", "a", "b", "a", "b"], CATEGORICAL),
+])
+def test_infer_column_kind(values, kind):
+    assert infer_column_kind(pd.Series(values)) == kind
+
+
+def test_leading_zero_identifiers_keep_their_digits():
+    frame, schema = build_frame(["zip"], [["02134"], ["10001"], ["00501"], ["02134"], ["94105"]])
+    assert schema["zip"] != NUMERIC
+    assert frame["zip"].astype(str).tolist() == ["02134", "10001", "00501", "02134", "94105"]
+
+
+def test_day_first_dates_use_one_format_for_the_column():
+    data = [["01/02/2024"], ["13/02/2024"], ["25/12/2024"], ["05/06/2024"]]
+    date_formats = {}
+    frame, schema = build_frame(["when"], data, date_formats=date_formats)
+    assert schema["when"] == DATETIME
+    assert date_formats["when"] == "%d/%m/%Y"
+    assert frame["when"].dt.month.tolist() == [2, 2, 12, 6]
+
+
+def test_ambiguous_dates_are_read_month_first():
+    date_formats = {}
+    frame, _ = build_frame(["when"], [["01/02/2024"], ["03/04/2024"]], date_formats=date_formats)
+    assert date_formats["when"] == "%m/%d/%Y"
+    assert frame["when"].dt.month.tolist() == [1, 3]
+
+
+def test_later_chunks_reuse_schema_and_date_format():
+    date_formats = {}
+    _, schema = build_frame(["when", "n"], [["13/02/2024", "1"], ["14/02/2024", "2"]], date_formats=date_formats)
+    # On its own "01/03/2024" would read month-first
+    frame, _ = build_frame(["when", "n"], [["01/03/2024", "x"]], schema=schema, date_formats=date_formats)
+    assert frame["when"].dt.month.tolist() == [3]
+    assert frame["n"].isna().all()
+
+
+def test_ragged_rows_are_padded():
+    frame, _ = build_frame(["a", "b"], [["1"], ["2", "3", "4"]])
+    assert list(frame.columns)[:2] == ["a", "b"]
+    assert frame.shape == (2, 3)
+    assert frame["b"].isna().tolist() == [True, False]
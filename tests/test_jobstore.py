@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from agent.jobstore import JobStore, MemoryJobStore, SQLiteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryJobStore(**kwargs)
+        return SQLiteJobStore(str(tmp_path / "jobs.db"), **kwargs)
+
+    return make
+
+
+def test_put_get_update_delete(make_store):
+    store = make_store()
+    store.put("a", {"status": "queued", "spreadsheet_id": "sheet"})
+    record = store.get("a")
+    assert record["status"] == "queued"
+    assert record["spreadsheet_id"] == "sheet"
+    assert record["created_at"] <= record["updated_at"]
+
+    store.update("a", status="done", result={"rows": 3})
+    record = store.get("a")
+    assert record["status"] == "done"
+    assert record["result"] == {"rows": 3}
+    assert "a" in store
+
+    store.update("missing", status="done")
+    assert store.get("missing") is None
+    store.delete("a")
+    assert "a" not in store
+
+
+def test_put_keeps_created_at_and_spreadsheet_id(make_store):
+    store = make_store()
+    store.put("a", {"status": "queued", "spreadsheet_id": "sheet"})
+    created = store.get("a")["created_at"]
+    store.put("a", {"status": "done"})
+    record = store.get("a")
+    assert record["created_at"] == created
+    assert record["spreadsheet_id"] == "sheet"
+
+
+def test_payload_is_stored_as_json_types(make_store):
+    store = make_store()
+    frame = pd.DataFrame({"x": [1, 2]})
+    store.put("a", {"status": "done", "summary": frame.describe()})
+    assert isinstance(store.get("a")["summary"], dict)
+
+
+def test_partial_insights_round_trip(make_store):
+    store = make_store()
+    store.put("a", {"status": "running", "partial_insights": "first"})
+    assert store.get("a")["partial_insights"] == "first"
+    store.update("a", partial_insights="first second")
+    store.update("a", status="done")
+    record = store.get("a")
+    assert record["partial_insights"] == "first second"
+    assert record["status"] == "done"
+
+
+def test_list_filters_and_pages(make_store):
+    store = make_store()
+    for i in range(5):
+        store.put(f"job-{i}", {"status": "done" if i % 2 else "queued", "spreadsheet_id": f"s{i % 2}"})
+    total, page = store.list(status="queued")
+    assert total == 3
+    assert {job["job_id"] for job in page} == {"job-0", "job-2", "job-4"}
+    total, page = store.list(spreadsheet_id="s1", limit=1)
+    assert total == 2
+    assert len(page) == 1 and page[0]["spreadsheet_id"] == "s1"
+    total, page = store.list(limit=2, offset=4)
+    assert total == 5 and len(page) == 1
+
+
+def test_eviction_keeps_active_jobs(make_store):
+    store = make_store(max_jobs=2)
+    store.put("running", {"status": "running"})
+    for i in range(4):
+        store.put(f"done-{i}", {"status": "done"})
+    assert "running" in store
+    assert "done-3" in store
+    assert "done-0" not in store
+
+
+def test_fail_active_marks_orphaned_jobs(make_store):
+    store = make_store()
+    store.put("q", {"status": "queued"})
+    store.put("r", {"status": "running"})
+    store.put("d", {"status": "done"})
+    assert store.fail_active("restarted") == 2
+    assert store.get("q") == {**store.get("q"), "status": "error", "error": "restarted"}
+    assert store.get("r")["status"] == "error"
+    assert store.get("d")["status"] == "done"
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    SQLiteJobStore(path).put("a", {"status": "done", "partial_insights": "text"})
+    record = SQLiteJobStore(path).get("a")
+    assert record["status"] == "done"
+    assert record["partial_insights"] == "text"
+
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
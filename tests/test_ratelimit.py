@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from agent.ratelimit import BACKGROUND, INTERACTIVE, SheetsRateLimiter, TokenBucket, backoff_delay
+
+
+def _drain(limiter, account, sheet, calls=120):
+    for _ in range(calls):
+        limiter.acquire(account, sheet, INTERACTIVE)
+
+
+def _start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(per_minute=60)
+    bucket.tokens = 0.0
+    bucket.refill(bucket.updated + 2.5)
+    assert bucket.tokens == pytest.approx(2.5)
+    assert bucket.wait_time(bucket.updated) == 0.0
+    assert bucket.wait_time(bucket.updated, reserve=2.0) == pytest.approx(0.5)
+    bucket.refill(bucket.updated + 3600)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_interactive_waiter_goes_before_earlier_background_waiter():
+    limiter = SheetsRateLimiter(account_per_minute=120, spreadsheet_per_minute=6_000, interactive_reserve=0)
+    _drain(limiter, "account", "p")
+    order = []
+
+    def take(sheet, priority, name):
+        limiter.acquire("account", sheet, priority)
+        order.append(name)
+
+    background = _start(take, "q", BACKGROUND, "background")
+    time.sleep(0.05)
+    interactive = _start(take, "r", INTERACTIVE, "interactive")
+    background.join(10)
+    interactive.join(10)
+    assert order == ["interactive", "background"]
+
+
+def test_same_sheet_waiters_keep_arrival_order():
+    limiter = SheetsRateLimiter(account_per_minute=6_000, spreadsheet_per_minute=120, interactive_reserve=0)
+    _drain(limiter, "account", "sheet")
+    order = []
+
+    def take(name):
+        limiter.acquire("account", "sheet", BACKGROUND)
+        order.append(name)
+
+    threads = []
+    for name in ("first", "second", "third"):
+        threads.append(_start(take, name))
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join(10)
+    assert order == ["first", "second", "third"]
+
+
+def test_waiter_on_exhausted_sheet_does_not_block_other_sheets():
+    limiter = SheetsRateLimiter(account_per_minute=6_000, spreadsheet_per_minute=120)
+    _drain(limiter, "account", "busy")
+    waiter = _start(limiter.acquire, "account", "busy", INTERACTIVE)
+    time.sleep(0.05)
+    started = time.monotonic()
+    limiter.acquire("account", "other", BACKGROUND)
+    assert time.monotonic() - started < 0.5
+    waiter.join(10)
+
+
+def test_background_callers_leave_the_interactive_reserve():
+    limiter = SheetsRateLimiter(account_per_minute=60, spreadsheet_per_minute=6_000, interactive_reserve=0.5)
+    for _ in range(30):
+        limiter.acquire("account", "sheet", BACKGROUND)
+    blocked = _start(limiter.acquire, "account", "sheet", BACKGROUND)
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    started = time.monotonic()
+    limiter.acquire("account", "sheet", INTERACTIVE)
+    assert time.monotonic() - started < 0.5
+    blocked.join(10)
+
+
+def test_429_pauses_the_whole_account():
+    limiter = SheetsRateLimiter()
+    limiter.acquire("account", "sheet", INTERACTIVE)
+    delay = limiter.retry_delay("account", attempt=1, status=429, retry_after=0.3)
+    assert delay == pytest.approx(0.3)
+    started = time.monotonic()
+    limiter.acquire("account", "another-sheet", INTERACTIVE)
+    assert time.monotonic() - started >= 0.25
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_backoff_delay_honours_retry_after_and_cap():
+    assert backoff_delay(1, retry_after=5) == 5
+    assert backoff_delay(3, retry_after=1000, cap=32) == 64
+    assert all(0 <= backoff_delay(attempt, cap=4) <= 4 for attempt in range(1, 10))
@@ -0,0 +1,87 @@
+import pytest
+
+from agent.rowbuffer import RowBuffer, buffer_blocks, buffer_rows, buffer_stats, get_row_buffer, release_rows
+
+ROWS = [["name", "amount", "when"]] + [[f"row {i}", str(i * 1.5), "2024-01-02", ""] for i in range(1_000)]
+
+
+def test_small_buffer_stays_in_memory():
+    buffer = RowBuffer(spill_bytes=1 << 20)
+    buffer.append(ROWS)
+    assert not buffer.spilled
+    assert len(buffer) == len(ROWS)
+    assert buffer.read() == ROWS
+
+
+def test_buffer_spills_past_threshold_and_reads_back():
+    buffer = RowBuffer(spill_bytes=4_096)
+    for start in range(0, len(ROWS), 100):
+        buffer.append(ROWS[start:start + 100])
+    assert buffer.spilled
+    assert buffer.read() == ROWS
+    buffer.close()
+
+
+def test_digest_does_not_depend_on_spilling():
+    in_memory, spilled = RowBuffer(spill_bytes=1 << 20), RowBuffer(spill_bytes=0)
+    in_memory.append(ROWS)
+    spilled.append(ROWS[:10])
+    spilled.append(ROWS[10:])
+    assert spilled.spilled and not in_memory.spilled
+    assert spilled.digest() == in_memory.digest()
+    changed = RowBuffer()
+    changed.append(ROWS[:-1] + [["changed"]])
+    assert changed.digest() != in_memory.digest()
+
+
+@pytest.mark.parametrize("spill_bytes", [0, 1 << 20])
+def test_blocks_cover_every_row_in_order(spill_bytes):
+    buffer = RowBuffer(spill_bytes=spill_bytes)
+    buffer.append(ROWS)
+    blocks = list(buffer.blocks(300))
+    assert [len(block) for block in blocks] == [300, 300, 300, 101]
+    assert [row for block in blocks for row in block] == ROWS
+
+
+def test_empty_buffer():
+    buffer = RowBuffer(spill_bytes=0)
+    buffer.append([])
+    assert buffer.read() == []
+    assert list(buffer.blocks(10)) == []
+
+
+def test_registry_release():
+    before = buffer_stats()["buffers"]
+    buffer = buffer_rows(ROWS, spill_bytes=0)
+    assert get_row_buffer(buffer.handle) is buffer
+    assert buffer_stats()["buffers"] == before + 1
+    assert buffer_stats()["spilled"] >= 1
+    release_rows(buffer.handle)
+    release_rows(buffer.handle)
+    assert get_row_buffer(buffer.handle) is None
+    assert buffer_stats()["buffers"] == before
+
+
+def test_buffer_blocks_matches_buffer_rows():
+    blocks = (ROWS[start:start + 64] for start in range(0, len(ROWS), 64))
+    streamed = buffer_blocks(blocks, spill_bytes=2_048)
+    whole = buffer_rows(ROWS)
+    try:
+        assert streamed.spilled
+        assert streamed.read() == ROWS
+        assert streamed.digest() == whole.digest()
+    finally:
+        release_rows(streamed.handle)
+        release_rows(whole.handle)
+
+
+def test_buffer_blocks_is_not_registered_when_reading_fails():
+    before = buffer_stats()["buffers"]
+
+    def failing():
+        yield ROWS[:10]
+        raise RuntimeError("read failed")
+
+    with pytest.raises(RuntimeError):
+        buffer_blocks(failing())
+    assert buffer_stats()["buffers"] == before
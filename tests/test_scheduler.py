@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from agent.scheduler import JobScheduler, QueueFull
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = JobScheduler(workers=1, max_queue=50)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def _run_queued(scheduler, submit):
+    """Hold the single worker while ``submit`` enqueues, then return the run order."""
+    gate, done = threading.Event(), threading.Event()
+    order = []
+    scheduler.submit("blocker", gate.wait)
+    while scheduler.position("blocker") is not None:
+        threading.Event().wait(0.01)
+    expected = submit(lambda name: order.append(name))
+    scheduler.submit("last", done.set, priority=99)
+    gate.set()
+    assert done.wait(10)
+    assert len(order) == expected
+    return order
+
+
+def test_flooding_tenant_does_not_starve_others(scheduler):
+    def submit(record):
+        for i in range(10):
+            scheduler.submit(f"flood-{i}", record, f"flood-{i}", tenant="flood")
+        for i in range(3):
+            scheduler.submit(f"quiet-{i}", record, f"quiet-{i}", tenant="quiet")
+        return 13
+
+    order = _run_queued(scheduler, submit)
+    # Start-time fair queuing interleaves the two tenants until the quiet one runs out
+    assert order[:6] == ["flood-0", "quiet-0", "flood-1", "quiet-1", "flood-2", "quiet-2"]
+    assert order[6:] == [f"flood-{i}" for i in range(3, 10)]
+
+
+def test_priority_runs_before_fairness(scheduler):
+    def submit(record):
+        scheduler.submit("batch", record, "batch", tenant="a", priority=1)
+        scheduler.submit("interactive", record, "interactive", tenant="b", priority=0)
+        return 2
+
+    assert _run_queued(scheduler, submit) == ["interactive", "batch"]
+
+
+def test_position_and_bounded_queue():
+    scheduler = JobScheduler(workers=1, max_queue=2)
+    gate = threading.Event()
+    try:
+        scheduler.submit("running", gate.wait)
+        while scheduler.position("running") is not None:
+            threading.Event().wait(0.01)
+        scheduler.submit("first", gate.wait)
+        scheduler.submit("second", gate.wait)
+        assert scheduler.position("first") == 1
+        assert scheduler.position("second") == 2
+        assert scheduler.position("running") is None
+        with pytest.raises(QueueFull) as raised:
+            scheduler.submit("third", gate.wait)
+        assert raised.value.retry_after >= 1
+        assert scheduler.stats()["queued"] == 2
+    finally:
+        gate.set()
+        scheduler.shutdown()
+
+
+def test_failing_job_does_not_kill_the_worker(scheduler):
+    done = threading.Event()
+
+    def boom():
+        raise RuntimeError("boom")
+
+    scheduler.submit("boom", boom)
+    scheduler.submit("after", done.set)
+    assert done.wait(10)
@@ -0,0 +1,155 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agent.analysis import analyze_row_blocks, analyze_rows
+from agent.ingest import build_frame
+from agent.stats import CategoricalAccumulator, HyperLogLog, KLLSketch, NumericAccumulator, SheetAccumulator
+
+
+def _rank_error(sorted_values, value, q):
+    rank = np.searchsorted(sorted_values, value, side="right") / len(sorted_values)
+    return abs(rank - q)
+
+
+def _hashes(values):
+    return pd.util.hash_array(np.asarray([str(v) for v in values], dtype=object))
+
+
+def test_kll_quantiles_within_rank_error():
+    values = np.random.default_rng(0).normal(size=100_000)
+    sketch = KLLSketch(k=200, seed=1)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    for q, estimate in zip((0.1, 0.25, 0.5, 0.75, 0.9), sketch.quantiles((0.1, 0.25, 0.5, 0.75, 0.9))):
+        assert _rank_error(ordered, estimate, q) < 0.02
+    assert sketch.count == len(values)
+    assert sum(len(items) for items in sketch.levels) < 2_000
+
+
+def test_kll_merge_matches_one_sketch_over_all_values():
+    values = np.random.default_rng(1).exponential(size=60_000)
+    left, right = KLLSketch(seed=2), KLLSketch(seed=3)
+    left.update(values[:20_000])
+    right.update(values[20_000:])
+    left.merge(right)
+    ordered = np.sort(values)
+    assert left.count == len(values)
+    for q, estimate in zip((0.25, 0.5, 0.75), left.quantiles((0.25, 0.5, 0.75))):
+        assert _rank_error(ordered, estimate, q) < 0.02
+
+
+def test_kll_empty_sketch_returns_nan():
+    assert all(math.isnan(v) for v in KLLSketch().quantiles((0.5,)))
+
+
+@pytest.mark.parametrize("distinct", [100, 5_000, 200_000])
+def test_hyperloglog_estimate(distinct):
+    hll = HyperLogLog(p=12)
+    hll.update_hashes(_hashes(range(distinct)))
+    assert hll.estimate() == pytest.approx(distinct, rel=0.05)
+
+
+def test_hyperloglog_merge_is_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update_hashes(_hashes(range(0, 60_000)))
+    right.update_hashes(_hashes(range(30_000, 90_000)))
+    left.merge(right)
+    assert left.estimate() == pytest.approx(90_000, rel=0.05)
+
+
+def test_misra_gries_exact_below_capacity():
+    accumulator = CategoricalAccumulator(capacity=16)
+    accumulator.update(pd.Series(["a"] * 50 + ["b"] * 30 + ["c"] * 5))
+    accumulator.update(pd.Series(["b"] * 40))
+    assert accumulator.counters == {"a": 50, "b": 70, "c": 5}
+    assert accumulator.describe() == [125, 3, "b", 70]
+
+
+def test_misra_gries_keeps_heavy_hitter_with_bounded_undercount():
+    rng = np.random.default_rng(4)
+    noise = [f"v{i}" for i in rng.integers(0, 5_000, size=20_000)]
+    values = noise + ["hot"] * 3_000
+    rng.shuffle(values)
+    accumulator = CategoricalAccumulator(capacity=64, exact_limit=100)
+    for chunk in np.array_split(np.asarray(values, dtype=object), 10):
+        accumulator.update(pd.Series(chunk))
+    top, freq = accumulator.describe()[2:]
+    assert top == "hot"
+    assert 3_000 - len(values) / 64 <= freq <= 3_000
+    # Past exact_limit distinct values are counted by the HyperLogLog sketch
+    assert accumulator.distinct is None
+    assert accumulator.unique == pytest.approx(5_001, rel=0.05)
+
+
+def test_categorical_merge_matches_single_pass():
+    values = pd.Series(list("aaabbbbccd" * 100))
+    whole = CategoricalAccumulator()
+    whole.update(values)
+    left, right = CategoricalAccumulator(), CategoricalAccumulator()
+    left.update(values[:333])
+    right.update(values[333:])
+    left.merge(right)
+    assert left.describe() == whole.describe()
+
+
+def test_numeric_merge_matches_numpy():
+    values = np.random.default_rng(5).normal(50, 10, size=30_000)
+    left, right = NumericAccumulator(), NumericAccumulator()
+    left.update(pd.Series(values[:7_000]))
+    right.update(pd.Series(values[7_000:]))
+    left.merge(right)
+    assert left.count == len(values)
+    assert left.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert left.std == pytest.approx(values.std(ddof=1), rel=1e-9)
+    assert (left.min, left.max) == (values.min(), values.max())
+
+
+def test_sheet_accumulator_merge_equals_one_pass():
+    from benchmarks.fakes import synthetic_rows
+
+    rows = synthetic_rows(4_000, 6, seed=6)
+    header, data = rows[0], rows[1:]
+    whole = SheetAccumulator.from_rows(header, data)
+    left = SheetAccumulator.from_rows(header, data[:1_500])
+    right = SheetAccumulator(left.columns, left.schema, left.date_formats)
+    right.update_rows(data[1_500:])
+    left.merge(right)
+    assert left.rows == whole.rows
+    for name in whole.columns:
+        a, b = left.accumulators[name], whole.accumulators[name]
+        assert a.count == b.count
+        if isinstance(a, NumericAccumulator):
+            assert a.mean == pytest.approx(b.mean, rel=1e-9)
+
+
+def test_streaming_summary_within_error_bounds_of_exact():
+    from benchmarks.fakes import synthetic_rows
+
+    rows = synthetic_rows(50_000, 8, missing=0.05, seed=7)
+    exact = analyze_rows(rows)
+    streamed = analyze_row_blocks(rows[start:start + 5_000] for start in range(0, len(rows), 5_000))
+    assert streamed["column_types"] == exact["column_types"]
+    assert streamed["rows_analyzed"] == exact["rows_analyzed"]
+
+    numeric = [name for name, kind in exact["column_types"].items() if kind in ("numeric", "percent")]
+    assert numeric
+    frame, _ = build_frame(rows[0], rows[1:])
+    exact_num = exact["summary_of_numerical_columns"]["summary"]
+    streamed_num = streamed["summary_of_numerical_columns"]["summary"]
+    for name in numeric:
+        # Count, mean, std, min and max are exact; quartiles carry the KLL rank error
+        for stat in ("count", "mean", "std", "min", "max"):
+            assert streamed_num.loc[stat, name] == pytest.approx(exact_num.loc[stat, name], rel=1e-9)
+        values = np.sort(frame[name].dropna().to_numpy(dtype="float64"))
+        for stat, q in (("25%", 0.25), ("50%", 0.5), ("75%", 0.75)):
+            assert _rank_error(values, float(streamed_num.loc[stat, name]), q) < 0.02
+
+    exact_cat = exact["summary_of_categorical_columns"]["summary"]
+    streamed_cat = streamed["summary_of_categorical_columns"]["summary"]
+    for name in exact_cat.columns:
+        assert streamed_cat.loc["count", name] == exact_cat.loc["count", name]
+        assert streamed_cat.loc["top", name] == exact_cat.loc["top", name]